@@ -0,0 +1,189 @@
+"""
+Agrégats régionaux de capacité (lits, personnel, files d'attente), tenus à jour de façon incrémentale.
+
+Les sommes par région et par (région, ville) sont calculées une fois par un
+`GROUP BY` SQL sur `capacity` joint à `locations`, puis chaque écriture de
+capacité y applique la différence avant/après en O(1) : la lecture ne touche
+plus la base. Un changement de localisation invalide les agrégats (reconstruits
+à la lecture suivante), de même que leur âge au-delà de
+`ANALYTICS_ROLLUP_MAX_AGE_SECONDS`, ce qui rattrape les écritures faites par
+les autres workers.
+
+Une écriture n'est comptée qu'une fois : le commit et l'application de sa
+différence se font sous le verrou des agrégats (`rollups.writing()`), de même
+que le test de fraîcheur, le `GROUP BY` et le remplacement d'une reconstruction.
+Un `GROUP BY` voit donc soit l'écriture validée (et sa différence est appliquée
+aux agrégats qu'il a produits), soit ni l'une ni l'autre.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Any
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import caches
+from app.db.models.capacity import Capacity
+from app.db.models.location import Location
+
+CAPACITY_FIELDS = (
+    'beds', 'occupied_beds',
+    'total_doctors', 'active_doctors',
+    'total_nurses', 'active_nurses',
+    'waiting_queue', 'average_wait_time',
+)
+UNKNOWN = 'Non renseigné'
+
+LEVELS = ('network', 'region', 'city')
+
+GroupKey = Tuple[str, ...]
+
+
+def capacity_values(capacity: Optional[Capacity]) -> Optional[Dict[str, int]]:
+    """Valeurs de capacité d'une ligne (None si l'hôpital n'en a pas)"""
+    if capacity is None:
+        return None
+    return {field: getattr(capacity, field) or 0 for field in CAPACITY_FIELDS}
+
+
+def _empty() -> Dict[str, int]:
+    return dict.fromkeys(('hospitals',) + CAPACITY_FIELDS, 0)
+
+
+def _ratio(numerator: float, denominator: float, digits: int = 2) -> Optional[float]:
+    return round(numerator / denominator, digits) if denominator else None
+
+
+class RegionalRollups:
+    """Sommes de capacité pour tout le réseau, par région et par (région, ville)"""
+
+    def __init__(self, max_age: float = 60):
+        self.max_age = max_age
+        self.built_at: Optional[float] = None
+        self.rebuilds = 0
+        self._groups: Dict[str, Dict[GroupKey, Dict[str, int]]] = {level: {} for level in LEVELS}
+        self._keys: Dict[int, Tuple[str, str]] = {}  # hospital_id -> (région, ville)
+        self._views: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _group_keys(region: Optional[str], city: Optional[str]) -> Dict[str, GroupKey]:
+        region, city = region or UNKNOWN, city or UNKNOWN
+        return {'network': (), 'region': (region,), 'city': (region, city)}
+
+    # ----- Construction -----
+
+    def rebuild(self, db: Session):
+        """Recalcule les agrégats par GROUP BY (un seul passage sur capacity)"""
+        with self._lock:
+            self._rebuild(db)
+
+    def _rebuild(self, db: Session):
+        sums = [func.count(Capacity.id)] + [func.coalesce(func.sum(getattr(Capacity, f)), 0) for f in CAPACITY_FIELDS]
+        rows = (
+            db.query(Location.region, Location.city, *sums)
+            .select_from(Capacity)
+            .outerjoin(Location, Location.hospital_id == Capacity.hospital_id)
+            .group_by(Location.region, Location.city)
+            .all()
+        )
+        keys = (
+            db.query(Capacity.hospital_id, Location.region, Location.city)
+            .outerjoin(Location, Location.hospital_id == Capacity.hospital_id)
+            .all()
+        )
+        groups: Dict[str, Dict[GroupKey, Dict[str, int]]] = {level: {} for level in LEVELS}
+        for region, city, *values in rows:
+            for level, key in self._group_keys(region, city).items():
+                group = groups[level].setdefault(key, _empty())
+                for field, value in zip(('hospitals',) + CAPACITY_FIELDS, values):
+                    group[field] += int(value)
+        self._groups = groups
+        self._keys = {hospital_id: (region, city) for hospital_id, region, city in keys}
+        self._views = {}
+        self.built_at = time.monotonic()
+        self.rebuilds += 1
+
+    def _fresh(self) -> bool:
+        return self.built_at is not None and time.monotonic() - self.built_at < self.max_age
+
+    def invalidate(self):
+        with self._lock:
+            self.built_at = None
+
+    # ----- Écritures -----
+
+    @contextmanager
+    def writing(self):
+        """Section où une écriture de capacité est validée (commit) puis appliquée par update/adjust"""
+        with self._lock:
+            yield
+
+    def update(self, db: Session, hospital_id: int,
+               before: Optional[Dict[str, int]], after: Optional[Dict[str, int]]):
+        """Applique la différence avant/après d'une écriture de capacité validée (commit fait dans `writing()`)"""
+        with self._lock:
+            if not self._fresh():
+                return  # reconstruit à la prochaine lecture
+            key = self._keys.get(hospital_id)
+            if key is None:
+                location = db.query(Location.region, Location.city).filter(Location.hospital_id == hospital_id).first()
+                key = tuple(location) if location else (None, None)
+            self._keys[hospital_id] = key
+            for level, group_key in self._group_keys(*key).items():
+                group = self._groups[level].setdefault(group_key, _empty())
+                group['hospitals'] += (after is not None) - (before is not None)
+                for field in CAPACITY_FIELDS:
+                    group[field] += (after or {}).get(field, 0) - (before or {}).get(field, 0)
+            self._views = {}
+
+    def adjust(self, db: Session, hospital_id: int, field: str, delta: int):
+        """Applique une variation d'un compteur (incrément/décrément atomique)"""
+        self.update(db, hospital_id, {field: 0}, {field: delta})
+
+    # ----- Lecture -----
+
+    @staticmethod
+    def _view(key: GroupKey, group: Dict[str, int]) -> Dict[str, Any]:
+        view = dict(zip(('region', 'city'), key))
+        view.update(
+            hospitals=group['hospitals'],
+            beds=group['beds'],
+            occupied_beds=group['occupied_beds'],
+            occupancy_rate=_ratio(group['occupied_beds'], group['beds'], 4),
+            total_doctors=group['total_doctors'],
+            active_doctors=group['active_doctors'],
+            total_nurses=group['total_nurses'],
+            active_nurses=group['active_nurses'],
+            patients_per_active_doctor=_ratio(group['occupied_beds'], group['active_doctors']),
+            patients_per_active_nurse=_ratio(group['occupied_beds'], group['active_nurses']),
+            waiting_queue=group['waiting_queue'],
+            average_wait_time=_ratio(group['average_wait_time'], group['hospitals'], 1),
+        )
+        return view
+
+    def groups(self, db: Session, group_by: str = 'region') -> List[Dict[str, Any]]:
+        """Agrégats d'un niveau (network, region ou city), reconstruits si périmés"""
+        with self._lock:
+            fresh = self._fresh()
+            caches.record('analytics_rollups', fresh)
+            if not fresh:
+                self._rebuild(db)
+            view = self._views.get(group_by)
+            if view is None:
+                groups = self._groups[group_by]
+                view = self._views[group_by] = [
+                    self._view(key, groups[key]) for key in sorted(groups) if groups[key]['hospitals'] > 0
+                ]
+            return view
+
+    def total(self, db: Session) -> Dict[str, Any]:
+        """Agrégat de tout le réseau"""
+        network = self.groups(db, 'network')
+        return network[0] if network else self._view((), _empty())
+
+
+# Instance globale, construite à la première lecture
+rollups = RegionalRollups(max_age=settings.ANALYTICS_ROLLUP_MAX_AGE_SECONDS)
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from app.api.v1.auth import get_integration_key
+from app.db.session import get_db
+from app.analytics import rollups
+
+router = APIRouter()
+
+@router.get("/occupancy")
+def get_regional_occupancy(
+    group_by: str = Query("region", pattern="^(region|city)$"),
+    region: Optional[str] = None,
+    api_key: str = Depends(get_integration_key),
+    db: Session = Depends(get_db)
+):
+    """Occupation des lits, ratios de personnel et files d'attente agrégés par région ou par ville.
+
+    Données de tout le réseau : réservées aux intégrations (en-tête X-API-Key),
+    comme l'ingestion groupée des capacités.
+    """
+    groups = rollups.groups(db, group_by)
+    if region:
+        groups = [g for g in groups if g["region"].lower() == region.lower()]
+    return {
+        "group_by": group_by,
+        "total": rollups.total(db),
+        "groups": groups
+    }
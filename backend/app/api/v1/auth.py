@@ -1,13 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from jose import JWTError
+from typing import Optional
 
 from app.db.session import get_db
 from app.db.models.hospital import Hospital
 from app.schemas.auth import HospitalRegister, HospitalLogin, Token
-from app.core.security import verify_password, get_password_hash
-from app.core.jwt import create_access_token, decode_access_token
+from app.core.security import verify_password, get_password_hash, verify_api_key
+from app.core.jwt import create_access_token, decode_access_token, InvalidTokenError
 
 router = APIRouter()
 security = HTTPBearer()
@@ -81,7 +81,7 @@ def get_current_hospital(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
-    except JWTError:
+    except InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
@@ -95,3 +95,12 @@ def get_current_hospital(
         )
     
     return hospital
+
+def get_integration_key(x_api_key: Optional[str] = Header(None)) -> str:
+    """Authentification des intégrations (en-tête X-API-Key)"""
+    if not verify_api_key(x_api_key):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key"
+        )
+    return x_api_key
@@ -6,25 +6,19 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-from datetime import datetime, timedelta
-from jose import jwt, JWTError
-from passlib.context import CryptContext
 import os
 import hashlib
 
 from app.google_sheets_service import sheets_service
 from app.core.config import settings
+from app.core.jwt import create_access_token, decode_access_token, InvalidTokenError
 
+# Routes synchrones (def) : les appels Sheets peuvent attendre le quota ou un
+# rejeu (app.sheets_scheduler) ; FastAPI les exécute dans son pool de threads
+# au lieu de bloquer la boucle d'événements.
 router = APIRouter(prefix="/api/v1/auth-sheets", tags=["Authentication (Google Sheets)"])
 security = HTTPBearer()
 
-# Configuration
-SECRET_KEY = settings.SECRET_KEY
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # ============= MODELS =============
 
 class RegisterRequest(BaseModel):
@@ -57,13 +51,6 @@ class TokenResponse(BaseModel):
 
 # ============= FUNCTIONS =============
 
-def create_access_token(data: dict) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Vérifie le mot de passe avec SHA256 (compatible avec hospitals_routes.py)"""
     password_hash = hashlib.sha256(plain_password.encode()).hexdigest()
@@ -72,7 +59,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 # ============= ENDPOINTS =============
 
 @router.post("/register", response_model=TokenResponse)
-async def register(data: RegisterRequest):
+def register(data: RegisterRequest):
     """Inscription d'un nouvel hôpital dans Google Sheets"""
     # Vérifier si l'email existe déjà
     existing = sheets_service.get_hospital_by_email(data.email)
@@ -103,7 +90,7 @@ async def register(data: RegisterRequest):
     }
 
 @router.post("/login", response_model=TokenResponse)
-async def login(credentials: LoginRequest):
+def login(credentials: LoginRequest):
     """Connexion d'un hôpital via Google Sheets"""
     hospital = sheets_service.get_hospital_by_email(credentials.email)
     
@@ -126,15 +113,15 @@ async def login(credentials: LoginRequest):
     }
 
 @router.get("/me")
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Récupérer les informations de l'hôpital connecté"""
     token = credentials.credentials
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Token invalide")
-    except JWTError:
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Token invalide")
     
     hospital = sheets_service.get_hospital_by_email(email)
@@ -150,11 +137,11 @@ def get_current_hospital_sheets(credentials: HTTPAuthorizationCredentials = Depe
     """Dépendance pour récupérer l'hôpital courant depuis Google Sheets"""
     token = credentials.credentials
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Token invalide")
-    except JWTError:
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Token invalide")
     
     hospital = sheets_service.get_hospital_by_email(email)
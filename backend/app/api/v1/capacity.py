@@ -1,32 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict, Any
+from typing import Dict, Any, List, Literal
+from itertools import compress
+from operator import gt
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
-from app.schemas.capacity import CapacityCreate, CapacityUpdate, CapacityResponse
-from app.api.v1.auth import get_current_hospital
+from app.schemas.capacity import CapacityCreate, CapacityUpdate, CapacityResponse, CapacityBatch, CapacityDelta
+from app.api.v1.auth import get_current_hospital, get_integration_key
+from app.core.config import settings
+from app.core.response_cache import response_cache
 from app.db.session import get_db
 from app.db.models.hospital import Hospital
 from app.db.models.capacity import Capacity
+from app.analytics import rollups, capacity_values, CAPACITY_FIELDS
 
 router = APIRouter()
 
+# Contraintes de cohérence : (champ, plafond, message)
+CAPACITY_INVARIANTS = [
+    ("occupied_beds", "beds", "Le nombre de lits occupés ne peut pas dépasser le nombre total de lits."),
+    ("active_doctors", "total_doctors", "Le nombre de médecins actifs ne peut pas dépasser le nombre total de médecins."),
+    ("active_nurses", "total_nurses", "Le nombre d'infirmiers actifs ne peut pas dépasser le nombre total d'infirmiers."),
+]
+
+# Compteurs modifiables par incrément/décrément, et leur plafond éventuel
+COUNTER_LIMITS = {field: limit for field, limit, _ in CAPACITY_INVARIANTS}
+COUNTER_LIMITS["waiting_queue"] = None
+COUNTER_MESSAGES = {field: message for field, _, message in CAPACITY_INVARIANTS}
+Counter = Literal["occupied_beds", "active_doctors", "active_nurses", "waiting_queue"]
+
 @router.get("/")
 def get_capacity(
     current_hospital: Hospital = Depends(get_current_hospital),
     db: Session = Depends(get_db)
 ):
-    capacity = db.query(Capacity).filter(Capacity.hospital_id == current_hospital.id).first()
-    if not capacity:
+    def build():
+        capacity = db.query(Capacity).filter(Capacity.hospital_id == current_hospital.id).first()
+        if not capacity:
+            return {
+                "beds": 0, "occupied_beds": 0, "total_doctors": 0, "active_doctors": 0,
+                "total_nurses": 0, "active_nurses": 0, "waiting_queue": 0, "average_wait_time": 0
+            }
         return {
-            "beds": 0, "occupied_beds": 0, "total_doctors": 0, "active_doctors": 0,
-            "total_nurses": 0, "active_nurses": 0, "waiting_queue": 0, "average_wait_time": 0
+            "beds": capacity.beds, "occupied_beds": capacity.occupied_beds,
+            "total_doctors": capacity.total_doctors, "active_doctors": capacity.active_doctors,
+            "total_nurses": capacity.total_nurses, "active_nurses": capacity.active_nurses,
+            "waiting_queue": capacity.waiting_queue, "average_wait_time": capacity.average_wait_time
         }
-    return {
-        "beds": capacity.beds, "occupied_beds": capacity.occupied_beds,
-        "total_doctors": capacity.total_doctors, "active_doctors": capacity.active_doctors,
-        "total_nurses": capacity.total_nurses, "active_nurses": capacity.active_nurses,
-        "waiting_queue": capacity.waiting_queue, "average_wait_time": capacity.average_wait_time
-    }
+    return response_cache.fetch("capacity", current_hospital.id, build)
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 def create_capacity(
@@ -40,8 +61,11 @@ def create_capacity(
     
     new_capacity = Capacity(hospital_id=current_hospital.id, **capacity.dict())
     db.add(new_capacity)
-    db.commit()
-    db.refresh(new_capacity)
+    with rollups.writing():
+        db.commit()
+        db.refresh(new_capacity)
+        rollups.update(db, current_hospital.id, None, capacity_values(new_capacity))
+    response_cache.invalidate("capacity", current_hospital.id)
     return capacity.dict()
 
 @router.put("/")
@@ -51,6 +75,7 @@ def update_capacity(
     db: Session = Depends(get_db)
 ):
     db_capacity = db.query(Capacity).filter(Capacity.hospital_id == current_hospital.id).first()
+    before = capacity_values(db_capacity)
     if not db_capacity:
         db_capacity = Capacity(hospital_id=current_hospital.id)
         db.add(db_capacity)
@@ -59,17 +84,15 @@ def update_capacity(
     for key, value in updates.items():
         setattr(db_capacity, key, value)
     
-    if db_capacity.occupied_beds > db_capacity.beds:
-        raise HTTPException(status_code=400, detail="Le nombre de lits occupés ne peut pas dépasser le nombre total de lits.")
+    for field, limit, message in CAPACITY_INVARIANTS:
+        if getattr(db_capacity, field) > getattr(db_capacity, limit):
+            raise HTTPException(status_code=400, detail=message)
     
-    if db_capacity.active_doctors > db_capacity.total_doctors:
-        raise HTTPException(status_code=400, detail="Le nombre de médecins actifs ne peut pas dépasser le nombre total de médecins.")
-    
-    if db_capacity.active_nurses > db_capacity.total_nurses:
-        raise HTTPException(status_code=400, detail="Le nombre d'infirmiers actifs ne peut pas dépasser le nombre total d'infirmiers.")
-    
-    db.commit()
-    db.refresh(db_capacity)
+    with rollups.writing():
+        db.commit()
+        db.refresh(db_capacity)
+        rollups.update(db, current_hospital.id, before, capacity_values(db_capacity))
+    response_cache.invalidate("capacity", current_hospital.id)
     
     return {
         "beds": db_capacity.beds, "occupied_beds": db_capacity.occupied_beds,
@@ -77,3 +100,147 @@ def update_capacity(
         "total_nurses": db_capacity.total_nurses, "active_nurses": db_capacity.active_nurses,
         "waiting_queue": db_capacity.waiting_queue, "average_wait_time": db_capacity.average_wait_time
     }
+
+def validate_capacity_columns(columns: Dict[str, List[int]]) -> List[List[str]]:
+    """Erreurs de chaque relevé : chaque contrainte est évaluée sur des colonnes entières"""
+    count = len(columns["beds"])
+    errors: List[List[str]] = [[] for _ in range(count)]
+    for field, limit, message in CAPACITY_INVARIANTS:
+        for i in compress(range(count), map(gt, columns[field], columns[limit])):
+            errors[i].append(message)
+    return errors
+
+def _upsert_capacity(db: Session, rows: List[Dict[str, int]], existing: Dict[int, Capacity]):
+    """INSERT ... ON CONFLICT (hospital_id) DO UPDATE en une seule instruction"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        # Autres bases : mises à jour et insertions groupées, dans la même transaction
+        db.bulk_update_mappings(Capacity, [
+            dict(row, id=existing[row["hospital_id"]].id) for row in rows if existing.get(row["hospital_id"])
+        ])
+        db.bulk_insert_mappings(Capacity, [row for row in rows if not existing.get(row["hospital_id"])])
+        return
+    statement = insert(Capacity)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Capacity.hospital_id],
+        set_={field: statement.excluded[field] for field in CAPACITY_FIELDS}
+    )
+    db.execute(statement, rows)
+
+@router.post("/batch")
+def ingest_capacity_batch(
+    batch: CapacityBatch,
+    api_key: str = Depends(get_integration_key),
+    db: Session = Depends(get_db)
+):
+    """Ingestion groupée des relevés de capacité (intégrations SIH, en-tête X-API-Key).
+
+    Un relevé remplace toute la capacité de l'hôpital. Si un hôpital apparaît
+    plusieurs fois, son dernier relevé l'emporte. Les relevés invalides sont
+    rejetés et listés, les autres sont enregistrés dans une seule transaction.
+    """
+    if len(batch.snapshots) > settings.CAPACITY_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Au plus {settings.CAPACITY_BATCH_MAX_ITEMS} relevés par appel"
+        )
+    
+    # Dernier relevé de chaque hôpital, avec sa position dans la requête
+    latest = {snapshot.hospital_id: index for index, snapshot in enumerate(batch.snapshots)}
+    indexes = sorted(latest.values())
+    rows = [batch.snapshots[i].model_dump() for i in indexes]
+    columns = {field: [row[field] for row in rows] for field in CAPACITY_FIELDS}
+    errors = validate_capacity_columns(columns)
+    
+    # Hôpitaux connus et capacité actuelle, en une requête
+    existing = dict(
+        db.query(Hospital.id, Capacity)
+        .outerjoin(Capacity, Capacity.hospital_id == Hospital.id)
+        .filter(Hospital.id.in_(list(latest)))
+        .all()
+    )
+    for row, row_errors in zip(rows, errors):
+        if row["hospital_id"] not in existing:
+            row_errors.append("Hôpital inconnu")
+    
+    accepted = [row for row, row_errors in zip(rows, errors) if not row_errors]
+    before = {row["hospital_id"]: capacity_values(existing[row["hospital_id"]]) for row in accepted}
+    if accepted:
+        _upsert_capacity(db, accepted, existing)
+        with rollups.writing():
+            db.commit()
+            for row in accepted:
+                rollups.update(db, row["hospital_id"], before[row["hospital_id"]],
+                               {field: row[field] for field in CAPACITY_FIELDS})
+                response_cache.invalidate("capacity", row["hospital_id"])
+    
+    created = sum(1 for row in accepted if before[row["hospital_id"]] is None)
+    return {
+        "received": len(batch.snapshots),
+        "created": created,
+        "updated": len(accepted) - created,
+        "rejected": [
+            {"index": i, "hospital_id": row["hospital_id"], "errors": row_errors}
+            for i, row, row_errors in zip(indexes, rows, errors) if row_errors
+        ]
+    }
+
+def _apply_delta(db: Session, hospital_id: int, counter: str, delta: int) -> int:
+    """UPDATE conditionnel : x = x + delta seulement si x + delta >= 0 et, pour un incrément,
+    x + delta <= plafond. Retourne la nouvelle valeur"""
+    column = getattr(Capacity, counter)
+    statement = (
+        update(Capacity)
+        .where(Capacity.hospital_id == hospital_id)
+        .where(column + delta >= 0)
+        .values({column: column + delta})
+        .execution_options(synchronize_session=False)
+    )
+    limit = COUNTER_LIMITS[counter]
+    # Plafond vérifié seulement à la hausse : si le plafond a été abaissé sous le
+    # compteur, un décrément doit pouvoir le ramener dans les limites
+    if limit is not None and delta > 0:
+        statement = statement.where(column + delta <= getattr(Capacity, limit))
+    
+    returning = db.get_bind().dialect.full_returning
+    result = db.execute(statement.returning(column) if returning else statement)
+    value = result.scalar() if returning else (
+        db.query(column).filter(Capacity.hospital_id == hospital_id).scalar() if result.rowcount else None
+    )
+    if value is None:
+        db.rollback()
+        if db.query(Capacity.id).filter(Capacity.hospital_id == hospital_id).first() is None:
+            raise HTTPException(status_code=404, detail="Capacity not found for this hospital")
+        detail = COUNTER_MESSAGES.get(counter) if delta > 0 else f"{counter} ne peut pas être négatif."
+        raise HTTPException(status_code=409, detail=detail)
+    with rollups.writing():
+        db.commit()
+        rollups.adjust(db, hospital_id, counter, delta)
+    response_cache.invalidate("capacity", hospital_id)
+    return value
+
+@router.post("/{counter}:increment")
+def increment_counter(
+    counter: Counter,
+    body: CapacityDelta = CapacityDelta(),
+    current_hospital: Hospital = Depends(get_current_hospital),
+    db: Session = Depends(get_db)
+):
+    """Incrément atomique d'un compteur (admission, arrivée en file d'attente...)"""
+    value = _apply_delta(db, current_hospital.id, counter, body.delta)
+    return {"field": counter, "delta": body.delta, "value": value}
+
+@router.post("/{counter}:decrement")
+def decrement_counter(
+    counter: Counter,
+    body: CapacityDelta = CapacityDelta(),
+    current_hospital: Hospital = Depends(get_current_hospital),
+    db: Session = Depends(get_db)
+):
+    """Décrément atomique d'un compteur (sortie, prise en charge...)"""
+    value = _apply_delta(db, current_hospital.id, counter, -body.delta)
+    return {"field": counter, "delta": -body.delta, "value": value}
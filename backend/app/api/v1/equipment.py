@@ -2,8 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List, Dict, Any
 from sqlalchemy.orm import Session
 
-from app.schemas.equipment import EquipmentCreate, EquipmentUpdate, EquipmentResponse
+from app.schemas.equipment import EquipmentCreate, EquipmentUpdate, EquipmentResponse, EquipmentBatch
 from app.api.v1.auth import get_current_hospital
+from app.core.config import settings
+from app.core.response_cache import response_cache
+from app.db.batch import apply_batch
 from app.db.session import get_db
 from app.db.models.hospital import Hospital
 from app.db.models.equipment import Equipment
@@ -15,8 +18,10 @@ def get_equipment(
     current_hospital: Hospital = Depends(get_current_hospital),
     db: Session = Depends(get_db)
 ):
-    equipment_list = db.query(Equipment).filter(Equipment.hospital_id == current_hospital.id).all()
-    return [{"id": e.id, "name": e.name, "quantity": e.quantity, "status": e.status} for e in equipment_list]
+    def build():
+        equipment_list = db.query(Equipment).filter(Equipment.hospital_id == current_hospital.id).all()
+        return [{"id": e.id, "name": e.name, "quantity": e.quantity, "available": e.available} for e in equipment_list]
+    return response_cache.fetch("equipment", current_hospital.id, build)
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 def create_equipment(
@@ -28,7 +33,35 @@ def create_equipment(
     db.add(new_equipment)
     db.commit()
     db.refresh(new_equipment)
-    return {"id": new_equipment.id, "name": new_equipment.name, "quantity": new_equipment.quantity, "status": new_equipment.status}
+    response_cache.invalidate("equipment", new_equipment.hospital_id)
+    return {"id": new_equipment.id, "name": new_equipment.name, "quantity": new_equipment.quantity, "available": new_equipment.available}
+
+@router.post("/batch")
+def batch_equipment(
+    batch: EquipmentBatch,
+    current_hospital: Hospital = Depends(get_current_hospital),
+    db: Session = Depends(get_db)
+):
+    """Créations, modifications et suppressions groupées, appliquées dans une seule transaction.
+
+    Si une opération est invalide, aucune n'est appliquée (422, avec le résultat
+    de chaque opération).
+    """
+    if len(batch.operations) > settings.INVENTORY_BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Au plus {settings.INVENTORY_BATCH_MAX_OPERATIONS} opérations par appel"
+        )
+    # Lu avant le commit, qui expire l'hôpital chargé
+    hospital_id = current_hospital.id
+    outcome = apply_batch(db, Equipment, EquipmentCreate, hospital_id, batch.operations)
+    if not outcome["applied"]:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": "Lot rejeté : aucune opération appliquée", "results": outcome["results"]}
+        )
+    response_cache.invalidate("equipment", hospital_id)
+    return {"results": outcome["results"]}
 
 @router.put("/{equipment_id}")
 def update_equipment(
@@ -47,7 +80,8 @@ def update_equipment(
     
     db.commit()
     db.refresh(db_equipment)
-    return {"id": db_equipment.id, "name": db_equipment.name, "quantity": db_equipment.quantity, "status": db_equipment.status}
+    response_cache.invalidate("equipment", db_equipment.hospital_id)
+    return {"id": db_equipment.id, "name": db_equipment.name, "quantity": db_equipment.quantity, "available": db_equipment.available}
 
 @router.delete("/{equipment_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_equipment(
@@ -61,4 +95,5 @@ def delete_equipment(
     
     db.delete(db_equipment)
     db.commit()
+    response_cache.invalidate("equipment", db_equipment.hospital_id)
     return None
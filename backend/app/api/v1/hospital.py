@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 
 from app.schemas.hospital import HospitalResponse, HospitalUpdate
 from app.api.v1.auth import get_current_hospital
+from app.core.response_cache import response_cache
 from app.db.session import get_db
 from app.db.models.hospital import Hospital
 
@@ -13,13 +14,13 @@ router = APIRouter()
 def get_hospital_profile(
     current_hospital: Hospital = Depends(get_current_hospital)
 ):
-    return {
+    return response_cache.fetch("hospital", current_hospital.id, lambda: {
         "id": current_hospital.id,
         "name": current_hospital.name,
         "email": current_hospital.email,
         "address": current_hospital.address,
         "phone": current_hospital.phone
-    }
+    })
 
 @router.put("/me")
 def update_hospital_profile(
@@ -35,6 +36,7 @@ def update_hospital_profile(
         
     db.commit()
     db.refresh(current_hospital)
+    response_cache.invalidate("hospital", current_hospital.id)
     
     return {
         "id": current_hospital.id,
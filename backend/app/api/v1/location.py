@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from typing import Dict, Any
 from sqlalchemy.orm import Session
 
 from app.schemas.location import LocationCreate, LocationUpdate, LocationResponse
 from app.api.v1.auth import get_current_hospital
+from app.core.response_cache import response_cache
+from app.db.geo import nearby
 from app.db.session import get_db
 from app.db.models.hospital import Hospital
 from app.db.models.location import Location
+from app.analytics import rollups
 
 router = APIRouter()
 
@@ -15,11 +18,35 @@ def get_location(
     current_hospital: Hospital = Depends(get_current_hospital),
     db: Session = Depends(get_db)
 ):
-    location = db.query(Location).filter(Location.hospital_id == current_hospital.id).first()
-    if not location:
-        return {"latitude": 0.0, "longitude": 0.0, "city": "", "region": "", "country": "Cameroun"}
-    return {"latitude": location.latitude, "longitude": location.longitude, 
-            "city": location.city, "region": location.region, "country": location.country}
+    def build():
+        location = db.query(Location).filter(Location.hospital_id == current_hospital.id).first()
+        if not location:
+            return {"latitude": 0.0, "longitude": 0.0, "city": "", "region": "", "country": "Cameroun"}
+        return {"latitude": location.latitude, "longitude": location.longitude,
+                "city": location.city, "region": location.region, "country": location.country}
+    return response_cache.fetch("location", current_hospital.id, build)
+
+@router.get("/nearby")
+def get_nearby_locations(
+    latitude: float | None = Query(None, ge=-90, le=90),
+    longitude: float | None = Query(None, ge=-180, le=180),
+    radius_km: float = Query(20.0, gt=0, le=2000, description="Rayon de recherche en km"),
+    limit: int = Query(20, ge=1, le=200),
+    current_hospital: Hospital = Depends(get_current_hospital),
+    db: Session = Depends(get_db)
+):
+    """Autres établissements à moins de `radius_km`, du plus proche au plus lointain.
+
+    Sans coordonnées, la recherche part de la localisation de l'hôpital connecté.
+    """
+    if latitude is None or longitude is None:
+        own = db.query(Location.latitude, Location.longitude).filter(Location.hospital_id == current_hospital.id).first()
+        if not own or own.latitude is None or own.longitude is None:
+            raise HTTPException(status_code=400, detail="Coordonnées requises : aucune localisation enregistrée pour cet hôpital")
+        latitude, longitude = own.latitude, own.longitude
+    
+    hospitals = nearby(db, latitude, longitude, radius_km, limit, exclude_hospital_id=current_hospital.id)
+    return {"total": len(hospitals), "hospitals": hospitals}
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 def create_location(
@@ -33,8 +60,12 @@ def create_location(
     
     new_location = Location(hospital_id=current_hospital.id, **location.dict())
     db.add(new_location)
-    db.commit()
+    # Région/ville : l'hôpital change de groupe dans les agrégats
+    with rollups.writing():
+        db.commit()
+        rollups.invalidate()
     db.refresh(new_location)
+    response_cache.invalidate("location", new_location.hospital_id)
     return location.dict()
 
 @router.put("/")
@@ -52,8 +83,11 @@ def update_location(
     for key, value in updates.items():
         setattr(db_location, key, value)
     
-    db.commit()
+    with rollups.writing():
+        db.commit()
+        rollups.invalidate()
     db.refresh(db_location)
+    response_cache.invalidate("location", db_location.hospital_id)
     
     return {"latitude": db_location.latitude, "longitude": db_location.longitude,
             "city": db_location.city, "region": db_location.region, "country": db_location.country}
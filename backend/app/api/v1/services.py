@@ -2,8 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List, Dict, Any
 from sqlalchemy.orm import Session
 
-from app.schemas.services import ServiceCreate, ServiceUpdate, ServiceResponse
+from app.schemas.services import ServiceCreate, ServiceUpdate, ServiceResponse, ServiceBatch
 from app.api.v1.auth import get_current_hospital
+from app.core.config import settings
+from app.core.response_cache import response_cache
+from app.db.batch import apply_batch
 from app.db.session import get_db
 from app.db.models.hospital import Hospital
 from app.db.models.services import Service
@@ -15,8 +18,10 @@ def get_services(
     current_hospital: Hospital = Depends(get_current_hospital),
     db: Session = Depends(get_db)
 ):
-    services = db.query(Service).filter(Service.hospital_id == current_hospital.id).all()
-    return [{"id": s.id, "name": s.name, "description": s.description, "is_available": s.is_available} for s in services]
+    def build():
+        services = db.query(Service).filter(Service.hospital_id == current_hospital.id).all()
+        return [{"id": s.id, "name": s.name, "description": s.description} for s in services]
+    return response_cache.fetch("services", current_hospital.id, build)
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 def create_service(
@@ -27,14 +32,41 @@ def create_service(
     new_service = Service(
         name=service.name,
         description=service.description,
-        is_available=True,
         hospital_id=current_hospital.id
     )
     db.add(new_service)
     db.commit()
     db.refresh(new_service)
+    response_cache.invalidate("services", new_service.hospital_id)
     
-    return {"id": new_service.id, "name": new_service.name, "description": new_service.description, "is_available": new_service.is_available}
+    return {"id": new_service.id, "name": new_service.name, "description": new_service.description}
+
+@router.post("/batch")
+def batch_services(
+    batch: ServiceBatch,
+    current_hospital: Hospital = Depends(get_current_hospital),
+    db: Session = Depends(get_db)
+):
+    """Créations, modifications et suppressions groupées, appliquées dans une seule transaction.
+
+    Si une opération est invalide, aucune n'est appliquée (422, avec le résultat
+    de chaque opération).
+    """
+    if len(batch.operations) > settings.INVENTORY_BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Au plus {settings.INVENTORY_BATCH_MAX_OPERATIONS} opérations par appel"
+        )
+    # Lu avant le commit, qui expire l'hôpital chargé
+    hospital_id = current_hospital.id
+    outcome = apply_batch(db, Service, ServiceCreate, hospital_id, batch.operations)
+    if not outcome["applied"]:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": "Lot rejeté : aucune opération appliquée", "results": outcome["results"]}
+        )
+    response_cache.invalidate("services", hospital_id)
+    return {"results": outcome["results"]}
 
 @router.put("/{service_id}")
 def update_service(
@@ -53,7 +85,8 @@ def update_service(
     
     db.commit()
     db.refresh(db_service)
-    return {"id": db_service.id, "name": db_service.name, "description": db_service.description, "is_available": db_service.is_available}
+    response_cache.invalidate("services", db_service.hospital_id)
+    return {"id": db_service.id, "name": db_service.name, "description": db_service.description}
 
 @router.delete("/{service_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_service(
@@ -67,4 +100,5 @@ def delete_service(
     
     db.delete(db_service)
     db.commit()
+    response_cache.invalidate("services", db_service.hospital_id)
     return None
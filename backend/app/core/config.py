@@ -1,10 +1,12 @@
 from pydantic_settings import BaseSettings
-from typing import List, Union
+from typing import Dict, List, Union
 from pydantic import field_validator
 
 class Settings(BaseSettings):
     SECRET_KEY: str = "dev_secret_key"
     DATABASE_URL: str = "sqlite:///./pulseai.db"
+    # Applique les migrations du schéma au démarrage (sinon : python -m app.db.migrations)
+    DATABASE_MIGRATE_ON_STARTUP: bool = True
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 43200  # 30 jours
     
     # CORS Configuration
@@ -17,10 +19,84 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in v.split(',')]
         return v
     
+    # Clés d'API des intégrations (systèmes d'information hospitaliers), séparées par des virgules
+    INTEGRATION_API_KEYS: Union[List[str], str] = []
+    # Nombre maximum de relevés par appel d'ingestion groupée
+    CAPACITY_BATCH_MAX_ITEMS: int = 1000
+    # Nombre maximum d'opérations par lot d'équipements ou de services
+    INVENTORY_BATCH_MAX_OPERATIONS: int = 500
+    
+    @field_validator('INTEGRATION_API_KEYS', mode='before')
+    @classmethod
+    def parse_api_keys(cls, v):
+        if isinstance(v, str):
+            return [key.strip() for key in v.split(',') if key.strip()]
+        return v
+    
     # Google Sheets Configuration
+    # Routes Google Sheets (hôpitaux, auth-sheets) ; le client est créé au premier usage
+    SHEETS_ENABLED: bool = False
     GOOGLE_SHEET_ID: str = ""
     GOOGLE_CREDENTIALS_PATH: str = "./pulseai-backend-94eaf873090c.json"
     SERVICE_ACCOUNT_EMAIL: str = ""
+    # Synchronisation incrémentale (0 = lecture directe à chaque requête)
+    SHEETS_SYNC_INTERVAL_SECONDS: int = 30
+    # Au-delà de cette proportion de lignes modifiées, on recharge l'onglet entier
+    SHEETS_SYNC_FULL_RELOAD_RATIO: float = 0.5
+    # Onglets sans updated_at : relecture complète (modifications en place) au plus
+    # une fois par intervalle ; entre-temps seule la colonne id est comparée
+    SHEETS_SYNC_FULL_SCAN_SECONDS: int = 300
+    # Miroir SQLite local des onglets (vide = modèle en mémoire uniquement)
+    SHEETS_MIRROR_PATH: str = "./sheets_mirror.db"
+    # File d'écriture différée des ajouts de lignes (0 = envoi synchrone)
+    SHEETS_WRITE_BEHIND_INTERVAL_SECONDS: float = 1.0
+    SHEETS_WRITE_BEHIND_MAX_BATCH: int = 50
+    # Un journal par processus : ./sheets_write_journal.<pid>.jsonl
+    SHEETS_WRITE_JOURNAL_PATH: str = "./sheets_write_journal.jsonl"
+    # Quota Sheets API (requêtes/minute/utilisateur) et rejeu des erreurs 429/5xx
+    SHEETS_QUOTA_REQUESTS_PER_MINUTE: int = 60
+    SHEETS_QUOTA_BURST: int = 10
+    SHEETS_MAX_RETRIES: int = 5
+    # Agrégats de notes par hôpital (nombre, somme, histogramme)
+    SHEETS_REVIEW_AGGREGATES_PATH: str = "./review_aggregates.json"
+    # Instantané Hopitaux/Services partagé entre workers uvicorn (vide = une copie par worker)
+    SHEETS_SHARED_SNAPSHOT_PATH: str = ""
+    SHEETS_SHARED_SNAPSHOT_POLL_SECONDS: float = 1.0
+    
+    # Pondérations du score de recommandation (recherche d'hôpitaux)
+    SCORE_BASE: float = 1000
+    SCORE_DISTANCE_WEIGHT: float = 10     # par km
+    SCORE_RATING_WEIGHT: float = 50       # par étoile
+    SCORE_WAIT_WEIGHT: float = 2          # par minute d'attente
+    SCORE_CLOSED_PENALTY: float = 5000
+    SCORE_EQUIPMENT_WEIGHTS: Dict[str, float] = {
+        'scanner': 150,
+        'échographe': 120,
+        'echographe': 120,
+        'ecg': 80,
+        'défibrillateur': 60,
+        'defibrillateur': 60,
+    }
+    
+    # Agrégats régionaux de capacité : reconstruits par GROUP BY au-delà de cet âge
+    # (rattrape les écritures des autres workers)
+    ANALYTICS_ROLLUP_MAX_AGE_SECONDS: float = 60
+    
+    # Profilage à la demande (en-tête X-Profile-Token ; vide = désactivé)
+    PROFILING_TOKEN: str = ""
+    PROFILING_SAMPLE_RATE: float = 0.0    # proportion de requêtes profilées d'office
+    PROFILING_INTERVAL_MS: float = 2.0
+    PROFILING_DIR: str = "./profiles"
+    
+    # Requêtes SQL par requête HTTP : en-tête Server-Timing et journal au-delà du budget
+    SQL_SERVER_TIMING: bool = True
+    SQL_QUERY_BUDGET: int = 15
+    
+    # Cache des réponses de lecture par hôpital (profil, services, équipements, localisation, capacité)
+    RESPONSE_CACHE_TTL_SECONDS: float = 30    # 0 = désactivé
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10000   # LRU en mémoire, par worker
+    # redis://hôte:6379/0 pour partager le cache (et son invalidation) entre workers
+    RESPONSE_CACHE_URL: str = ""
     
     class Config:
         env_file = ".env"
@@ -1,8 +1,16 @@
 from datetime import datetime, timedelta
-from jose import jwt
 from app.core.config import settings
 
+# python-jose (et cryptography) est importé au premier usage : il pèse sur le démarrage à froid
+
+
+class InvalidTokenError(ValueError):
+    """Jeton JWT invalide, expiré ou mal signé"""
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -14,4 +22,9 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 def decode_access_token(token: str):
-    return jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    from jose import jwt, JWTError
+
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    except JWTError as e:
+        raise InvalidTokenError(str(e)) from e
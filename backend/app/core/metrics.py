@@ -0,0 +1,320 @@
+"""
+Métriques au format texte Prometheus, exposées sur /metrics.
+
+Implémentation minimale sans dépendance : compteurs, jauges et histogrammes
+étiquetés. Chaque thread écrit dans sa propre copie (shard) des valeurs, sans
+verrou ; les copies ne sont additionnées qu'au moment de l'export. Le seul
+verrou sert à enregistrer la copie d'un nouveau thread.
+
+Sources :
+- `MetricsMiddleware` : latence et nombre de requêtes HTTP par route, requêtes en cours
+- `instrument_sheets_request` : appels Google Sheets par méthode/onglet, octets, erreurs
+- `instrument_engine` : requêtes SQL (nombre et durée) via les événements SQLAlchemy,
+  aussi comptées par requête HTTP (voir app.core.query_stats)
+- `caches` : taux de succès des caches (modèle synchronisé, scores, horaires...)
+"""
+import bisect
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import unquote, urlsplit, parse_qs
+
+from app.core import query_stats
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'  # charset ajouté par PlainTextResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+REGISTRY: List['_Metric'] = []
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple, Any]] = []
+        self._shards_lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _shard(self) -> Dict[Tuple, Any]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def _snapshots(self) -> List[Dict[Tuple, Any]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict() est atomique sous le GIL : pas besoin de bloquer les écrivains
+        return [dict(shard) for shard in shards]
+
+    def _header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        merged: Dict[Tuple, float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                merged[labels] = merged.get(labels, 0) + value
+        return merged
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        for labels, value in sorted(self.values().items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}')
+        return lines
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # compteurs par intervalle (non cumulés) + dernier élément = somme
+            entry = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def collect(self) -> List[str]:
+        merged: Dict[Tuple, List[float]] = {}
+        for shard in self._snapshots():
+            for labels, entry in shard.items():
+                entry = list(entry)
+                total = merged.get(labels)
+                merged[labels] = entry if total is None else [a + b for a, b in zip(total, entry)]
+
+        lines = self._header()
+        for labels, entry in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry[:-1]):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(entry[-1])}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class CacheMetrics(_Metric):
+    """Succès/échecs par cache, plus le taux de succès calculé à l'export"""
+
+    kind = 'counter'
+
+    def __init__(self):
+        super().__init__('cache_requests_total', 'Accès aux caches applicatifs', ('cache', 'result'))
+        self._sources: Dict[str, Callable[[], Tuple[int, int]]] = {}
+
+    def record(self, cache: str, hit: bool):
+        labels = (cache, 'hit' if hit else 'miss')
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + 1
+
+    def register(self, cache: str, info: Callable[[], Tuple[int, int]]):
+        """Cache qui compte lui-même ses (succès, échecs), ex. functools.lru_cache"""
+        self._sources[cache] = info
+
+    def totals(self) -> Dict[str, Tuple[int, int]]:
+        totals: Dict[str, List[int]] = {}
+        for shard in self._snapshots():
+            for (cache, result), value in shard.items():
+                counts = totals.setdefault(cache, [0, 0])
+                counts[0 if result == 'hit' else 1] += value
+        for cache, info in self._sources.items():
+            hits, misses = info()
+            counts = totals.setdefault(cache, [0, 0])
+            counts[0] += hits
+            counts[1] += misses
+        return {cache: (hits, misses) for cache, (hits, misses) in totals.items()}
+
+    def collect(self) -> List[str]:
+        totals = sorted(self.totals().items())
+        lines = self._header()
+        for cache, (hits, misses) in totals:
+            lines.append(f'{self.name}{_labels(self.labelnames, (cache, "hit"))} {hits}')
+            lines.append(f'{self.name}{_labels(self.labelnames, (cache, "miss"))} {misses}')
+        lines += ['# HELP cache_hit_ratio Taux de succès des caches', '# TYPE cache_hit_ratio gauge']
+        for cache, (hits, misses) in totals:
+            ratio = hits / (hits + misses) if hits + misses else 0.0
+            lines.append(f'cache_hit_ratio{_labels(("cache",), (cache,))} {_number(round(ratio, 4))}')
+        return lines
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+# ============= MÉTRIQUES =============
+
+HTTP_REQUESTS = Counter('http_requests_total', 'Requêtes HTTP traitées', ('method', 'route', 'status'))
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'Latence des requêtes HTTP', ('method', 'route'))
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requêtes HTTP en cours', ('method',))
+
+SHEETS_CALLS = Counter('sheets_api_calls_total', 'Appels à l\'API Google Sheets/Drive', ('method', 'tab'))
+SHEETS_BYTES = Counter('sheets_api_bytes_total', 'Octets échangés avec Google', ('method', 'tab', 'direction'))
+SHEETS_ERRORS = Counter('sheets_api_errors_total', 'Erreurs HttpError renvoyées par Google', ('method', 'status'))
+
+SQL_QUERIES = Counter('sql_queries_total', 'Requêtes SQL exécutées', ('operation',))
+SQL_LATENCY = Histogram('sql_query_duration_seconds', 'Durée des requêtes SQL', ('operation',), SQL_BUCKETS)
+
+caches = CacheMetrics()
+
+
+# ============= HTTP =============
+
+class MetricsMiddleware:
+    """Middleware ASGI pur (pas de BaseHTTPMiddleware) : coût de quelques microsecondes"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec(method)
+            # Gabarit de la route (/api/v1/hospitals/{hospital_id}) : cardinalité bornée
+            route = scope.get('route')
+            route = getattr(route, 'path', None) or 'unmatched'
+            HTTP_REQUESTS.inc(method, route, status[0])
+            HTTP_LATENCY.observe(elapsed, method, route)
+
+
+# ============= GOOGLE SHEETS =============
+
+_VALUES_TAB = re.compile(r'/values/([^/:?]+)')
+
+
+def sheets_request_labels(request) -> Tuple[str, str]:
+    """(méthode, onglet) d'une requête googleapiclient, ex. ('values.get', 'Hopitaux')"""
+    method = getattr(request, 'methodId', '') or 'unknown'
+    if method.startswith('sheets.spreadsheets.'):
+        method = method[len('sheets.spreadsheets.'):]
+    uri = getattr(request, 'uri', '') or ''
+    tab = '-'
+    match = _VALUES_TAB.search(urlsplit(uri).path)
+    if match:
+        tab = unquote(match.group(1)).split('!')[0]
+    else:
+        ranges = parse_qs(urlsplit(uri).query).get('ranges', [])
+        tabs = {r.split('!')[0] for r in ranges}
+        if len(tabs) == 1:
+            tab = tabs.pop()
+        elif tabs:
+            tab = 'multi'
+    return method, tab
+
+
+def instrument_sheets_request(request) -> Tuple[str, str]:
+    """Compte les octets envoyés/reçus d'une requête avant son exécution"""
+    method, tab = sheets_request_labels(request)
+    body = getattr(request, 'body', None)
+    if body:
+        SHEETS_BYTES.inc(method, tab, 'sent', amount=len(body))
+    postproc = getattr(request, 'postproc', None)
+    if postproc is not None and not getattr(postproc, '_metered', False):
+        def metered_postproc(resp, content):
+            SHEETS_BYTES.inc(method, tab, 'received', amount=len(content or b''))
+            return postproc(resp, content)
+        metered_postproc._metered = True
+        request.postproc = metered_postproc
+    return method, tab
+
+
+# ============= SQL =============
+
+def instrument_engine(engine):
+    """Compte et chronomètre les requêtes SQL d'un moteur SQLAlchemy"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_metrics_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        SQL_QUERIES.inc(operation)
+        SQL_LATENCY.observe(elapsed, operation)
+        query_stats.record(statement, elapsed)
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(context):
+        starts = context.connection.info.get('_metrics_start') if context.connection else None
+        if starts:
+            starts.pop()
+
+    return engine
@@ -0,0 +1,223 @@
+"""
+Profilage à la demande d'une requête (échantillonnage statistique des piles).
+
+Activation, réservée aux administrateurs :
+- en-tête `X-Profile-Token: <PROFILING_TOKEN>` ou paramètre `?profile=<PROFILING_TOKEN>`
+- ou tirage aléatoire d'une proportion `PROFILING_SAMPLE_RATE` des requêtes
+
+Pendant la requête, un thread relève toutes les `PROFILING_INTERVAL_MS` ms la
+pile du thread de la boucle asyncio (si elle exécute du code de l'application)
+et celle des threads qui exécutent l'endpoint (endpoints `def` lancés dans le
+pool de threads). Chaque pile est étiquetée [sheets] (GoogleSheetsService,
+googleapiclient), [sql] (SQLAlchemy) ou [app], puis agrégée au format "collapsed
+stacks" (flamegraph.pl, speedscope). Le profil est écrit dans `PROFILING_DIR`
+et son identifiant renvoyé dans l'en-tête `X-Profile-Id`.
+"""
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+import app as app_package
+from app.core.config import settings
+
+APP_DIR = os.path.dirname(os.path.abspath(app_package.__file__))
+SHEETS_MARKERS = (
+    os.path.join(APP_DIR, 'google_sheets_service.py'),
+    os.path.join(APP_DIR, 'sheets_'),
+    f'{os.sep}googleapiclient{os.sep}',
+    f'{os.sep}httplib2{os.sep}',
+)
+SQL_MARKERS = (f'{os.sep}sqlalchemy{os.sep}',)
+MAX_DEPTH = 128
+
+
+def _tag(frame) -> str:
+    """Étiquette de la pile : la couche la plus profonde (la plus proche de la feuille) l'emporte"""
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if any(marker in filename for marker in SHEETS_MARKERS):
+            return 'sheets'
+        if any(marker in filename for marker in SQL_MARKERS):
+            return 'sql'
+        frame = frame.f_back
+    return 'app'
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _runs(frame, code=None, directory: str = None) -> bool:
+    while frame is not None:
+        if code is not None and frame.f_code is code:
+            return True
+        if directory is not None and frame.f_code.co_filename.startswith(directory):
+            return True
+        frame = frame.f_back
+    return False
+
+
+class StackSampler:
+    """Relève périodiquement les piles liées à une requête"""
+
+    def __init__(self, scope: dict, interval: float):
+        self.scope = scope
+        self.interval = interval
+        self.loop_ident = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> float:
+        self._stop.set()
+        self._thread.join()
+        return time.perf_counter() - self.started
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            # Code de l'endpoint, connu une fois la route résolue
+            endpoint = getattr(self.scope.get('endpoint'), '__code__', None)
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident == self.loop_ident:
+                    if not _runs(frame, directory=APP_DIR):
+                        continue  # boucle en attente (I/O, pool de threads)
+                elif endpoint is None or not _runs(frame, code=endpoint):
+                    continue
+                self.stacks[f'[{_tag(frame)}];{_collapse(frame)}'] += 1
+                self.samples += 1
+
+
+def profile_path(profile_id: str, extension: str) -> str:
+    return os.path.join(settings.PROFILING_DIR, f'{profile_id}.{extension}')
+
+
+def save_profile(profile_id: str, scope: dict, sampler: StackSampler, duration: float) -> Dict:
+    by_tag: Dict[str, int] = {}
+    for stack, count in sampler.stacks.items():
+        tag = stack[1:stack.index(']')]
+        by_tag[tag] = by_tag.get(tag, 0) + count
+    interval_ms = sampler.interval * 1000
+    route = getattr(scope.get('route'), 'path', None)
+    summary = {
+        'id': profile_id,
+        'method': scope['method'],
+        'path': scope['path'],
+        'route': route,
+        'duration_ms': round(duration * 1000, 1),
+        'interval_ms': interval_ms,
+        'samples': sampler.samples,
+        # Temps estimé par couche = échantillons x intervalle
+        'by_tag_ms': {tag: round(count * interval_ms, 1) for tag, count in sorted(by_tag.items())},
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    with open(profile_path(profile_id, 'collapsed'), 'w', encoding='utf-8') as f:
+        for stack, count in sampler.stacks.most_common():
+            f.write(f'{stack} {count}\n')
+    with open(profile_path(profile_id, 'json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def _valid_token(token: Optional[str]) -> bool:
+    return bool(settings.PROFILING_TOKEN and token) and hmac.compare_digest(token, settings.PROFILING_TOKEN)
+
+
+def _requested_token(scope: dict) -> Optional[str]:
+    for name, value in scope.get('headers', []):
+        if name == b'x-profile-token':
+            return value.decode('latin-1')
+    query = scope.get('query_string', b'').decode('latin-1')
+    for part in query.split('&'):
+        if part.startswith('profile='):
+            return part[len('profile='):]
+    return None
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI : ne coûte qu'un test quand le profilage n'est pas demandé"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _should_profile(self, scope: dict) -> bool:
+        if scope['type'] != 'http' or scope['path'].startswith('/debug/profiles'):
+            return False
+        if settings.PROFILING_TOKEN and _valid_token(_requested_token(scope)):
+            return True
+        return settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                message.setdefault('headers', [])
+                message['headers'] = list(message['headers']) + [(b'x-profile-id', profile_id.encode())]
+            await send(message)
+
+        sampler = StackSampler(scope, settings.PROFILING_INTERVAL_MS / 1000)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = sampler.stop()
+            try:
+                summary = save_profile(profile_id, scope, sampler, duration)
+                print(f"🔬 Profil {profile_id} {scope['method']} {scope['path']}: "
+                      f"{summary['duration_ms']} ms, {summary['by_tag_ms']}")
+            except OSError as e:
+                print(f"❌ Profil {profile_id} non enregistré: {e}")
+
+
+# ============= CONSULTATION =============
+
+router = APIRouter()
+
+
+@router.get("/debug/profiles/{profile_id}", include_in_schema=False)
+def get_profile(
+    profile_id: str,
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    x_profile_token: Optional[str] = Header(None)
+):
+    """Récupérer un profil enregistré (résumé JSON ou piles "collapsed")"""
+    if not _valid_token(x_profile_token):
+        raise HTTPException(status_code=403, detail="Accès refusé")
+    if not profile_id.isalnum():
+        raise HTTPException(status_code=404, detail="Profil non trouvé")
+    path = profile_path(profile_id, format)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profil non trouvé")
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    if format == 'json':
+        return json.loads(content)
+    return PlainTextResponse(content)
@@ -0,0 +1,128 @@
+"""
+Requêtes SQL par requête HTTP : nombre, durée cumulée et détection des N+1.
+
+Les événements SQLAlchemy de `metrics.instrument_engine` appellent `record()`
+pour chaque requête exécutée. `QueryStatsMiddleware` ouvre un compteur par
+requête HTTP (variable de contexte, propagée aux threads des routes `def`),
+l'expose dans l'en-tête `Server-Timing` (onglet Timing des outils de
+développement) et journalise les requêtes qui dépassent `SQL_QUERY_BUDGET`,
+avec l'instruction la plus répétée : c'est la signature d'un N+1 (parcours
+d'une relation objet par objet).
+
+`assert_max_queries` vérifie le nombre de requêtes d'un bloc de code, quel que
+soit le thread qui les exécute (TestClient lance l'application dans un autre
+thread). Les budgets par route sont vérifiés par tests/test_query_budgets.py.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class QueryStats:
+    """Requêtes SQL comptées pendant une requête HTTP (ou un bloc `assert_max_queries`)"""
+
+    __slots__ = ('count', 'duration', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+
+    def add(self, statement: str, elapsed: float):
+        self.count += 1
+        self.duration += elapsed
+        # Instructions paramétrées (?, %(x)s) : un N+1 répète exactement le même texte
+        self.statements[statement] += 1
+
+    def most_repeated(self) -> Optional[Tuple[str, int]]:
+        if not self.statements:
+            return None
+        return self.statements.most_common(1)[0]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar('query_stats', default=None)
+_captures: List[QueryStats] = []
+_captures_lock = threading.Lock()
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def record(statement: str, elapsed: float):
+    """Appelé après chaque requête SQL (événement after_cursor_execute)"""
+    stats = _current.get()
+    if stats is not None:
+        stats.add(statement, elapsed)
+    if _captures:
+        with _captures_lock:
+            for capture in _captures:
+                capture.add(statement, elapsed)
+
+
+def _shorten(statement: str, width: int = 160) -> str:
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= width else statement[:width - 1] + '…'
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryStats]:
+    """Compte toutes les requêtes SQL exécutées pendant le bloc, tous threads confondus"""
+    stats = QueryStats()
+    with _captures_lock:
+        _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(maximum: int, label: str = '') -> Iterator[QueryStats]:
+    """Échoue (AssertionError) si le bloc exécute plus de `maximum` requêtes SQL"""
+    with capture_queries() as stats:
+        yield stats
+    if stats.count > maximum:
+        detail = '\n'.join(f'  {n}× {_shorten(statement)}' for statement, n in stats.statements.most_common(5))
+        raise AssertionError(f'{label or "bloc"} : {stats.count} requêtes SQL (maximum {maximum})\n{detail}')
+
+
+class QueryStatsMiddleware:
+    """Middleware ASGI pur : en-tête Server-Timing et journal des requêtes hors budget"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start' and settings.SQL_SERVER_TIMING:
+                elapsed = (time.perf_counter() - start) * 1000
+                # Valeur d'en-tête en ASCII
+                timing = f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} SQL", app;dur={elapsed:.1f}'
+                message['headers'] = list(message.get('headers', [])) + [(b'server-timing', timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if stats.count > settings.SQL_QUERY_BUDGET:
+                route = getattr(scope.get('route'), 'path', None) or scope['path']
+                statement, repeated = stats.most_repeated()
+                print(f"⚠️ {scope['method']} {route} : {stats.count} requêtes SQL "
+                      f"(budget {settings.SQL_QUERY_BUDGET}), {stats.duration * 1000:.1f} ms ; "
+                      f"la plus répétée ({repeated}×) : {_shorten(statement)}")
@@ -0,0 +1,172 @@
+"""
+Cache des réponses de lecture par hôpital (profil, services, équipements, localisation, capacité).
+
+Ces routes sont relues à chaque rafraîchissement du tableau de bord alors
+qu'elles changent rarement. La réponse est gardée sous la clé (route,
+hospital_id, paramètres de requête) pendant `RESPONSE_CACHE_TTL_SECONDS` au
+plus, et chaque écriture correspondante (POST/PUT/DELETE, lots, compteurs)
+appelle `invalidate(route, hospital_id)` après son commit.
+
+L'invalidation incrémente une génération par (route, hôpital) au lieu de
+parcourir les clés : une entrée n'est servie que si elle a été calculée sous
+la génération courante. Une réponse lue pendant une écriture concurrente est
+donc ignorée au lieu de masquer cette écriture jusqu'à expiration.
+
+Deux stockages :
+- mémoire (par défaut) : LRU borné à `RESPONSE_CACHE_MAX_ENTRIES`, propre au
+  worker ; avec plusieurs workers, une écriture faite par un autre worker est
+  visible au plus tard après le TTL ;
+- Redis ou compatible (Valkey, KeyDB...) si `RESPONSE_CACHE_URL` est défini :
+  partagé entre workers, invalidation immédiate partout, mémoire bornée par la
+  politique `maxmemory` du serveur. Nécessite le paquet `redis` ; si le
+  serveur ne répond pas, les réponses sont recalculées (cache contourné).
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import caches
+
+Key = Tuple[str, int, str]          # (route, hospital_id, paramètres de requête)
+Entry = Tuple[int, Any]             # (génération, réponse)
+
+
+class MemoryBackend:
+    """LRU + TTL en mémoire, propre au worker"""
+
+    errors: Tuple[type, ...] = ()
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Key, Tuple[float, int, Any]]' = OrderedDict()
+        self._generations: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def load(self, key: Key) -> Tuple[int, Optional[Entry]]:
+        """Génération courante et entrée non expirée (ou None)"""
+        route, hospital_id, _ = key
+        with self._lock:
+            generation = self._generations.get((route, hospital_id), 0)
+            entry = self._entries.get(key)
+            if entry is None:
+                return generation, None
+            expires, stored, body = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return generation, None
+            self._entries.move_to_end(key)
+            return generation, (stored, body)
+
+    def store(self, key: Key, generation: int, body: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, generation, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump(self, route: str, hospital_id: int):
+        with self._lock:
+            self._generations[(route, hospital_id)] = self._generations.get((route, hospital_id), 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Redis ou compatible, partagé entre workers ; l'expiration est confiée au serveur"""
+
+    PREFIX = 'pulseai:responses'
+
+    def __init__(self, url: str):
+        import redis  # dépendance optionnelle, seulement avec RESPONSE_CACHE_URL
+
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.errors = (redis.RedisError,)
+
+    def _generation_key(self, route: str, hospital_id: int) -> str:
+        return f'{self.PREFIX}:gen:{route}:{hospital_id}'
+
+    def _entry_key(self, key: Key) -> str:
+        route, hospital_id, query = key
+        return f'{self.PREFIX}:entry:{route}:{hospital_id}:{query}'
+
+    def load(self, key: Key) -> Tuple[int, Optional[Entry]]:
+        # Génération et entrée en un seul aller-retour
+        generation, raw = self._client.mget(self._generation_key(*key[:2]), self._entry_key(key))
+        if raw is None:
+            return int(generation or 0), None
+        stored, body = json.loads(raw)
+        return int(generation or 0), (stored, body)
+
+    def store(self, key: Key, generation: int, body: Any, ttl: float):
+        self._client.set(self._entry_key(key), json.dumps([generation, body]), px=max(1, int(ttl * 1000)))
+
+    def bump(self, route: str, hospital_id: int):
+        self._client.incr(self._generation_key(route, hospital_id))
+
+
+class ResponseCache:
+    """Réponses JSON par (route, hôpital, paramètres), invalidées par génération"""
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._warned = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _unavailable(self, error: Exception):
+        # Un seul message tant que le stockage reste indisponible
+        if not self._warned:
+            print(f"⚠️ Cache des réponses indisponible, réponses recalculées : {error}")
+            self._warned = True
+
+    def fetch(self, route: str, hospital_id: int, build: Callable[[], Any], query: str = '') -> Any:
+        """Réponse en cache si elle est à jour, sinon `build()` (mise en cache au passage)"""
+        if not self.enabled:
+            return build()
+        key = (route, hospital_id, query)
+        try:
+            generation, entry = self.backend.load(key)
+        except self.backend.errors as e:
+            self._unavailable(e)
+            return build()
+        hit = entry is not None and entry[0] == generation
+        caches.record(f'responses_{route}', hit)
+        if hit:
+            return entry[1]
+
+        body = build()
+        try:
+            self.backend.store(key, generation, body, self.ttl)
+            self._warned = False
+        except self.backend.errors as e:
+            self._unavailable(e)
+        return body
+
+    def invalidate(self, route: str, hospital_id: int):
+        """À appeler après le commit d'une écriture qui change la réponse de `route`"""
+        if not self.enabled:
+            return
+        try:
+            self.backend.bump(route, hospital_id)
+        except self.backend.errors as e:
+            self._unavailable(e)
+
+
+def _backend():
+    if settings.RESPONSE_CACHE_URL:
+        try:
+            return RedisBackend(settings.RESPONSE_CACHE_URL)
+        except ImportError:
+            print("⚠️ RESPONSE_CACHE_URL défini mais le paquet redis n'est pas installé : cache en mémoire")
+    return MemoryBackend(settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+
+# Instance globale, partagée par les routes
+response_cache = ResponseCache(_backend(), settings.RESPONSE_CACHE_TTL_SECONDS)
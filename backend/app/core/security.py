@@ -1,9 +1,26 @@
-from passlib.context import CryptContext
+import hmac
+from functools import lru_cache
+from typing import Optional
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.config import settings
+
+# passlib/bcrypt est chargé au premier hachage, pas au démarrage
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+def verify_api_key(api_key: Optional[str]) -> bool:
+    """Clé d'API d'intégration valide (comparaison à temps constant)"""
+    if not api_key:
+        return False
+    return any(hmac.compare_digest(api_key, key) for key in settings.INTEGRATION_API_KEYS)
@@ -1,11 +1,13 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False}
 )
+instrument_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -0,0 +1,131 @@
+"""
+Opérations groupées (création, modification, suppression) sur les lignes d'un hôpital.
+
+Toutes les opérations d'un lot sont validées avant la moindre écriture : un id
+inconnu ou appartenant à un autre hôpital, une création incomplète ou deux
+opérations sur le même élément rejettent tout le lot. Un lot valide est ensuite
+appliqué dans une seule transaction : un seul `INSERT ... RETURNING id`
+multi-lignes pour les créations (un `INSERT` par ligne si la base ne le prend
+pas en charge), `bulk_update_mappings` pour les modifications et un seul
+`DELETE ... WHERE id IN` pour les suppressions.
+"""
+from typing import Dict, List, Any, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import bindparam, insert, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+
+from app.db.base import Base
+
+BATCH_STATUS = {"create": "created", "update": "updated", "delete": "deleted"}
+
+
+def _validate(model: Type[Base], create_schema: Type[BaseModel], operations: List[Any],
+              owned: set) -> List[List[str]]:
+    """Erreurs de chaque opération (liste vide si l'opération est valide)"""
+    required = {column.name for column in model.__table__.columns if not column.nullable}
+    errors: List[List[str]] = [[] for _ in operations]
+    seen: Dict[int, int] = {}
+    for index, operation in enumerate(operations):
+        op_errors = errors[index]
+        data = operation.data.model_dump(exclude_unset=True) if operation.data else {}
+        if operation.op == "create":
+            if operation.id is not None:
+                op_errors.append("Une création ne doit pas préciser d'id")
+            try:
+                create_schema.model_validate({k: v for k, v in data.items() if v is not None})
+            except ValidationError as e:
+                op_errors.extend(f"{'.'.join(map(str, err['loc']))} : {err['msg']}" for err in e.errors())
+            continue
+        if operation.id is None:
+            op_errors.append("L'id est obligatoire")
+            continue
+        if operation.id not in owned:
+            op_errors.append("Élément non trouvé")
+        elif operation.id in seen:
+            op_errors.append(f"Élément déjà modifié par l'opération {seen[operation.id]}")
+        seen.setdefault(operation.id, index)
+        if operation.op == "update":
+            if not data:
+                op_errors.append("Aucune modification")
+            op_errors.extend(f"{key} ne peut pas être vide" for key, value in data.items()
+                             if value is None and key in required)
+    return errors
+
+
+def _sqlite_insert_returning(db: Session, model: Type[Base], rows: List[Dict[str, Any]]) -> List[int]:
+    """INSERT multi-lignes ... RETURNING id sous SQLite (SQLAlchemy 1.4 ne sait pas le compiler)"""
+    compiled = insert(model).values(rows).compile(dialect=sqlite.dialect(paramstyle="named"))
+    statement = text(f"{compiled} RETURNING {model.id.name}").bindparams(*[
+        bindparam(compiled.bind_names[bind], bind.effective_value, type_=bind.type)
+        for bind in compiled.binds.values()
+    ])
+    # Les lignes de RETURNING arrivent dans un ordre arbitraire ; les rowid, eux,
+    # croissent dans l'ordre des VALUES (chaque ligne reçoit le plus grand rowid + 1)
+    return sorted(db.execute(statement).scalars())
+
+
+def _insert_rows(db: Session, model: Type[Base], rows: List[Dict[str, Any]]) -> List[int]:
+    """Insère les lignes et renvoie leurs id, dans l'ordre"""
+    dialect = db.get_bind().dialect
+    if dialect.full_returning:
+        # PostgreSQL : INSERT ... VALUES (...), (...) RETURNING id
+        return list(db.execute(insert(model).values(rows).returning(model.id)).scalars())
+    if dialect.name == "sqlite" and dialect.dbapi.sqlite_version_info >= (3, 35):
+        return _sqlite_insert_returning(db, model, rows)
+    # Autres bases : une instruction par ligne pour connaître chaque id
+    db.bulk_insert_mappings(model, rows, return_defaults=True)
+    return [row["id"] for row in rows]
+
+
+def apply_batch(db: Session, model: Type[Base], create_schema: Type[BaseModel],
+                hospital_id: int, operations: List[Any]) -> Dict[str, Any]:
+    """Valide puis applique un lot d'opérations ; renvoie le résultat de chacune.
+
+    `operations` : objets avec `op` ("create", "update" ou "delete"), `id` et
+    `data` (schéma de modification, champs optionnels).
+    """
+    ids = {operation.id for operation in operations if operation.id is not None}
+    owned = {
+        row_id for (row_id,) in
+        db.query(model.id).filter(model.id.in_(ids), model.hospital_id == hospital_id)
+    } if ids else set()
+    errors = _validate(model, create_schema, operations, owned)
+
+    results = [{"index": index, "op": operation.op, "id": operation.id} for index, operation in enumerate(operations)]
+    if any(errors):
+        for result, op_errors in zip(results, errors):
+            result["status"] = "rejected" if op_errors else "skipped"
+            if op_errors:
+                result["errors"] = op_errors
+        return {"applied": False, "results": results}
+
+    creates, updates, deletes = [], [], []
+    for index, operation in enumerate(operations):
+        data = operation.data.model_dump(exclude_unset=True) if operation.data else {}
+        if operation.op == "create":
+            row = create_schema.model_validate({k: v for k, v in data.items() if v is not None}).model_dump()
+            creates.append((index, dict(row, hospital_id=hospital_id)))
+        elif operation.op == "update":
+            updates.append(dict(data, id=operation.id))
+        else:
+            deletes.append(operation.id)
+
+    try:
+        if creates:
+            new_ids = _insert_rows(db, model, [row for _, row in creates])
+            for (index, _), new_id in zip(creates, new_ids):
+                results[index]["id"] = new_id
+        if updates:
+            db.bulk_update_mappings(model, updates)
+        if deletes:
+            db.query(model).filter(model.id.in_(deletes)).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    for result in results:
+        result["status"] = BATCH_STATUS[result["op"]]
+    return {"applied": True, "results": results}
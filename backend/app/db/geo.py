@@ -0,0 +1,121 @@
+"""
+Recherche de proximité sur les localisations SQL.
+
+Deux étapes :
+1. filtre par la boîte englobante du cercle de recherche, servi par l'index
+   spatial de la migration 0003 (R*Tree `locations_rtree` sous SQLite, index
+   B-tree (latitude, longitude) ailleurs) : seules les localisations proches
+   sont lues, quel que soit le nombre d'établissements ;
+2. distance exacte (haversine) sur ces candidates, rayon appliqué, puis les
+   `limit` plus proches.
+"""
+import heapq
+import math
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table, and_, or_
+from sqlalchemy.orm import Session
+
+from app.db.models.hospital import Hospital
+from app.db.models.location import Location
+
+EARTH_RADIUS_KM = 6371
+
+# Table virtuelle créée par la migration 0003 (hors Base.metadata : create_all l'ignore)
+locations_rtree = Table(
+    "locations_rtree", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("min_lat", Float), Column("max_lat", Float),
+    Column("min_lon", Float), Column("max_lon", Float),
+)
+
+
+def _sqlite_rtree_available() -> bool:
+    """Module R*Tree compilé dans la bibliothèque SQLite du processus (même test que la migration)"""
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE probe USING rtree(id, min_x, max_x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+SQLITE_RTREE = _sqlite_rtree_available()
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float
+                 ) -> Tuple[float, float, List[Tuple[float, float]]]:
+    """(latitude min, latitude max, intervalles de longitude) contenant le cercle.
+
+    Deux intervalles de longitude si le cercle traverse l'antiméridien, toutes
+    les longitudes s'il contient un pôle.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    lat = math.radians(latitude)
+    min_lat, max_lat = lat - angle, lat + angle
+    if min_lat <= -math.pi / 2 or max_lat >= math.pi / 2:
+        return max(math.degrees(min_lat), -90.0), min(math.degrees(max_lat), 90.0), [(-180.0, 180.0)]
+
+    delta = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(lat))))
+    min_lon, max_lon = longitude - delta, longitude + delta
+    if min_lon < -180:
+        ranges = [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    elif max_lon > 180:
+        ranges = [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    else:
+        ranges = [(min_lon, max_lon)]
+    return math.degrees(min_lat), math.degrees(max_lat), ranges
+
+
+def _any_range(column_min, column_max, ranges: List[Tuple[float, float]]):
+    conditions = [and_(column_max >= low, column_min <= high) for low, high in ranges]
+    return conditions[0] if len(conditions) == 1 else or_(*conditions)
+
+
+def candidates_query(db: Session, latitude: float, longitude: float, radius_km: float,
+                     exclude_hospital_id: Optional[int] = None):
+    """Localisations de la boîte englobante du cercle (requête servie par l'index spatial)"""
+    min_lat, max_lat, ranges = bounding_box(latitude, longitude, radius_km)
+    query = db.query(
+        Location.hospital_id, Hospital.name, Location.latitude, Location.longitude, Location.city, Location.region
+    )
+    if db.get_bind().dialect.name == "sqlite" and SQLITE_RTREE:
+        box = locations_rtree.c
+        query = (
+            query.select_from(locations_rtree)
+            .join(Location, Location.id == box.id)
+            .filter(box.max_lat >= min_lat, box.min_lat <= max_lat, _any_range(box.min_lon, box.max_lon, ranges))
+        )
+    else:
+        query = query.select_from(Location).filter(
+            Location.latitude.between(min_lat, max_lat),
+            _any_range(Location.longitude, Location.longitude, ranges),
+        )
+    query = query.join(Hospital, Hospital.id == Location.hospital_id)
+    if exclude_hospital_id is not None:
+        query = query.filter(Location.hospital_id != exclude_hospital_id)
+    return query
+
+
+def nearby(db: Session, latitude: float, longitude: float, radius_km: float, limit: int,
+           exclude_hospital_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Établissements à moins de `radius_km` du point, du plus proche au plus lointain"""
+    results = []
+    for hospital_id, name, lat, lon, city, region in candidates_query(
+        db, latitude, longitude, radius_km, exclude_hospital_id
+    ):
+        if lat is None or lon is None or (lat == 0 and lon == 0):
+            continue
+        distance = haversine_km(latitude, longitude, lat, lon)
+        if distance <= radius_km:
+            results.append({
+                "hospital_id": hospital_id, "name": name, "latitude": lat, "longitude": lon,
+                "city": city, "region": region, "distance_km": round(distance, 2),
+            })
+    return heapq.nsmallest(limit, results, key=lambda result: result["distance_km"])
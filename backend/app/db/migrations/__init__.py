@@ -0,0 +1,86 @@
+"""
+Migrations du schéma SQL (`app.db.models`).
+
+Chaque migration est un module `mNNNN_<nom>.py` de ce paquet qui expose
+`upgrade(connection)`. Les versions appliquées sont enregistrées dans la table
+`schema_migrations` ; `upgrade()` applique dans l'ordre celles qui manquent,
+chacune dans sa propre transaction.
+
+Plusieurs workers peuvent démarrer en même temps : chaque migration doit donc
+être idempotente (`checkfirst`, `IF NOT EXISTS`), et le worker qui perd la
+course à l'enregistrement de la version se contente d'ignorer l'erreur.
+
+Usage (depuis backend/) :
+    python -m app.db.migrations [upgrade|status]
+"""
+import importlib
+import pkgutil
+import re
+import time
+from datetime import datetime
+from types import ModuleType
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", String, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+_MODULE_NAME = re.compile(r"^m(\d{4})_(\w+)$")
+
+
+def discover() -> List[Tuple[str, str, ModuleType]]:
+    """Migrations du paquet, triées par version : (version, nom, module)"""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _MODULE_NAME.match(info.name)
+        if match:
+            module = importlib.import_module(f"{__name__}.{info.name}")
+            migrations.append((match.group(1), match.group(2), module))
+    return sorted(migrations, key=lambda migration: migration[0])
+
+
+def applied_versions(connection: Connection) -> set:
+    return {version for (version,) in connection.execute(select(schema_migrations.c.version))}
+
+
+def _default_engine() -> Engine:
+    from app.db.base import engine
+    return engine
+
+
+def upgrade(engine: Optional[Engine] = None) -> List[str]:
+    """Applique les migrations manquantes ; renvoie les versions appliquées"""
+    engine = engine or _default_engine()
+    schema_migrations.create(engine, checkfirst=True)
+    applied = []
+    for version, name, module in discover():
+        start = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                if version in applied_versions(connection):
+                    continue
+                module.upgrade(connection)
+                connection.execute(schema_migrations.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            continue  # appliquée entre-temps par un autre worker
+        applied.append(version)
+        print(f"🗄️ Migration {version} ({name}) appliquée en {(time.perf_counter() - start) * 1000:.0f} ms")
+    return applied
+
+
+def status(engine: Optional[Engine] = None) -> List[Tuple[str, str, Optional[datetime]]]:
+    """(version, nom, date d'application ou None) de chaque migration connue"""
+    engine = engine or _default_engine()
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        dates = dict(connection.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at)).all())
+    return [(version, name, dates.get(version)) for version, name, _ in discover()]
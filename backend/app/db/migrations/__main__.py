@@ -0,0 +1,14 @@
+import argparse
+
+from app.db.migrations import status, upgrade
+
+parser = argparse.ArgumentParser(prog="python -m app.db.migrations", description="Migrations du schéma SQL")
+parser.add_argument("command", nargs="?", choices=("upgrade", "status"), default="upgrade")
+args = parser.parse_args()
+
+if args.command == "upgrade":
+    if not upgrade():
+        print("✅ Schéma à jour")
+else:
+    for version, name, applied_at in status():
+        print(f"{version}  {name:<32} {applied_at.isoformat(' ', 'seconds') if applied_at else 'en attente'}")
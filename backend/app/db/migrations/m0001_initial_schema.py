@@ -0,0 +1,67 @@
+"""
+Schéma initial : tables créées jusqu'ici directement depuis les modèles.
+
+Les tables sont figées ici (et non importées de `app.db.models`) pour que la
+migration reste la même quand les modèles évoluent. `checkfirst` laisse
+intactes les tables des bases déjà en service.
+"""
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+Table(
+    "hospitals", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, nullable=False),
+    Column("email", String, unique=True, index=True, nullable=False),
+    Column("password", String, nullable=False),
+    Column("address", String),
+    Column("phone", String),
+)
+
+Table(
+    "services", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, nullable=False),
+    Column("description", String),
+    Column("hospital_id", Integer, ForeignKey("hospitals.id"), nullable=False),
+)
+
+Table(
+    "capacity", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("hospital_id", Integer, ForeignKey("hospitals.id"), unique=True, nullable=False),
+    Column("beds", Integer),
+    Column("occupied_beds", Integer),
+    Column("total_doctors", Integer),
+    Column("active_doctors", Integer),
+    Column("total_nurses", Integer),
+    Column("active_nurses", Integer),
+    Column("waiting_queue", Integer),
+    Column("average_wait_time", Integer),
+)
+
+Table(
+    "locations", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("hospital_id", Integer, ForeignKey("hospitals.id"), unique=True, nullable=False),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("city", String),
+    Column("region", String),
+    Column("country", String),
+)
+
+Table(
+    "equipment", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, nullable=False),
+    Column("quantity", Integer),
+    Column("available", Boolean),
+    Column("hospital_id", Integer, ForeignKey("hospitals.id"), nullable=False),
+)
+
+
+def upgrade(connection: Connection):
+    metadata.create_all(connection, checkfirst=True)
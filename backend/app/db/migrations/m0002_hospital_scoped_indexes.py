@@ -0,0 +1,24 @@
+"""
+Index (hospital_id, id) sur services et equipment.
+
+Les listes filtrent sur `hospital_id` et les modifications/suppressions
+cherchent `id = ? AND hospital_id = ?` : sans index, chaque appel parcourt
+toute la table. L'index composite sert les deux (préfixe `hospital_id`) et
+rend les listes déjà triées par id.
+"""
+from sqlalchemy import Column, Index, Integer, MetaData, Table
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+services = Table("services", metadata, Column("id", Integer), Column("hospital_id", Integer))
+equipment = Table("equipment", metadata, Column("id", Integer), Column("hospital_id", Integer))
+
+INDEXES = [
+    Index("ix_services_hospital_id_id", services.c.hospital_id, services.c.id),
+    Index("ix_equipment_hospital_id_id", equipment.c.hospital_id, equipment.c.id),
+]
+
+def upgrade(connection: Connection):
+    for index in INDEXES:
+        index.create(connection, checkfirst=True)
@@ -0,0 +1,68 @@
+"""
+Index spatial des localisations (recherche de proximité, GET /location/nearby).
+
+SQLite : table virtuelle R*Tree `locations_rtree` (un point par localisation :
+id, latitude min/max, longitude min/max), remplie à partir des lignes
+existantes puis tenue à jour par des déclencheurs sur `locations` (création,
+modification des coordonnées, suppression). create_location, update_location
+et les insertions groupées n'ont donc rien à faire de plus.
+
+Autres bases, ou SQLite compilé sans R*Tree : index B-tree (latitude,
+longitude), qui sert le filtre par latitude de la même requête.
+
+Les coordonnées absentes ou (0, 0), valeur des localisations non renseignées,
+ne sont pas indexées.
+"""
+from sqlalchemy import Column, Float, Index, Integer, MetaData, Table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+
+metadata = MetaData()
+
+locations = Table("locations", metadata, Column("id", Integer),
+                  Column("latitude", Float), Column("longitude", Float))
+
+BTREE_INDEX = Index("ix_locations_latitude_longitude", locations.c.latitude, locations.c.longitude)
+
+INDEXED = "{row}.latitude IS NOT NULL AND {row}.longitude IS NOT NULL AND NOT ({row}.latitude = 0 AND {row}.longitude = 0)"
+POINT = "{row}.id, {row}.latitude, {row}.latitude, {row}.longitude, {row}.longitude"
+
+TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS locations_rtree_insert AFTER INSERT ON locations
+    WHEN {INDEXED.format(row="new")}
+    BEGIN
+        INSERT OR REPLACE INTO locations_rtree VALUES ({POINT.format(row="new")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS locations_rtree_update AFTER UPDATE OF latitude, longitude ON locations
+    BEGIN
+        DELETE FROM locations_rtree WHERE id = old.id;
+        INSERT INTO locations_rtree SELECT {POINT.format(row="new")} WHERE {INDEXED.format(row="new")};
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS locations_rtree_delete AFTER DELETE ON locations
+    BEGIN
+        DELETE FROM locations_rtree WHERE id = old.id;
+    END""",
+]
+
+
+def _create_rtree(connection: Connection) -> bool:
+    try:
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS locations_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+        ))
+    except OperationalError:
+        # SQLite sans le module rtree
+        return False
+    for trigger in TRIGGERS:
+        connection.execute(text(trigger))
+    connection.execute(text(
+        f"INSERT OR REPLACE INTO locations_rtree SELECT {POINT.format(row='locations')} "
+        f"FROM locations WHERE {INDEXED.format(row='locations')}"
+    ))
+    return True
+
+
+def upgrade(connection: Connection):
+    if connection.dialect.name == "sqlite" and _create_rtree(connection):
+        return
+    BTREE_INDEX.create(connection, checkfirst=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Index, Integer, String, Boolean, ForeignKey
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -11,5 +11,8 @@ class Equipment(Base):
     available = Column(Boolean, default=True)
     hospital_id = Column(Integer, ForeignKey("hospitals.id"), nullable=False)
     
+    # Listes et recherches (id, hospital_id) restreintes à un hôpital (migration 0002)
+    __table_args__ = (Index("ix_equipment_hospital_id_id", "hospital_id", "id"),)
+    
     # Relations
     hospital = relationship("Hospital", back_populates="equipment")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Index, Integer, String, ForeignKey
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -10,5 +10,8 @@ class Service(Base):
     description = Column(String)
     hospital_id = Column(Integer, ForeignKey("hospitals.id"), nullable=False)
     
+    # Listes et recherches (id, hospital_id) restreintes à un hôpital (migration 0002)
+    __table_args__ = (Index("ix_services_hospital_id_id", "hospital_id", "id"),)
+    
     # Relations
     hospital = relationship("Hospital", back_populates="services")
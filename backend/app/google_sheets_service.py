@@ -2,12 +2,32 @@
 Service pour gérer les interactions avec Google Sheets
 """
 import os
-from typing import List, Dict, Optional, Any
+import atexit
+import threading
+from typing import List, Dict, Optional, Tuple, Any
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from datetime import datetime
 import hashlib
+import heapq
+
+from app.core.config import settings
+from app.core.metrics import caches
+from app.sheets_sync import SheetsSnapshot, SheetsSyncWorker, TAB_RANGES, TAB_COLUMNS, PROVISIONAL_ROW_BASE
+from app.sheets_mirror import SheetsMirror
+from app.sheets_shared import SharedSheetsSnapshot, shared_snapshot_supported
+from app.sheets_write_queue import SheetsWriteQueue
+from app.review_aggregates import ReviewAggregates, aggregate_rows
+from app.scoring import ScoringEngine
+from app.hospital_search import HospitalSearchIndex
+from app.sheets_scheduler import (
+    SheetsCallScheduler, PRIORITY_INTERACTIVE, PRIORITY_SYNC
+)
+
+class SheetsUnavailableError(RuntimeError):
+    """Google Sheets non configuré ou injoignable (identifiants absents, API refusée)"""
+
 
 class GoogleSheetsService:
     def __init__(self):
@@ -15,24 +35,75 @@ class GoogleSheetsService:
         self.credentials_json = os.getenv('GOOGLE_CREDENTIALS_JSON')
         # ID du Google Sheet fourni par l'utilisateur
         self.sheet_id = os.getenv('GOOGLE_SHEET_ID', '1SWJT1LKs_ceHoydS-kKk6OfufWzceCaG5FqcoDRrIUQ')
-        self.scopes = ['https://www.googleapis.com/auth/spreadsheets']
-        self.service = None
+        self.scopes = [
+            'https://www.googleapis.com/auth/spreadsheets',
+            # Lecture de la révision du classeur pour la synchronisation incrémentale
+            'https://www.googleapis.com/auth/drive.metadata.readonly',
+        ]
+        # Identifiants en premier : en cas d'échec, rien d'autre n'a été ouvert
+        self.credentials = self._load_credentials()
+        # Un client par thread : httplib2 n'est pas thread-safe (worker de synchro)
+        self._local = threading.local()
+        self._revision_supported = True
+        # Tous les appels API passent par l'ordonnanceur (quota + rejeu 429/5xx)
+        self.scheduler = SheetsCallScheduler(
+            requests_per_minute=settings.SHEETS_QUOTA_REQUESTS_PER_MINUTE,
+            burst=settings.SHEETS_QUOTA_BURST,
+            max_retries=settings.SHEETS_MAX_RETRIES,
+        )
+        # Miroir SQLite persistant si configuré, sinon modèle en mémoire
+        if settings.SHEETS_MIRROR_PATH:
+            self.snapshot = SheetsMirror(settings.SHEETS_MIRROR_PATH)
+        else:
+            self.snapshot = SheetsSnapshot()
+        # Plusieurs workers : Hopitaux et Services lus dans un fichier partagé (un seul rafraîchisseur)
+        if settings.SHEETS_SHARED_SNAPSHOT_PATH:
+            if shared_snapshot_supported():
+                self.snapshot = SharedSheetsSnapshot(
+                    self.snapshot,
+                    settings.SHEETS_SHARED_SNAPSHOT_PATH,
+                    poll_interval=settings.SHEETS_SHARED_SNAPSHOT_POLL_SECONDS,
+                )
+            else:
+                print("⚠️ Instantané partagé indisponible sur cette plateforme (fcntl absent)")
+        self.sync_worker = SheetsSyncWorker(
+            self,
+            self.snapshot,
+            interval=settings.SHEETS_SYNC_INTERVAL_SECONDS,
+            full_reload_ratio=settings.SHEETS_SYNC_FULL_RELOAD_RATIO,
+            full_scan_interval=settings.SHEETS_SYNC_FULL_SCAN_SECONDS,
+        )
+        self.write_queue = SheetsWriteQueue(
+            self,
+            journal_path=settings.SHEETS_WRITE_JOURNAL_PATH,
+            flush_interval=settings.SHEETS_WRITE_BEHIND_INTERVAL_SECONDS,
+            max_batch=settings.SHEETS_WRITE_BEHIND_MAX_BATCH,
+        )
+        self.review_aggregates = ReviewAggregates(settings.SHEETS_REVIEW_AGGREGATES_PATH)
+        self.scoring = ScoringEngine(self)
+        self.search_index = HospitalSearchIndex(self)
+        self.sync_worker.listeners.append(self._on_remote_change)
         self._initialize_service()
     
-    def _initialize_service(self):
-        """Initialise la connexion avec Google Sheets API"""
+    def _on_remote_change(self, sheet_name: str):
+        """Avis modifiés hors de ce service : reconstruire les agrégats à partir du modèle local"""
+        if sheet_name == 'Avis':
+            self.review_aggregates.rebuild(self.snapshot['Avis'].rows())
+    
+    def _load_credentials(self):
+        """Charge les identifiants du compte de service"""
         try:
             # Try to use JSON from environment variable first
             if self.credentials_json and self.credentials_json.strip():
                 import json
                 credentials_info = json.loads(self.credentials_json)
-                credentials = service_account.Credentials.from_service_account_info(
+                return service_account.Credentials.from_service_account_info(
                     credentials_info,
                     scopes=self.scopes
                 )
             elif os.path.exists(self.credentials_path):
                 # Fallback to file if it exists
-                credentials = service_account.Credentials.from_service_account_file(
+                return service_account.Credentials.from_service_account_file(
                     self.credentials_path,
                     scopes=self.scopes
                 )
@@ -41,57 +112,208 @@ class GoogleSheetsService:
                     f"Google credentials not found. Please set GOOGLE_CREDENTIALS_JSON environment variable "
                     f"or provide credentials file at {self.credentials_path}"
                 )
-            self.service = build('sheets', 'v4', credentials=credentials)
-            print(f"✅ Google Sheets Service initialisé avec succès. ID Sheet: {self.sheet_id}")
         except Exception as e:
             print(f"❌ Erreur d'initialisation Google Sheets: {e}")
-            raise
+            raise SheetsUnavailableError(str(e)) from e
+    
+    def _initialize_service(self):
+        """Initialise la connexion avec Google Sheets API"""
+        self.service  # construit le client du thread courant
+        print(f"✅ Google Sheets Service initialisé avec succès. ID Sheet: {self.sheet_id}")
+        if isinstance(self.snapshot, SharedSheetsSnapshot):
+            # Élection du leader avant la 1re passe : elle décide des onglets synchronisés ici
+            self.snapshot.start(self.sync_worker)
+        self.sync_worker.start()
+        self.write_queue.start()
+        # Vider la file et persister les agrégats d'avis avant l'arrêt du processus
+        atexit.register(self.write_queue.stop)
+        atexit.register(self.review_aggregates.save)
+    
+    @property
+    def service(self):
+        """Client Sheets API du thread courant"""
+        client = getattr(self._local, 'sheets', None)
+        if client is None:
+            # Document de découverte embarqué dans googleapiclient : aucun appel réseau
+            client = build('sheets', 'v4', credentials=self.credentials,
+                           static_discovery=True, cache_discovery=False)
+            self._local.sheets = client
+        return client
     
-    def _read_range(self, range_name: str) -> List[List[Any]]:
-        """Lit une plage de cellules"""
+    @property
+    def _drive(self):
+        """Client Drive API du thread courant (métadonnées uniquement)"""
+        client = getattr(self._local, 'drive', None)
+        if client is None:
+            client = build('drive', 'v3', credentials=self.credentials,
+                           static_discovery=True, cache_discovery=False)
+            self._local.drive = client
+        return client
+    
+    def _read_range(self, range_name: str, priority: int = PRIORITY_INTERACTIVE,
+                    strict: bool = False) -> List[List[Any]]:
+        """Lit une plage de cellules (`strict` : l'erreur est propagée au lieu de retourner [])"""
         try:
-            result = self.service.spreadsheets().values().get(
+            result = self.scheduler.execute(self.service.spreadsheets().values().get(
                 spreadsheetId=self.sheet_id,
                 range=range_name
-            ).execute()
+            ), priority)
             return result.get('values', [])
         except HttpError as e:
             print(f"Erreur lecture {range_name}: {e}")
+            if strict:
+                raise
             return []
     
     def _write_range(self, range_name: str, values: List[List[Any]]) -> bool:
         """Écrit dans une plage de cellules"""
         try:
             body = {'values': values}
-            self.service.spreadsheets().values().update(
+            self.scheduler.execute(self.service.spreadsheets().values().update(
                 spreadsheetId=self.sheet_id,
                 range=range_name,
                 valueInputOption='USER_ENTERED',
                 body=body
-            ).execute()
+            ))
+            self.snapshot.apply_update(range_name, values)
             return True
         except HttpError as e:
             print(f"Erreur écriture {range_name}: {e}")
             return False
     
+    def _write_ranges(self, updates: List[tuple]) -> bool:
+        """Écrit plusieurs plages [(plage, valeurs), ...] en un seul appel batchUpdate"""
+        try:
+            body = {
+                'valueInputOption': 'USER_ENTERED',
+                'data': [{'range': range_name, 'values': values} for range_name, values in updates]
+            }
+            self.scheduler.execute(self.service.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.sheet_id,
+                body=body
+            ))
+            for range_name, values in updates:
+                self.snapshot.apply_update(range_name, values)
+            return True
+        except HttpError as e:
+            print(f"Erreur écriture groupée ({len(updates)} plages): {e}")
+            return False
+    
     def _append_row(self, sheet_name: str, values: List[Any]) -> bool:
-        """Ajoute une ligne à la fin d'une feuille"""
+        """Ajoute une ligne à la fin d'une feuille (via la file d'écriture différée si active)"""
+        if self.write_queue.enabled:
+            self.write_queue.enqueue(sheet_name, values)
+            return True
+        updated_range = self._append_rows(sheet_name, [values])
+        if updated_range:
+            self.snapshot.apply_update(updated_range, [values])
+        return updated_range is not None
+    
+    def _append_rows(self, sheet_name: str, rows: List[List[Any]],
+                     priority: int = PRIORITY_INTERACTIVE) -> Optional[str]:
+        """Ajoute plusieurs lignes en un seul appel. Retourne la plage écrite (None si erreur)"""
         try:
-            body = {'values': [values]}
-            self.service.spreadsheets().values().append(
+            body = {'values': rows}
+            result = self.scheduler.execute(self.service.spreadsheets().values().append(
                 spreadsheetId=self.sheet_id,
                 range=f"{sheet_name}!A:Z",
                 valueInputOption='USER_ENTERED',
                 insertDataOption='INSERT_ROWS',
                 body=body
-            ).execute()
-            return True
+            ), priority)
+            return result.get('updates', {}).get('updatedRange', '')
         except HttpError as e:
             print(f"Erreur ajout ligne {sheet_name}: {e}")
-            return False
+            return None
+    
+    def _batch_read(self, ranges: List[str],
+                    priority: int = PRIORITY_INTERACTIVE) -> Optional[List[List[List[Any]]]]:
+        """Lit plusieurs plages en un seul appel (None en cas d'erreur)"""
+        if not ranges:
+            return []
+        try:
+            result = self.scheduler.execute(self.service.spreadsheets().values().batchGet(
+                spreadsheetId=self.sheet_id,
+                ranges=ranges
+            ), priority)
+            return [vr.get('values', []) for vr in result.get('valueRanges', [])]
+        except HttpError as e:
+            print(f"Erreur lecture groupée ({len(ranges)} plages): {e}")
+            return None
+    
+    def _fetch_revision(self) -> Optional[str]:
+        """Révision courante du classeur selon Drive (None si indisponible)"""
+        if not self._revision_supported:
+            return None
+        try:
+            # Quota Drive distinct : pas de jeton Sheets consommé
+            metadata = self.scheduler.execute(self._drive.files().get(
+                fileId=self.sheet_id,
+                fields='version',
+                supportsAllDrives=True
+            ), PRIORITY_SYNC, metered=False)
+            return metadata.get('version')
+        except HttpError as e:
+            # API Drive non activée ou droits insuffisants : on se rabat sur le diff des colonnes clés
+            if e.resp.status in (403, 404):
+                self._revision_supported = False
+            print(f"Révision du classeur indisponible: {e}")
+            return None
+    
+    def _tab_rows(self, sheet_name: str, strict: bool = False) -> List[List[Any]]:
+        """Lignes d'un onglet (sans en-tête), depuis le modèle synchronisé si actif
+        (`strict` : une lecture en échec lève HttpError au lieu de retourner [])"""
+        if self.sync_worker.enabled and self.sync_worker.ensure_loaded(sheet_name):
+            caches.record('sheets_snapshot', True)
+            return self.snapshot[sheet_name].rows()
+        caches.record('sheets_snapshot', False)
+        return self._read_range(f'{sheet_name}!{TAB_RANGES[sheet_name]}', strict=strict)
+    
+    def _rows_where(self, sheet_name: str, column: str, value: str, strict: bool = False) -> List[List[Any]]:
+        """Lignes d'un onglet filtrées sur une colonne (index du miroir si disponible)"""
+        if self.sync_worker.enabled and self.sync_worker.ensure_loaded(sheet_name):
+            caches.record('sheets_snapshot', True)
+            return self.snapshot[sheet_name].find(column, value)
+        col = TAB_COLUMNS[sheet_name].index(column)
+        return [row for row in self._tab_rows(sheet_name, strict) if len(row) > col and row[col] == value]
+    
+    def _rows_lookup(self, sheet_name: str, lookups: List[Tuple[str, str]]) -> Optional[List[List[Any]]]:
+        """Lignes candidates via les index de hachage (colonne, valeur), dans l'ordre de la feuille.
+
+        Insensible à la casse. Retourne None si le modèle synchronisé n'est pas disponible.
+        """
+        if not (self.sync_worker.enabled and self.sync_worker.ensure_loaded(sheet_name)):
+            return None
+        caches.record('sheets_snapshot', True)
+        tab = self.snapshot[sheet_name]
+        found = {}
+        for column, value in lookups:
+            if value:
+                found.update(tab.lookup(column, value))
+        return [found[n] for n in sorted(found)]
+    
+    def sync_status(self) -> Dict[str, Any]:
+        """État de la synchronisation, du miroir local, de la file d'écriture et du quota"""
+        status = self.sync_worker.status()
+        shared = isinstance(self.snapshot, SharedSheetsSnapshot)
+        status['mirror'] = getattr(self.snapshot.base if shared else self.snapshot, 'path', None)
+        status['shared_snapshot'] = self.snapshot.status() if shared else None
+        status['write_queue'] = self.write_queue.status()
+        status['scheduler'] = self.scheduler.status()
+        return status
     
     def _find_row_index(self, sheet_name: str, column_index: int, value: str) -> Optional[int]:
         """Trouve l'index de la ligne (1-based) contenant une valeur spécifique dans une colonne"""
+        if column_index == 0 and self.snapshot.is_loaded(sheet_name):
+            row_index = self.snapshot[sheet_name].row_number(value)
+            if row_index and row_index >= PROVISIONAL_ROW_BASE:
+                # Ligne encore en file d'attente : l'envoyer pour connaître sa position réelle
+                self.write_queue.flush()
+                row_index = self.snapshot[sheet_name].row_number(value)
+                if row_index and row_index >= PROVISIONAL_ROW_BASE:
+                    return None
+            return row_index
+        
         # Lire une plage plus large pour inclure toutes les colonnes potentielles
         data = self._read_range(f'{sheet_name}!A:AC')
         if not data:
@@ -106,7 +328,7 @@ class GoogleSheetsService:
     
     def get_all_hospitals(self) -> List[Dict]:
         """Récupère tous les hôpitaux avec leurs services"""
-        data = self._read_range('Hopitaux!A2:Z1000')
+        data = self._tab_rows('Hopitaux')
         if not data:
             return []
         
@@ -126,7 +348,7 @@ class GoogleSheetsService:
         ]
         
         # Récupérer tous les services
-        services_data = self._read_range('Services!A2:F1000')
+        services_data = self._tab_rows('Services')
         services_by_hospital = {}
         if services_data:
             for service_row in services_data:
@@ -200,8 +422,10 @@ class GoogleSheetsService:
 
     def get_hospital_by_email(self, email: str) -> Dict:
         """Récupère un hôpital par son email avec authentification depuis Utilisateurs"""
-        # 1. Vérifier l'utilisateur dans la feuille Utilisateurs
-        users_data = self._read_range('Utilisateurs!A2:G1000')
+        # 1. Vérifier l'utilisateur dans la feuille Utilisateurs (index email si disponible)
+        users_data = self._rows_lookup('Utilisateurs', [('email', email)])
+        if users_data is None:
+            users_data = self._tab_rows('Utilisateurs')
         user = None
         if users_data:
             user_headers = ['id', 'email', 'password_hash', 'nom_hopital', 'role', 'created_at', 'last_login']
@@ -215,8 +439,10 @@ class GoogleSheetsService:
         if not user:
             return None
         
-        # 2. Récupérer les données de l'hôpital depuis Hopitaux par nom
-        hospitals_data = self._read_range('Hopitaux!A2:X1000')
+        # 2. Récupérer les données de l'hôpital depuis Hopitaux par email ou nom
+        hospitals_data = self._rows_lookup('Hopitaux', [('email', email), ('nom', user.get('nom_hopital', ''))])
+        if hospitals_data is None:
+            hospitals_data = self._tab_rows('Hopitaux')
         if not hospitals_data:
             return None
             
@@ -371,7 +597,7 @@ class GoogleSheetsService:
     
     def get_services_by_hospital(self, hospital_id: str) -> List[Dict]:
         """Récupère tous les services d'un hôpital"""
-        data = self._read_range('Services!A2:L1000')
+        data = self._rows_where('Services', 'hopital_id', hospital_id)
         if not data:
             return []
         
@@ -394,7 +620,7 @@ class GoogleSheetsService:
     
     def search_hospitals_by_service(self, service_name: str) -> List[str]:
         """Recherche les hôpitaux proposant un service spécifique"""
-        data = self._read_range('Services!A2:L1000')
+        data = self._tab_rows('Services')
         if not data:
             return []
         
@@ -475,7 +701,10 @@ class GoogleSheetsService:
     
     def get_reviews_by_hospital(self, hospital_id: str) -> List[Dict]:
         """Récupère tous les avis d'un hôpital"""
-        data = self._read_range('Avis!A2:Z1000')
+        return self._reviews_from_rows(self._rows_where('Avis', 'hopital_id', hospital_id), hospital_id)
+    
+    @staticmethod
+    def _reviews_from_rows(data: List[List[Any]], hospital_id: str) -> List[Dict]:
         if not data:
             return []
         
@@ -498,6 +727,11 @@ class GoogleSheetsService:
         
         return reviews
     
+    def get_reviews_with_summary(self, hospital_id: str) -> Tuple[List[Dict], Dict[str, Any]]:
+        """Avis publiés d'un hôpital et leur résumé, l'onglet Avis n'étant lu qu'une fois"""
+        rows = self._rows_where('Avis', 'hopital_id', hospital_id)
+        return self._reviews_from_rows(rows, hospital_id), self.get_rating_summary(hospital_id, rows)
+    
     def add_review(self, hospital_id: str, user_id: str, review_data: Dict) -> bool:
         """Ajoute un avis pour un hôpital et met à jour la note moyenne"""
         review_id = f"AV{datetime.now().strftime('%Y%m%d%H%M%S')}"
@@ -518,39 +752,65 @@ class GoogleSheetsService:
             'Publié'
         ]
         
+        # Avis existants lus avant l'ajout, pour ne pas compter le nouveau deux fois.
+        # Avec la synchronisation : agrégats incrémentaux (changements externes appliqués
+        # par `_on_remote_change`). Sans elle : avis de l'hôpital relus une fois, seul
+        # moyen de voir ceux ajoutés dans la feuille ou par un autre worker
+        if self.sync_worker.enabled:
+            built = self.review_aggregates.ensure_built(lambda: self._tab_rows('Avis', strict=True))
+            existing = None
+        else:
+            try:
+                existing = self._rows_where('Avis', 'hopital_id', hospital_id, strict=True)
+            except HttpError:
+                existing = None
+            built = existing is not None
+        
         if not self._append_row('Avis', row):
             return False
-            
-        # Recalculer la note moyenne de l'hôpital
-        reviews = self.get_reviews_by_hospital(hospital_id)
-        if reviews:
-            # Convertir toutes les notes en float
-            valid_ratings = []
-            for r in reviews:
-                try:
-                    note = float(r['note']) if r['note'] else 0.0
-                    if note > 0:
-                        valid_ratings.append(note)
-                except (ValueError, TypeError):
-                    continue
-            
-            if valid_ratings:
-                avg_rating = sum(valid_ratings) / len(valid_ratings)
-                
-                # Mettre à jour l'hôpital
-                # Colonne T (index 19) = note_moyenne, Colonne U (index 20) = nombre_avis
-                hospital_row_index = self._find_row_index('Hopitaux', 0, hospital_id)
-                if hospital_row_index:
-                    self._write_range(f'Hopitaux!T{hospital_row_index}', [[round(avg_rating, 1)]])
-                    self._write_range(f'Hopitaux!U{hospital_row_index}', [[len(reviews)]])
+        
+        if self.sync_worker.enabled:
+            aggregate = self.review_aggregates.add(hospital_id, new_rating)
+        else:
+            aggregate = aggregate_rows((existing or []) + [row]).get(hospital_id)
+        # Note moyenne et nombre d'avis écrits seulement à partir d'agrégats issus d'une
+        # lecture réussie de l'onglet Avis (sinon la note stockée serait faussée)
+        if built and aggregate['rated']:
+            # Colonne T (index 19) = note_moyenne, Colonne U (index 20) = nombre_avis,
+            # Colonne X (index 23) = updated_at (signale la modification aux autres instances)
+            hospital_row_index = self._find_row_index('Hopitaux', 0, hospital_id)
+            if hospital_row_index:
+                self._write_ranges([
+                    (f'Hopitaux!T{hospital_row_index}:U{hospital_row_index}',
+                     [[ReviewAggregates.hospital_rating(aggregate), aggregate['count']]]),
+                    (f'Hopitaux!X{hospital_row_index}', [[datetime.now().strftime('%Y-%m-%d %H:%M:%S')]]),
+                ])
                 
         return True
+    
+    def get_rating_summary(self, hospital_id: str, rows: Optional[List[List[Any]]] = None) -> Dict[str, Any]:
+        """Nombre d'avis, moyenne et histogramme des notes.
+
+        Avec la synchronisation : depuis les agrégats incrémentaux. Sans elle : calculés
+        sur les avis de l'hôpital (`rows` s'ils ont déjà été lus)."""
+        if self.sync_worker.enabled:
+            self.review_aggregates.ensure_built(lambda: self._tab_rows('Avis', strict=True))
+            aggregate = self.review_aggregates.get(hospital_id)
+        else:
+            if rows is None:
+                rows = self._rows_where('Avis', 'hopital_id', hospital_id)
+            aggregate = aggregate_rows(rows).get(hospital_id)
+        return {
+            'total': aggregate['count'] if aggregate else 0,
+            'note_moyenne': ReviewAggregates.mean(aggregate),
+            'histogramme': aggregate['histogram'] if aggregate else [0] * 6,
+        }
 
     # ============= EQUIPEMENTS =============
 
     def get_equipment_by_hospital(self, hospital_id: str) -> List[Dict]:
         """Récupère tous les équipements d'un hôpital"""
-        data = self._read_range('Equipements!A2:Z1000')
+        data = self._rows_where('Equipements', 'hopital_id', hospital_id)
         if not data:
             return []
         
@@ -620,13 +880,14 @@ class GoogleSheetsService:
     
     # ============= RECHERCHE AVANCÉE =============
     
-    def search_hospitals(self, 
-                        service: Optional[str] = None,
-                        ville: Optional[str] = None,
-                        region: Optional[str] = None,
-                        type_etablissement: Optional[str] = None) -> List[Dict]:
-        """Recherche avancée d'hôpitaux"""
-        hospitals = self.get_all_hospitals()
+    @staticmethod
+    def filter_hospitals(hospitals: List[Dict],
+                         service: Optional[str] = None,
+                         ville: Optional[str] = None,
+                         region: Optional[str] = None,
+                         type_etablissement: Optional[str] = None) -> List[Dict]:
+        """Hôpitaux correspondant aux filtres (nouvelle liste, mêmes dictionnaires)"""
+        hospitals = list(hospitals)
         
         # Filtrer par service si spécifié
         if service:
@@ -656,11 +917,69 @@ class GoogleSheetsService:
         if type_etablissement:
             hospitals = [h for h in hospitals if h.get('type_etablissement', '').lower() == type_etablissement.lower()]
         
-        # Trier par note
-        hospitals.sort(key=lambda x: float(x.get('note_moyenne', 0) or 0), reverse=True)
+        return hospitals
+
+    def search_hospitals(self, 
+                        service: Optional[str] = None,
+                        ville: Optional[str] = None,
+                        region: Optional[str] = None,
+                        type_etablissement: Optional[str] = None,
+                        limit: Optional[int] = None,
+                        hospitals: Optional[List[Dict]] = None) -> List[Dict]:
+        """Recherche avancée d'hôpitaux (les `limit` mieux notés si précisé).
+
+        `hospitals` : dictionnaires déjà chargés (ex. `scoring.source()`), non modifiés ;
+        sinon l'onglet Hopitaux est relu.
+        """
+        if hospitals is None:
+            hospitals = self.get_all_hospitals()
+        hospitals = self.filter_hospitals(hospitals, service, ville, region, type_etablissement)
+        
+        # Trier par note (sélection top-k par tas si une limite est donnée)
+        by_rating = lambda x: float(x.get('note_moyenne', 0) or 0)
+        if limit is not None:
+            return heapq.nlargest(limit, hospitals, key=by_rating)
+        hospitals.sort(key=by_rating, reverse=True)
         
         return hospitals
 
 
-# Instance globale
-sheets_service = GoogleSheetsService()
+class LazyGoogleSheetsService:
+    """Crée GoogleSheetsService au premier usage : l'import du module ne contacte pas Google"""
+
+    def __init__(self):
+        self._instance: Optional[GoogleSheetsService] = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> GoogleSheetsService:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = GoogleSheetsService()
+        return self._instance
+
+    def warm_up(self):
+        """Initialise le service et ses clients en tâche de fond (hook de démarrage)"""
+        try:
+            service = self.get()
+            service._drive
+        except SheetsUnavailableError as e:
+            print(f"⚠️ Google Sheets indisponible au démarrage: {e}")
+
+    def shutdown(self):
+        if self._instance is not None:
+            self._instance.sync_worker.stop()
+            self._instance.write_queue.stop()
+            if isinstance(self._instance.snapshot, SharedSheetsSnapshot):
+                self._instance.snapshot.stop()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+# Instance globale (initialisée au premier accès)
+sheets_service = LazyGoogleSheetsService()
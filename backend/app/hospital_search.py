@@ -0,0 +1,210 @@
+"""
+Recherche plein texte des hôpitaux (nom, ville, région, adresse, description, services).
+
+Un index SQLite FTS5 en mémoire contient un document par hôpital : ses colonnes
+texte de l'onglet Hopitaux et, pour ses services actifs, nom, département et
+spécialités. Le tokenizer `unicode61 remove_diacritics 2` rend la recherche
+insensible à la casse et aux accents (« pediatrie » trouve « Pédiatrie »), les
+index de préfixes (2 et 3 caractères) accélèrent la saisie au fil de l'eau et
+les résultats sont classés par BM25, le nom et la ville pesant plus que la
+description.
+
+L'index suit le modèle synchronisé comme le moteur de score : tant que les
+versions des onglets Hopitaux et Services ne changent pas, rien n'est relu.
+Après une écriture (création ou modification d'hôpital, ajout ou suppression
+de service) ou une synchronisation, les documents sont recalculés et comparés
+aux documents indexés : seuls les hôpitaux modifiés sont réécrits dans FTS5.
+
+Sans FTS5 (SQLite compilé sans l'extension), la même recherche (préfixes,
+accents, pondération par colonne) est faite par un parcours des documents.
+"""
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple, Any
+
+from app.core.metrics import caches
+from app.sheets_sync import TAB_COLUMNS
+
+# Colonnes indexées et leur poids dans le classement BM25
+COLUMN_WEIGHTS = {
+    'nom': 10.0,
+    'ville': 5.0,
+    'region': 3.0,
+    'services': 4.0,
+    'adresse': 2.0,
+    'description': 1.0,
+}
+COLUMNS = tuple(COLUMN_WEIGHTS)
+
+SERVICE_COLUMNS = TAB_COLUMNS['Services']
+SERVICE_HOSPITAL_COL = SERVICE_COLUMNS.index('hopital_id')
+SERVICE_TEXT_COLS = [SERVICE_COLUMNS.index(c) for c in ('nom_service', 'departement', 'specialites')]
+SERVICE_STATUS_COL = SERVICE_COLUMNS.index('statut')
+
+_TERM = re.compile(r'\w+')
+
+Document = Tuple[str, ...]
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents (équivalent de remove_diacritics pour le mode sans FTS5)"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def query_terms(query: str) -> List[str]:
+    """Mots de la requête ; la ponctuation et la syntaxe FTS5 (guillemets, NEAR, *) sont ignorées"""
+    return _TERM.findall(query or '')
+
+
+def _create_index(conn: sqlite3.Connection) -> bool:
+    """Crée la table FTS5 ; False si l'extension n'est pas disponible"""
+    try:
+        conn.execute(
+            f"CREATE VIRTUAL TABLE hospitals_fts USING fts5(hospital_id UNINDEXED, {', '.join(COLUMNS)}, "
+            f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+class HospitalSearchIndex:
+    """Index plein texte des hôpitaux, tenu à jour de façon incrémentale"""
+
+    def __init__(self, sheets=None):
+        self.sheets = sheets
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.fts5 = _create_index(self._conn)
+        if not self.fts5:
+            print("⚠️ SQLite sans FTS5 : recherche plein texte par parcours des documents")
+        self._bm25 = f"bm25(hospitals_fts, 0, {', '.join(str(w) for w in COLUMN_WEIGHTS.values())})"
+        self._docs: Dict[str, Document] = {}
+        self._folded: Dict[str, List[List[str]]] = {}   # mode sans FTS5 : mots de chaque colonne
+        self._rowids: Dict[str, int] = {}
+        self._next_rowid = 1
+        self._hospitals: Dict[str, Dict[str, Any]] = {}
+        self._version = None
+        self._lock = threading.Lock()
+        self.updates = 0
+
+    # ----- Documents -----
+
+    @staticmethod
+    def documents(hospitals: List[Dict[str, Any]], service_rows: List[List[Any]]) -> Dict[str, Document]:
+        """Texte indexé de chaque hôpital, dans l'ordre de COLUMNS"""
+        services: Dict[str, List[str]] = {}
+        for row in service_rows or []:
+            if len(row) <= SERVICE_HOSPITAL_COL:
+                continue
+            if len(row) > SERVICE_STATUS_COL and row[SERVICE_STATUS_COL] == 'Inactif':
+                continue
+            words = [str(row[col]) for col in SERVICE_TEXT_COLS if len(row) > col and row[col]]
+            services.setdefault(row[SERVICE_HOSPITAL_COL], []).extend(words)
+
+        docs = {}
+        for hospital in hospitals:
+            hospital_id = hospital.get('id', '')
+            if not hospital_id:
+                continue
+            values = dict(hospital, services=' '.join(services.get(hospital_id, [])))
+            docs[hospital_id] = tuple(str(values.get(column) or '') for column in COLUMNS)
+        return docs
+
+    def apply(self, docs: Dict[str, Document]) -> int:
+        """Réécrit seulement les documents ajoutés, modifiés ou supprimés. Retourne leur nombre"""
+        removed = [hospital_id for hospital_id in self._docs if hospital_id not in docs]
+        changed = [(hospital_id, doc) for hospital_id, doc in docs.items() if self._docs.get(hospital_id) != doc]
+        if self.fts5:
+            insert = (f'INSERT INTO hospitals_fts (rowid, hospital_id, {", ".join(COLUMNS)}) '
+                      f'VALUES ({", ".join("?" * (len(COLUMNS) + 2))})')
+            with self._conn:
+                for hospital_id in removed:
+                    self._conn.execute('DELETE FROM hospitals_fts WHERE rowid = ?', (self._rowids.pop(hospital_id),))
+                for hospital_id, doc in changed:
+                    rowid = self._rowids.get(hospital_id)
+                    if rowid is None:
+                        rowid = self._rowids[hospital_id] = self._next_rowid
+                        self._next_rowid += 1
+                    else:
+                        self._conn.execute('DELETE FROM hospitals_fts WHERE rowid = ?', (rowid,))
+                    self._conn.execute(insert, (rowid, hospital_id) + doc)
+        else:
+            for hospital_id in removed:
+                self._folded.pop(hospital_id, None)
+            for hospital_id, doc in changed:
+                self._folded[hospital_id] = [query_terms(fold(value)) for value in doc]
+        self._docs = docs
+        self.updates += len(removed) + len(changed)
+        return len(removed) + len(changed)
+
+    # ----- Synchronisation avec le modèle -----
+
+    def _source_version(self):
+        sync = self.sheets.sync_worker
+        snapshot = self.sheets.snapshot
+        if sync.enabled and sync.ensure_loaded('Hopitaux') and sync.ensure_loaded('Services'):
+            return (snapshot['Hopitaux'].version, snapshot['Services'].version)
+        return None
+
+    def refresh(self):
+        """Met l'index à jour si Hopitaux ou Services ont changé (sans modèle synchronisé : à chaque appel)"""
+        version = self._source_version()
+        fresh = version is not None and version == self._version
+        caches.record('search_index', fresh)
+        if fresh:
+            return
+        hospitals = self.sheets.get_all_hospitals()
+        self.apply(self.documents(hospitals, self.sheets._tab_rows('Services')))
+        self._hospitals = {hospital['id']: hospital for hospital in hospitals if hospital.get('id')}
+        self._version = version
+
+    # ----- Recherche -----
+
+    def _match(self, terms: List[str], limit: int) -> List[Tuple[str, float]]:
+        if self.fts5:
+            # Chaque mot entre guillemets (pas de syntaxe FTS5 venant de l'utilisateur), en préfixe
+            expression = ' '.join(f'"{term}"*' for term in terms)
+            cursor = self._conn.execute(
+                f'SELECT hospital_id, {self._bm25} AS rank FROM hospitals_fts '
+                f'WHERE hospitals_fts MATCH ? ORDER BY rank LIMIT ?',
+                (expression, limit)
+            )
+            return [(hospital_id, round(-rank, 4)) for hospital_id, rank in cursor]
+
+        terms = [fold(term) for term in terms]
+        weights = list(COLUMN_WEIGHTS.values())
+        scored = []
+        for hospital_id, columns in self._folded.items():
+            score = 0.0
+            for term in terms:
+                hits = [weight for weight, words in zip(weights, columns)
+                        if any(word.startswith(term) for word in words)]
+                if not hits:
+                    break
+                score += sum(hits)
+            else:
+                scored.append((hospital_id, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Hôpitaux correspondant à tous les mots de `query` (préfixes), du plus pertinent au moins pertinent.
+
+        Chaque hôpital (copie) porte `search_score` : plus il est élevé, plus il est pertinent.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            self.refresh()
+            matches = self._match(terms, limit)
+            return [
+                dict(self._hospitals[hospital_id], search_score=score)
+                for hospital_id, score in matches if hospital_id in self._hospitals
+            ]
+
+    def __len__(self) -> int:
+        return len(self._docs)
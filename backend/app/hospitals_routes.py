@@ -8,7 +8,11 @@ from datetime import datetime
 import math
 
 from .google_sheets_service import sheets_service
+from .opening_hours import parse_opening_hours, is_open, annotate_services
 
+# Routes synchrones (def) : les appels Sheets peuvent attendre le quota ou un
+# rejeu (app.sheets_scheduler) ; FastAPI les exécute dans son pool de threads
+# au lieu de bloquer la boucle d'événements.
 router = APIRouter(prefix="/api/v1/hospitals", tags=["Hospitals"])
 
 
@@ -93,7 +97,7 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
 # ============= ENDPOINTS =============
 
 @router.post("/register")
-async def register_hospital(hospital: HospitalCreate):
+def register_hospital(hospital: HospitalCreate):
     """Enregistrer un nouvel hôpital"""
     # Vérifier si l'email existe déjà
     existing = sheets_service.get_hospital_by_email(hospital.email)
@@ -113,7 +117,7 @@ async def register_hospital(hospital: HospitalCreate):
 
 
 @router.post("/login")
-async def login_hospital(credentials: HospitalLogin):
+def login_hospital(credentials: HospitalLogin):
     """Connexion d'un hôpital"""
     import hashlib
     
@@ -138,7 +142,7 @@ async def login_hospital(credentials: HospitalLogin):
 
 
 @router.post("/verify")
-async def verify_hospital(credentials: HospitalVerify):
+def verify_hospital(credentials: HospitalVerify):
     """
     Vérifie les identifiants d'un hôpital (utilisé par le frontend pour la connexion).
     Retourne {valid: true} si les identifiants sont corrects, {valid: false} sinon.
@@ -167,14 +171,16 @@ async def verify_hospital(credentials: HospitalVerify):
 
 
 @router.get("/search")
-async def search_hospitals(
+def search_hospitals(
     service: Optional[str] = Query(None, description="Service médical recherché"),
     ville: Optional[str] = Query(None, description="Ville"),
     region: Optional[str] = Query(None, description="Région"),
     type_etablissement: Optional[str] = Query(None, description="Type d'établissement"),
     latitude: Optional[float] = Query(None, description="Latitude utilisateur"),
     longitude: Optional[float] = Query(None, description="Longitude utilisateur"),
-    rayon_km: Optional[float] = Query(50.0, description="Rayon de recherche en km")
+    rayon_km: Optional[float] = Query(50.0, description="Rayon de recherche en km"),
+    ouvert_a: Optional[datetime] = Query(None, description="Date/heure pour le test d'ouverture (maintenant par défaut)"),
+    limit: Optional[int] = Query(None, ge=1, description="Nombre maximum de résultats (les meilleurs)")
 ):
     """
     Rechercher des hôpitaux selon différents critères
@@ -183,107 +189,33 @@ async def search_hospitals(
     - Distance (si coordonnées fournies)
     - Note moyenne
     - Disponibilité
+    
+    Avec `limit`, seuls les k meilleurs sont sélectionnés (tas, sans tri complet)
+    puis enrichis de leurs services.
     """
+    with_position = latitude is not None and longitude is not None
     try:
-        # Recherche dans Google Sheets
-        hospitals = sheets_service.search_hospitals(
-            service=service,
-            ville=ville,
-            region=region,
-            type_etablissement=type_etablissement
-        )
+        # Hôpitaux, vecteurs de score et services en cache tant que le modèle ne change pas
+        source = sheets_service.scoring.source()
+        filters = dict(service=service, ville=ville, region=region, type_etablissement=type_etablissement)
+        if with_position:
+            # Seuls la distance et le score sont calculés ; les résultats retenus sont des copies
+            hospitals = sheets_service.scoring.top(
+                sheets_service.filter_hospitals(source.hospitals, **filters),
+                latitude, longitude, rayon_km, limit=limit, when=ouvert_a, vectors=source.vectors
+            )
+        else:
+            hospitals = [dict(h) for h in sheets_service.search_hospitals(
+                **filters, limit=limit, hospitals=source.hospitals
+            )]
     except Exception as e:
         # Return empty list on error to prevent 500
         print(f"Error searching hospitals: {e}")
         return {"hospitals": [], "error": str(e)}
     
-    current_time = datetime.now()
-    current_hour = current_time.hour
-    current_day = current_time.weekday() # 0=Lundi, 6=Dimanche
-    
-    # Ajouter la distance et calculer le score
-    if latitude is not None and longitude is not None:
-        for hospital in hospitals:
-            try:
-                h_lat = float(hospital.get('latitude', 0))
-                h_lon = float(hospital.get('longitude', 0))
-                
-                if h_lat != 0 and h_lon != 0:
-                    distance = calculate_distance(latitude, longitude, h_lat, h_lon)
-                    hospital['distance_km'] = distance
-                else:
-                    hospital['distance_km'] = 999999
-            except (ValueError, TypeError):
-                hospital['distance_km'] = 999999
-                
-            # Calcul du score de recommandation (plus c'est haut, mieux c'est)
-            score = 1000
-            
-            # 1. Pénalité de distance (très forte)
-            score -= (hospital['distance_km'] * 10)
-            
-            # 2. Bonus de note (0-5 étoiles)
-            rating = float(hospital.get('note_moyenne', 0))
-            score += (rating * 50)
-            
-            # 3. Pénalité d'attente (si disponible)
-            wait_time = int(hospital.get('temps_moyen_attente', 0))
-            score -= (wait_time * 2)
-            
-            # 4. Bonus équipements clés (si présents dans services)
-            # On agrège les équipements listés dans les services de l'hôpital
-            equipment_bonus = 0
-            try:
-                hospital_services = sheets_service.get_services_by_hospital(hospital['id'])
-                # pondération simple: Scanner > Echographe > ECG > Défibrillateur
-                weights = {
-                    'scanner': 150,
-                    'échographe': 120,
-                    'echographe': 120,
-                    'ecg': 80,
-                    'défibrillateur': 60,
-                    'defibrillateur': 60,
-                }
-                seen = set()
-                for srv in hospital_services:
-                    eq = str(srv.get('equipements', '')).lower()
-                    for key, w in weights.items():
-                        if key in eq and key not in seen:
-                            equipment_bonus += w
-                            seen.add(key)
-                hospital['equipment_bonus'] = equipment_bonus
-                score += equipment_bonus
-            except Exception:
-                hospital['equipment_bonus'] = 0
-
-            # 5. Vérification ouverture (simplifiée)
-            hours = hospital.get('horaires_ouverture', '24h/24').lower()
-            is_open = True
-            if '24h' not in hours:
-                # Logique très basique : si pas 24h, on suppose fermé la nuit/weekend pour l'instant
-                # Idéalement il faudrait un parser plus complexe
-                if current_hour < 8 or current_hour > 18 or current_day > 4:
-                    is_open = False
-            
-            if not is_open:
-                score -= 5000 # Pénalité massive si fermé
-                hospital['is_open'] = False
-            else:
-                hospital['is_open'] = True
-                
-            hospital['recommendation_score'] = score
-        
-        # Filtrer par rayon
-        hospitals = [h for h in hospitals if h['distance_km'] <= rayon_km]
-        
-        # Trier par score décroissant (le meilleur score en premier)
-        hospitals.sort(key=lambda x: x['recommendation_score'], reverse=True)
-    
-    # Charger les services pour chaque hôpital (seulement les noms pour Flutter)
+    # Services de chaque hôpital retenu (seulement les noms pour Flutter)
     for hospital in hospitals:
-        services_data = sheets_service.get_services_by_hospital(hospital['id'])
-        # Extraire seulement les noms des services pour Flutter
-        hospital['services'] = [s.get('nom_service', '') for s in services_data]
+        hospital['services'] = list(source.service_names.get(hospital['id'], []))
         # Supprimer le mot de passe du résultat
         hospital.pop('mot_de_passe', None)
     
@@ -293,16 +225,56 @@ async def search_hospitals(
     }
 
 
+@router.get("/search/text")
+def search_hospitals_text(
+    q: str = Query(..., min_length=1, description="Nom, ville, région, adresse, description ou service"),
+    limit: int = Query(20, ge=1, le=100, description="Nombre maximum de résultats")
+):
+    """
+    Recherche plein texte des hôpitaux
+    
+    Tous les mots doivent apparaître (début de mot suffisant : « cardio » trouve
+    « Cardiologie »), sans tenir compte des accents ni de la casse. Les résultats
+    sont classés par pertinence (BM25, `search_score`) : le nom et la ville
+    comptent plus que la description.
+    """
+    try:
+        hospitals = sheets_service.search_index.search(q, limit)
+    except Exception as e:
+        print(f"Error searching hospitals: {e}")
+        return {"hospitals": [], "error": str(e)}
+    
+    # Noms des services depuis la source du moteur de score (une lecture de
+    # Services au plus, pas une par résultat)
+    service_names = sheets_service.scoring.source().service_names if hospitals else {}
+    for hospital in hospitals:
+        hospital['services'] = list(service_names.get(hospital['id'], []))
+        hospital.pop('mot_de_passe', None)
+    
+    return {
+        "total": len(hospitals),
+        "hospitals": hospitals
+    }
+
+
+@router.get("/sync/status")
+def get_sync_status():
+    """État de la synchronisation incrémentale avec Google Sheets"""
+    return sheets_service.sync_status()
+
+
 @router.get("/{hospital_id}")
-async def get_hospital_details(hospital_id: str):
+def get_hospital_details(hospital_id: str):
     """Récupérer les détails complets d'un hôpital"""
     hospital = sheets_service.get_hospital_by_id(hospital_id)
     
     if not hospital:
         raise HTTPException(status_code=404, detail="Hôpital non trouvé")
     
-    # Charger les services
-    hospital['services'] = sheets_service.get_services_by_hospital(hospital_id)
+    # Charger les services (avec leur ouverture à l'heure actuelle)
+    now = datetime.now()
+    hospital['is_open'] = is_open(parse_opening_hours(hospital.get('horaires_ouverture')), now)
+    hospital['services'] = annotate_services(sheets_service.get_services_by_hospital(hospital_id), now)
     
     # Charger les avis
     hospital['avis'] = sheets_service.get_reviews_by_hospital(hospital_id)
@@ -314,7 +286,7 @@ async def get_hospital_details(hospital_id: str):
 
 
 @router.post("/{hospital_id}/services")
-async def add_service(hospital_id: str, service: ServiceCreate):
+def add_service(hospital_id: str, service: ServiceCreate):
     """Ajouter un service à un hôpital"""
     # Vérifier que l'hôpital existe
     hospital = sheets_service.get_hospital_by_id(hospital_id)
@@ -330,7 +302,7 @@ async def add_service(hospital_id: str, service: ServiceCreate):
 
 
 @router.post("/{hospital_id}/reviews")
-async def add_review(hospital_id: str, review: ReviewCreate, user_id: str = Query(...)):
+def add_review(hospital_id: str, review: ReviewCreate, user_id: str = Query(...)):
     """Ajouter un avis pour un hôpital"""
     # Vérifier que l'hôpital existe
     hospital = sheets_service.get_hospital_by_id(hospital_id)
@@ -350,19 +322,22 @@ async def add_review(hospital_id: str, review: ReviewCreate, user_id: str = Quer
 
 
 @router.get("/{hospital_id}/reviews")
-async def get_hospital_reviews(hospital_id: str):
+def get_hospital_reviews(hospital_id: str):
     """Récupérer tous les avis d'un hôpital"""
-    reviews = sheets_service.get_reviews_by_hospital(hospital_id)
+    # Moyenne et répartition issues des agrégats incrémentaux (ou des avis lus, sans
+    # synchronisation : l'onglet Avis n'est lu qu'une fois)
+    reviews, summary = sheets_service.get_reviews_with_summary(hospital_id)
     
     return {
         "total": len(reviews),
-        "note_moyenne": sum(float(r.get('note', 0)) for r in reviews) / len(reviews) if reviews else 0,
+        "note_moyenne": summary['note_moyenne'],
+        "histogramme": summary['histogramme'],
         "reviews": reviews
     }
 
 
 @router.get("/")
-async def get_all_hospitals():
+def get_all_hospitals():
     """Récupérer tous les hôpitaux"""
     hospitals = sheets_service.get_all_hospitals()
     
@@ -1,51 +1,45 @@
-from fastapi import FastAPI
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import auth, hospital, services, capacity, location, equipment
-# Google Sheets désactivé
-# from app.api.v1 import auth_sheets
-# from app.hospitals_routes import router as hospitals_router
+from fastapi.responses import PlainTextResponse, JSONResponse
 from app.core.config import settings
-import os
+from app.core import metrics, profiling, query_stats
 from dotenv import load_dotenv
 
 # Charger les variables d'environnement
 load_dotenv()
 
-app = FastAPI(
-    title="PulseAI Hospital Dashboard API",
-    version="1.0.0",
-    description="API Backend pour le Dashboard PulseAI"
-)
-
-# CORS - Autoriser le frontend
-# Configuration CORS plus permissive pour le développement et la production
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        # Local development
-        "http://localhost:3000",
-        "http://localhost:3001",
-        "http://localhost:3002",
-        # Render deployment
-        "https://pulseai-dashboard-frontend.onrender.com",
-        # Vercel deployments
-        "https://pulseai-dashboard.vercel.app",
-        "https://frontend-5t5n42vm1-light667s-projects.vercel.app",
-        # Firebase Hosting domains (Flutter Web)
-        "https://pulseai.web.app",
-        "https://pulseai.firebaseapp.com",
-        "https://pulseai-a0548.web.app",
-        "https://pulseai-a0548.firebaseapp.com",
-    ],
-    # Allow Render, Vercel and Firebase subdomains
-    allow_origin_regex="https://.*\\.onrender\\.com|https://.*\\.vercel\\.app|https://.*\\.web\\.app|https://.*\\.firebaseapp\\.com",
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Routes
-@app.get("/")
+
+def _warm_up_dependencies():
+    """Charge en arrière-plan les modules différés (jose/cryptography, passlib/bcrypt)"""
+    start = time.perf_counter()
+    try:
+        import jose.jwt  # noqa: F401
+        from app.core.security import get_pwd_context
+        get_pwd_context().handler("bcrypt").get_backend()
+        print(f"🔥 Modules d'authentification chargés en {(time.perf_counter() - start) * 1000:.0f} ms")
+    except Exception as e:
+        print(f"⚠️ Préchargement des modules d'authentification impossible: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Le serveur répond tout de suite ; les dépendances lourdes se chargent en fond"""
+    if settings.DATABASE_MIGRATE_ON_STARTUP:
+        from app.db.migrations import upgrade
+        upgrade()
+    threading.Thread(target=_warm_up_dependencies, name="deps-warmup", daemon=True).start()
+    if settings.SHEETS_ENABLED:
+        from app.google_sheets_service import sheets_service
+        threading.Thread(target=sheets_service.warm_up, name="sheets-warmup", daemon=True).start()
+    yield
+    if settings.SHEETS_ENABLED:
+        sheets_service.shutdown()
+
+
 def root():
     return {
         "message": "PulseAI API",
@@ -53,7 +47,7 @@ def root():
         "docs": "/docs"
     }
 
-@app.get("/api/v1")
+
 def api_info():
     return {
         "message": "PulseAI API v1",
@@ -65,19 +59,93 @@ def api_info():
             "/api/v1/services/",
             "/api/v1/capacity/",
             "/api/v1/location/",
-            "/api/v1/equipment/"
+            "/api/v1/equipment/",
+            "/api/v1/analytics/occupancy"
         ]
     }
 
-# Inclure les routers
-app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
-# Google Sheets désactivé - pas de credentials
-# app.include_router(auth_sheets.router, tags=["Authentication (Google Sheets)"])
-app.include_router(hospital.router, prefix="/api/v1/hospital", tags=["Hospital"])
-app.include_router(services.router, prefix="/api/v1/services", tags=["Services"])
-app.include_router(capacity.router, prefix="/api/v1/capacity", tags=["Capacity"])
-app.include_router(location.router, prefix="/api/v1/location", tags=["Location"])
-app.include_router(equipment.router, prefix="/api/v1/equipment", tags=["Equipment"])
-
-# Nouveau: Routes Google Sheets pour les hôpitaux - désactivé
-# app.include_router(hospitals_router, tags=["Hospitals (Google Sheets)"])
+
+def get_metrics():
+    """Métriques au format texte Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+async def sheets_unavailable_handler(request: Request, exc: Exception):
+    return JSONResponse(status_code=503, content={"detail": "Google Sheets indisponible"})
+
+
+def include_routers(app: FastAPI):
+    from app.api.v1 import auth, hospital, services, capacity, location, equipment, analytics
+
+    app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
+    app.include_router(hospital.router, prefix="/api/v1/hospital", tags=["Hospital"])
+    app.include_router(services.router, prefix="/api/v1/services", tags=["Services"])
+    app.include_router(capacity.router, prefix="/api/v1/capacity", tags=["Capacity"])
+    app.include_router(location.router, prefix="/api/v1/location", tags=["Location"])
+    app.include_router(equipment.router, prefix="/api/v1/equipment", tags=["Equipment"])
+    app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["Analytics"])
+    app.include_router(profiling.router)
+
+    # Routes Google Sheets (SHEETS_ENABLED) : le service n'est initialisé qu'au premier appel
+    if settings.SHEETS_ENABLED:
+        from app.api.v1 import auth_sheets
+        from app.hospitals_routes import router as hospitals_router
+        from app.google_sheets_service import SheetsUnavailableError
+
+        app.include_router(auth_sheets.router, tags=["Authentication (Google Sheets)"])
+        app.include_router(hospitals_router, tags=["Hospitals (Google Sheets)"])
+        app.add_exception_handler(SheetsUnavailableError, sheets_unavailable_handler)
+
+
+def create_app() -> FastAPI:
+    """Construit l'application (middlewares, routes)"""
+    app = FastAPI(
+        title="PulseAI Hospital Dashboard API",
+        version="1.0.0",
+        description="API Backend pour le Dashboard PulseAI",
+        lifespan=lifespan
+    )
+
+    # CORS - Autoriser le frontend
+    # Configuration CORS plus permissive pour le développement et la production
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[
+            # Local development
+            "http://localhost:3000",
+            "http://localhost:3001",
+            "http://localhost:3002",
+            # Render deployment
+            "https://pulseai-dashboard-frontend.onrender.com",
+            # Vercel deployments
+            "https://pulseai-dashboard.vercel.app",
+            "https://frontend-5t5n42vm1-light667s-projects.vercel.app",
+            # Firebase Hosting domains (Flutter Web)
+            "https://pulseai.web.app",
+            "https://pulseai.firebaseapp.com",
+            "https://pulseai-a0548.web.app",
+            "https://pulseai-a0548.firebaseapp.com",
+        ],
+        # Allow Render, Vercel and Firebase subdomains
+        allow_origin_regex="https://.*\\.onrender\\.com|https://.*\\.vercel\\.app|https://.*\\.web\\.app|https://.*\\.firebaseapp\\.com",
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Métriques : latence par route et requêtes en cours
+    app.add_middleware(metrics.MetricsMiddleware)
+    # Profilage d'une requête à la demande (admin)
+    app.add_middleware(profiling.ProfilingMiddleware)
+    # Requêtes SQL par requête HTTP (Server-Timing, N+1)
+    app.add_middleware(query_stats.QueryStatsMiddleware)
+
+    # Routes
+    app.add_api_route("/metrics", get_metrics, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/", root, methods=["GET"])
+    app.add_api_route("/api/v1", api_info, methods=["GET"])
+    include_routers(app)
+    return app
+
+
+app = create_app()
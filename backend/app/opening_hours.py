@@ -0,0 +1,151 @@
+"""
+Horaires d'ouverture compilés en bitmap heure-de-la-semaine.
+
+Une chaîne comme "Lun-Ven 8h-18h", "Lun-Ven 8h-12h 14h-18h, Sam 8h-12h" ou
+"24h/24" est analysée une seule fois (cache par chaîne) en un entier de 168
+bits : le bit `jour * 24 + heure` (lundi = 0) vaut 1 si l'établissement ou le
+service est ouvert pendant cette heure. "Ouvert maintenant" / "ouvert à T"
+devient un simple test de bit.
+
+Une heure entamée compte comme ouverte (8h30-12h15 ouvre les heures 8 à 12).
+Comme l'ancienne règle, "24h" seul ("Ouvert 24h", "7j/7 24h", "24h sur 24")
+signifie ouvert en continu. Une plage sans jour s'applique à chaque jour
+("20h-8h" : de 20h à minuit et de minuit à 8h, tous les jours). Une chaîne non
+reconnue ou vide retombe sur l'ancienne règle : du lundi au vendredi, de 8h à
+18h59. Des jours cités sans aucun horaire ("7j/7", "Lun-Sam") prennent ces
+heures par défaut ; une chaîne qui ne cite que des fermetures ("Dim fermé")
+part de l'horaire par défaut.
+"""
+import re
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from app.core.metrics import caches
+
+DAYS = {'lun': 0, 'mar': 1, 'mer': 2, 'jeu': 3, 'ven': 4, 'sam': 5, 'dim': 6}
+ALL_DAYS = list(range(7))
+
+_DAY = r'\b(lun|mar|mer|jeu|ven|sam|dim)[a-z]*\.?'
+_HOUR = r'(\d{1,2})\s*(?:h|:)?(\d{2})?'
+_TOKENS = re.compile(
+    rf'(?P<always>\b24\s*h?\s*/\s*(?:24|7)\b|\bh\s*24\b'
+    rf'|\b24\s*h(?:\s*sur\s*24)?\b(?!\s*(?:-|a)\s*\d))'   # "24h" seul, pas début de plage (24h-8h)
+    rf'|(?P<week>\b7\s*j?\s*/\s*7\b)'
+    rf'|(?P<dayrange>{_DAY}\s*(?:-|au|a)\s*{_DAY})'
+    rf'|(?P<hourrange>\b{_HOUR}\s*(?:-|a)\s*{_HOUR}(?![\d/]))'
+    rf'|(?P<day>{_DAY})'
+    rf'|(?P<closed>\bferme\b)'
+)
+
+
+def _hours_mask(start: int, end: int) -> int:
+    """Bits des heures [start, end[ d'une journée"""
+    return ((1 << end) - 1) & ~((1 << start) - 1)
+
+
+def _set_hours(bitmap: int, days: List[int], start: int, end: int) -> int:
+    for day in days:
+        if end > start:
+            bitmap |= _hours_mask(start, end) << (day * 24)
+        else:
+            # Plage de nuit (20h-8h) : se termine le lendemain
+            bitmap |= _hours_mask(start, 24) << (day * 24)
+            bitmap |= _hours_mask(0, end) << (((day + 1) % 7) * 24)
+    return bitmap
+
+
+def _day_range(first: int, last: int) -> List[int]:
+    return [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+# Ancienne règle : Lun-Ven, ouvert si 8 <= heure <= 18
+DEFAULT_START, DEFAULT_END = 8, 19
+DEFAULT_HOURS = _set_hours(0, _day_range(0, 4), DEFAULT_START, DEFAULT_END)
+
+
+@lru_cache(maxsize=4096)
+def parse_opening_hours(text: Optional[str]) -> int:
+    """Compile une chaîne d'horaires en bitmap de 168 bits"""
+    if not text or not str(text).strip():
+        return DEFAULT_HOURS
+    bitmap = 0
+    pending: List[int] = []          # jours en attente d'une plage horaire
+    last_days: List[int] = []        # jours de la dernière plage appliquée
+    week = False                     # "7j/7" en attente d'une plage horaire
+    closed: List[int] = []           # jours déclarés fermés
+    closing = False                  # "fermé" cité avant ses jours ("Fermé le dimanche")
+    opened = False
+
+    for match in _TOKENS.finditer(_normalize(text)):
+        kind = match.lastgroup
+        if kind == 'day':
+            pending.append(DAYS[re.match(_DAY, match.group(0)).group(1)])
+        elif kind == 'dayrange':
+            first, last = (DAYS[d] for d in re.findall(_DAY, match.group(0)))
+            pending.extend(_day_range(first, last))
+        elif kind == 'week':
+            # À part des jours cités : "7j/7, dim fermé" ne ferme que le dimanche
+            week = True
+        elif kind == 'closed':
+            closing = not pending
+            if pending:
+                closed.extend(pending)
+                last_days, pending = pending, []
+        elif kind in ('always', 'hourrange'):
+            if kind == 'always':
+                start, end = 0, 24
+            else:
+                h1, m1, h2, m2 = re.match(rf'{_HOUR}\s*(?:-|a)\s*{_HOUR}', match.group(0)).groups()
+                start, end = int(h1), int(h2) + (1 if m2 and int(m2) > 0 else 0)
+                if start > 23 or end > 24:
+                    continue
+                end = end or 24
+            # Sans jour cité, chaque jour reçoit la plage ; une plage de nuit (20h-8h)
+            # n'ouvre donc que 20h-24h et 0h-8h, pas la journée
+            days = pending or (ALL_DAYS if week else last_days) or ALL_DAYS
+            bitmap = _set_hours(bitmap, days, start, end)
+            last_days, pending, week = days, [], False
+            closing = False
+            opened = True
+
+    if opened:
+        # Des jours cités sans horaires en fin de chaîne sont ignorés
+        return bitmap
+    if closing:
+        # "Fermé" suivi de ses jours, ou seul (tous les jours)
+        closed.extend(pending or ALL_DAYS)
+        pending = []
+    # Jours sans horaire ("7j/7", "Lun-Sam") : heures par défaut ces jours-là
+    days = set(pending) | (set(ALL_DAYS) if week else set())
+    hours = _set_hours(0, sorted(days), DEFAULT_START, DEFAULT_END) if days else DEFAULT_HOURS
+    # Moins les jours fermés
+    for day in closed:
+        bitmap |= _hours_mask(0, 24) << (day * 24)
+    return hours & ~bitmap
+
+
+caches.register('opening_hours', lambda: parse_opening_hours.cache_info()[:2])
+
+
+def hour_of_week(when: datetime) -> int:
+    return when.weekday() * 24 + when.hour
+
+
+def is_open(bitmap: int, when: Optional[datetime] = None) -> bool:
+    """Test de bit : ouvert pendant l'heure de `when` (maintenant par défaut)"""
+    return bool(bitmap >> hour_of_week(when or datetime.now()) & 1)
+
+
+def annotate_services(services: List[Dict[str, Any]], when: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Ajoute `is_open` à chaque service d'après sa disponibilité"""
+    bit = hour_of_week(when or datetime.now())
+    for service in services:
+        service['is_open'] = bool(parse_opening_hours(service.get('disponibilite', '')) >> bit & 1)
+    return services
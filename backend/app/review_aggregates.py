@@ -0,0 +1,141 @@
+"""
+Agrégats de notes par hôpital, tenus à jour de façon incrémentale.
+
+Pour chaque hôpital on conserve le nombre d'avis publiés, la somme des notes,
+le nombre d'avis notés (> 0) et un histogramme des notes arrondies (0 à 5).
+Un nouvel avis met à jour ces compteurs en O(1) ; l'onglet Avis n'est relu
+entièrement qu'à la construction initiale (premier usage dans le processus) ou
+quand la synchronisation y détecte des modifications externes.
+
+Les agrégats ne sont « construits » qu'après une lecture réussie de l'onglet.
+Ils sont persistés en JSON à chaque reconstruction et à l'arrêt (`save`), pas à
+chaque avis : le fichier ne sert qu'en lecture, si l'onglet Avis est illisible
+au démarrage, et n'est jamais écrasé par des agrégats qui n'en proviennent pas.
+"""
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Any
+
+# Colonnes utiles de l'onglet Avis
+AVIS_HOSPITAL_COL = 1
+AVIS_NOTE_COL = 3
+AVIS_STATUT_COL = 10
+
+
+def _empty() -> Dict[str, Any]:
+    return {'count': 0, 'sum': 0.0, 'rated': 0, 'histogram': [0] * 6}
+
+
+def _bucket(note: float) -> int:
+    return min(5, max(0, int(round(note))))
+
+
+def aggregate_rows(rows: List[List[Any]]) -> Dict[str, Dict[str, Any]]:
+    """Agrégats par hôpital des avis publiés de `rows` (lignes de l'onglet Avis)"""
+    aggregates: Dict[str, Dict[str, Any]] = {}
+    seen = set()
+    for row in rows:
+        if len(row) <= AVIS_STATUT_COL or row[AVIS_STATUT_COL] != 'Publié':
+            continue
+        try:
+            note = float(str(row[AVIS_NOTE_COL]).replace(',', '.')) if row[AVIS_NOTE_COL] else 0.0
+        except (ValueError, TypeError):
+            continue
+        # Une ligne encore provisoire peut coexister avec sa copie synchronisée : même
+        # contenu (note comparée en nombre, la feuille peut la reformater). L'id seul ne
+        # suffit pas : deux avis postés dans la même seconde le partagent
+        key = tuple(str(value) for i, value in enumerate(row) if i != AVIS_NOTE_COL) + (note,)
+        if key in seen:
+            continue
+        seen.add(key)
+        ReviewAggregates._apply(aggregates.setdefault(row[AVIS_HOSPITAL_COL], _empty()), note)
+    return aggregates
+
+
+class ReviewAggregates:
+    """Compteurs de notes par hôpital, persistés sur disque"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.built = False
+        self._by_hospital: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    # Repli en lecture seule tant que l'onglet Avis n'a pas été lu
+                    self._by_hospital = json.load(f)
+            except (ValueError, OSError) as e:
+                print(f"Agrégats d'avis illisibles, ignorés: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._by_hospital, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def save(self):
+        """Persiste les avis ajoutés depuis la dernière écriture (appelé à l'arrêt)"""
+        with self._lock:
+            if self.built and self._dirty:
+                self._save()
+
+    def rebuild(self, rows: List[List[Any]]):
+        """Recalcule tous les agrégats à partir des lignes de l'onglet Avis (lecture réussie)"""
+        aggregates = aggregate_rows(rows)
+        with self._lock:
+            self._by_hospital = aggregates
+            self.built = True
+            self._save()
+
+    def ensure_built(self, load_rows: Callable[[], List[List[Any]]]) -> bool:
+        """Construit les agrégats depuis l'onglet Avis au premier usage. Si la lecture
+        échoue, ils restent non construits (le JSON persisté sert aux lectures) et la
+        construction est retentée à l'appel suivant. Retourne `built`"""
+        if self.built:
+            return True
+        try:
+            rows = load_rows()
+        except Exception as e:
+            print(f"⚠️ Onglet Avis illisible, agrégats d'avis non construits: {e}")
+            return False
+        self.rebuild(rows)
+        return True
+
+    @staticmethod
+    def _apply(aggregate: Dict[str, Any], note: float):
+        aggregate['count'] += 1
+        aggregate['sum'] += note
+        if note > 0:
+            aggregate['rated'] += 1
+        aggregate['histogram'][_bucket(note)] += 1
+
+    def add(self, hospital_id: str, note: float) -> Dict[str, Any]:
+        """Prend en compte un nouvel avis publié et retourne l'agrégat à jour"""
+        with self._lock:
+            aggregate = self._by_hospital.setdefault(hospital_id, _empty())
+            self._apply(aggregate, note)
+            self._dirty = True
+            return dict(aggregate, histogram=list(aggregate['histogram']))
+
+    def get(self, hospital_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            aggregate = self._by_hospital.get(hospital_id)
+            return dict(aggregate, histogram=list(aggregate['histogram'])) if aggregate else None
+
+    @staticmethod
+    def hospital_rating(aggregate: Dict[str, Any]) -> float:
+        """Note moyenne stockée dans Hopitaux : moyenne des seuls avis notés (> 0)"""
+        return round(aggregate['sum'] / aggregate['rated'], 1) if aggregate['rated'] else 0.0
+
+    @staticmethod
+    def mean(aggregate: Optional[Dict[str, Any]]) -> float:
+        """Moyenne sur tous les avis publiés"""
+        if not aggregate or not aggregate['count']:
+            return 0
+        return aggregate['sum'] / aggregate['count']
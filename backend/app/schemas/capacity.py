@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List
 
 class CapacityBase(BaseModel):
     beds: int = 0
@@ -23,6 +24,15 @@ class CapacityUpdate(BaseModel):
     waiting_queue: int | None = None
     average_wait_time: int | None = None
 
+class CapacitySnapshot(CapacityBase):
+    hospital_id: int
+
+class CapacityBatch(BaseModel):
+    snapshots: List[CapacitySnapshot]
+
+class CapacityDelta(BaseModel):
+    delta: int = Field(1, ge=1)
+
 class CapacityResponse(CapacityBase):
     id: int
     hospital_id: int
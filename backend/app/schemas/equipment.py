@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Literal
 
 class EquipmentBase(BaseModel):
     name: str
@@ -13,6 +14,14 @@ class EquipmentUpdate(BaseModel):
     quantity: int | None = None
     available: bool | None = None
 
+class EquipmentOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: int | None = None
+    data: EquipmentUpdate | None = None
+
+class EquipmentBatch(BaseModel):
+    operations: List[EquipmentOperation]
+
 class EquipmentResponse(EquipmentBase):
     id: int
     hospital_id: int
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Literal
 
 class ServiceBase(BaseModel):
     name: str
@@ -10,6 +11,14 @@ class ServiceCreate(ServiceBase):
 class ServiceUpdate(ServiceBase):
     name: str | None = None
 
+class ServiceOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: int | None = None
+    data: ServiceUpdate | None = None
+
+class ServiceBatch(BaseModel):
+    operations: List[ServiceOperation]
+
 class ServiceResponse(ServiceBase):
     id: int
     hospital_id: int
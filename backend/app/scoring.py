@@ -0,0 +1,196 @@
+"""
+Moteur de score de recommandation pour la recherche d'hôpitaux.
+
+Les composantes statiques du score (note, temps d'attente, bonus équipements,
+coordonnées en radians, bitmap d'horaires) sont précalculées une fois par hôpital et
+recalculées seulement quand les onglets Hopitaux ou Services changent (numéros
+de version du modèle synchronisé), de même que les dictionnaires d'hôpitaux et
+les noms de leurs services. Par requête, il ne reste qu'une boucle serrée
+(distance haversine + score statique + test de bit d'ouverture) et la copie des
+seuls résultats retenus.
+"""
+import heapq
+import math
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Any
+
+from app.core.config import settings
+from app.core.metrics import caches
+from app.opening_hours import parse_opening_hours, hour_of_week
+
+EARTH_RADIUS_KM = 6371
+NO_DISTANCE_KM = 999999  # Hôpital sans coordonnées : toujours hors rayon
+
+SERVICES_HOSPITAL_COL = 1
+SERVICES_EQUIPEMENTS_COL = 7
+
+
+class HospitalVector(NamedTuple):
+    static_score: float
+    equipment_bonus: float
+    lat: float       # radians
+    lon: float       # radians
+    cos_lat: float
+    has_coords: bool
+    hours: int       # bitmap heure-de-la-semaine (app.opening_hours)
+
+
+class RankingSource(NamedTuple):
+    hospitals: List[Dict[str, Any]]          # partagés entre requêtes : ne pas modifier
+    vectors: Dict[str, HospitalVector]
+    service_names: Dict[str, List[str]]      # hopital_id -> noms des services
+
+
+def _safe_float(val: Any) -> float:
+    try:
+        if val in ['', None, '#ERROR!', '#N/A', '#REF!']:
+            return 0.0
+        if isinstance(val, str):
+            val = val.replace(',', '.')
+        return float(val)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _safe_int(val: Any) -> int:
+    return int(_safe_float(val))
+
+
+class ScoringEngine:
+    """Vecteurs de score statiques par hôpital + combinaison rapide par requête"""
+
+    def __init__(self, sheets=None,
+                 base: float = None, distance_weight: float = None, rating_weight: float = None,
+                 wait_weight: float = None, closed_penalty: float = None,
+                 equipment_weights: Dict[str, float] = None):
+        self.sheets = sheets
+        self.base = settings.SCORE_BASE if base is None else base
+        self.distance_weight = settings.SCORE_DISTANCE_WEIGHT if distance_weight is None else distance_weight
+        self.rating_weight = settings.SCORE_RATING_WEIGHT if rating_weight is None else rating_weight
+        self.wait_weight = settings.SCORE_WAIT_WEIGHT if wait_weight is None else wait_weight
+        self.closed_penalty = settings.SCORE_CLOSED_PENALTY if closed_penalty is None else closed_penalty
+        weights = settings.SCORE_EQUIPMENT_WEIGHTS if equipment_weights is None else equipment_weights
+        self.equipment_weights = {k.lower(): w for k, w in weights.items()}
+        self._source: Optional[RankingSource] = None
+        self._version = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    # ----- Précalcul -----
+
+    def equipment_bonus(self, equipements: List[str]) -> float:
+        """Bonus des équipements clés, chaque mot-clé n'étant compté qu'une fois"""
+        text = ' | '.join(equipements).lower()
+        return sum(w for key, w in self.equipment_weights.items() if key in text)
+
+    def vector(self, hospital: Dict[str, Any], equipements: List[str]) -> HospitalVector:
+        lat = _safe_float(hospital.get('latitude'))
+        lon = _safe_float(hospital.get('longitude'))
+        bonus = self.equipment_bonus(equipements)
+        static = (_safe_float(hospital.get('note_moyenne')) * self.rating_weight
+                  - _safe_int(hospital.get('temps_moyen_attente')) * self.wait_weight
+                  + bonus)
+        return HospitalVector(
+            static_score=static,
+            equipment_bonus=bonus,
+            lat=math.radians(lat),
+            lon=math.radians(lon),
+            cos_lat=math.cos(math.radians(lat)),
+            has_coords=lat != 0 and lon != 0,
+            hours=parse_opening_hours(hospital.get('horaires_ouverture', '24h/24')),
+        )
+
+    def build(self, hospitals: List[Dict[str, Any]], service_rows: List[List[Any]]) -> Dict[str, HospitalVector]:
+        """Calcule les vecteurs statiques de tous les hôpitaux fournis"""
+        equipements: Dict[str, List[str]] = {}
+        for row in service_rows or []:
+            if len(row) > SERVICES_EQUIPEMENTS_COL and row[SERVICES_EQUIPEMENTS_COL]:
+                equipements.setdefault(row[SERVICES_HOSPITAL_COL], []).append(str(row[SERVICES_EQUIPEMENTS_COL]))
+        return {h.get('id', ''): self.vector(h, equipements.get(h.get('id', ''), [])) for h in hospitals}
+
+    def _source_version(self):
+        sync = self.sheets.sync_worker
+        snapshot = self.sheets.snapshot
+        if sync.enabled and sync.ensure_loaded('Hopitaux') and sync.ensure_loaded('Services'):
+            return (snapshot['Hopitaux'].version, snapshot['Services'].version)
+        return None
+
+    def _load(self) -> RankingSource:
+        hospitals = self.sheets.get_all_hospitals()
+        service_rows = self.sheets._tab_rows('Services')
+        names: Dict[str, List[str]] = {}
+        for row in service_rows or []:
+            if len(row) > SERVICES_HOSPITAL_COL:
+                names.setdefault(row[SERVICES_HOSPITAL_COL], []).append(row[2] if len(row) > 2 else '')
+        return RankingSource(hospitals, self.build(hospitals, service_rows), names)
+
+    def source(self) -> RankingSource:
+        """Hôpitaux, vecteurs et services à jour ; relus seulement si Hopitaux ou Services ont changé"""
+        version = self._source_version()
+        if version is None:
+            # Pas de modèle synchronisé : aucun numéro de version pour invalider un cache
+            return self._load()
+        with self._lock:
+            caches.record('scoring_vectors', version == self._version)
+            if version != self._version:
+                self._source = self._load()
+                self._version = version
+                self.rebuilds += 1
+            return self._source
+
+    def vectors(self, hospitals: List[Dict[str, Any]]) -> Dict[str, HospitalVector]:
+        """Vecteurs à jour ; recalculés seulement si Hopitaux ou Services ont changé"""
+        if self._source_version() is None:
+            return self.build(hospitals, self.sheets._tab_rows('Services'))
+        return self.source().vectors
+
+    # ----- Par requête -----
+
+    def top(self, hospitals: List[Dict[str, Any]], latitude: float, longitude: float,
+            radius_km: float, limit: Optional[int] = None, when: Optional[datetime] = None,
+            vectors: Optional[Dict[str, HospitalVector]] = None) -> List[Dict[str, Any]]:
+        """Hôpitaux à moins de `radius_km`, du meilleur score au moins bon (les `limit` meilleurs).
+
+        Les hôpitaux fournis ne sont pas modifiés : seuls les résultats retenus sont copiés
+        et reçoivent distance_km, equipment_bonus, is_open et recommendation_score.
+        """
+        if vectors is None:
+            vectors = self.vectors(hospitals)
+        bit = hour_of_week(when or datetime.now())
+        lat1 = math.radians(latitude)
+        lon1 = math.radians(longitude)
+        cos1 = math.cos(lat1)
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        diameter = 2 * EARTH_RADIUS_KM
+        base, distance_weight, closed_penalty = self.base, self.distance_weight, self.closed_penalty
+
+        scored = []
+        for index, hospital in enumerate(hospitals):
+            v = vectors.get(hospital.get('id', ''))
+            if v is None:
+                v = self.vector(hospital, [])
+            static, bonus, lat2, lon2, cos2, has_coords, hours = v
+            if has_coords:
+                a = sin((lat2 - lat1) / 2) ** 2 + cos1 * cos2 * sin((lon2 - lon1) / 2) ** 2
+                distance = round(diameter * asin(sqrt(a)), 2)
+            else:
+                distance = NO_DISTANCE_KM
+            if distance > radius_km:
+                continue
+            is_open = bool(hours >> bit & 1)
+            score = base - distance * distance_weight + static
+            if not is_open:
+                score -= closed_penalty
+            # index : départage stable, comme le tri des dictionnaires
+            scored.append((score, -index, distance, bonus, is_open))
+
+        if limit is not None:
+            scored = heapq.nlargest(limit, scored)
+        else:
+            scored.sort(reverse=True)
+        return [
+            dict(hospitals[-neg_index], distance_km=distance, equipment_bonus=bonus,
+                 is_open=is_open, recommendation_score=score)
+            for score, neg_index, distance, bonus, is_open in scored
+        ]
@@ -0,0 +1,209 @@
+"""
+Miroir SQLite local du Google Sheet.
+
+Chaque onglet est répliqué dans une table indexée (id, hopital_id, email). Le
+worker de synchronisation (`app.sheets_sync`) y applique les deltas en tâche de
+fond et `GoogleSheetsService` y lit toutes ses données : la latence de lecture
+ne dépend plus de Google et les données restent disponibles si l'API est lente
+ou hors quota. Les écritures passent par Sheets puis sont répercutées ici.
+"""
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Any
+
+from app.sheets_sync import SheetsSnapshot, HashIndexes, TAB_COLUMNS, PROVISIONAL_ROW_BASE, row_digest
+
+# Colonnes indexées par onglet (en plus de l'id)
+INDEXED_COLUMNS = {
+    'Hopitaux': ['email', 'nom'],
+    'Services': ['hopital_id'],
+    'Avis': ['hopital_id'],
+    'Equipements': ['hopital_id'],
+    'Utilisateurs': ['email'],
+}
+
+
+class MirrorTab:
+    """Onglet répliqué dans une table SQLite (même interface que `TabSnapshot`)"""
+
+    def __init__(self, mirror: 'SheetsMirror', name: str):
+        self.mirror = mirror
+        self.name = name
+        self.columns = TAB_COLUMNS[name]
+        self.version = 0
+        self.loaded = False
+        self._ordered: Optional[List[List[str]]] = None
+        self._select = f'SELECT {", ".join(self.columns)} FROM "{name}"'
+        # Index insensibles à la casse (email, nom) gardés en mémoire à côté de la table
+        self._hash = HashIndexes(name)
+
+    def _load_hash(self, conn: sqlite3.Connection):
+        self._hash.clear()
+        if self._hash.columns:
+            for row in conn.execute(f'SELECT _row, {", ".join(self.columns)} FROM "{self.name}"'):
+                self._hash.add(row[0], list(row[1:]))
+
+    def _current(self, conn: sqlite3.Connection, row_number: int) -> Optional[List[str]]:
+        if not self._hash.columns:
+            return None
+        row = conn.execute(f'{self._select} WHERE _row = ?', (row_number,)).fetchone()
+        return list(row) if row else None
+
+    def _create(self, conn: sqlite3.Connection):
+        cols = ', '.join(f'{c} TEXT' for c in self.columns)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.name}" (_row INTEGER PRIMARY KEY, {cols})')
+        for column in ['id'] + INDEXED_COLUMNS.get(self.name, []):
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{self.name}_{column}" ON "{self.name}" ({column})')
+
+    def _pad(self, values: List[Any]) -> List[str]:
+        values = ['' if v is None else str(v) for v in values[:len(self.columns)]]
+        return values + [''] * (len(self.columns) - len(values))
+
+    def _touch(self):
+        self.version += 1
+        self._ordered = None
+
+    def _upsert_sql(self) -> str:
+        placeholders = ', '.join('?' * (len(self.columns) + 1))
+        return f'INSERT OR REPLACE INTO "{self.name}" (_row, {", ".join(self.columns)}) VALUES ({placeholders})'
+
+    def replace(self, rows: List[Tuple[int, List[str]]]):
+        with self.mirror.transaction() as conn:
+            conn.execute(f'DELETE FROM "{self.name}" WHERE _row < ?', (PROVISIONAL_ROW_BASE,))
+            conn.executemany(self._upsert_sql(), [[n] + self._pad(values) for n, values in rows])
+            self._load_hash(conn)
+            conn.execute(
+                'INSERT OR REPLACE INTO _mirror_tabs (tab, loaded_at) VALUES (?, ?)',
+                (self.name, datetime.now().isoformat(timespec='seconds'))
+            )
+            self.loaded = True
+            self._touch()
+
+    def set_row(self, row_number: int, values: List[str]):
+        with self.mirror.transaction() as conn:
+            self._hash.remove(row_number, self._current(conn, row_number))
+            conn.execute(self._upsert_sql(), [row_number] + self._pad(values))
+            self._hash.add(row_number, self._pad(values))
+            self._touch()
+
+    def remove_row(self, row_number: int):
+        with self.mirror.transaction() as conn:
+            old = self._current(conn, row_number)
+            if conn.execute(f'DELETE FROM "{self.name}" WHERE _row = ?', (row_number,)).rowcount:
+                self._hash.remove(row_number, old)
+                self._touch()
+
+    def set_cell(self, row_number: int, col_index: int, value: Any):
+        if col_index >= len(self.columns):
+            return
+        column = self.columns[col_index]
+        with self.mirror.transaction() as conn:
+            old = self._current(conn, row_number)
+            updated = conn.execute(
+                f'UPDATE "{self.name}" SET {column} = ? WHERE _row = ?',
+                ('' if value is None else str(value), row_number)
+            ).rowcount
+            if not updated:
+                values = [''] * len(self.columns)
+                values[col_index] = '' if value is None else str(value)
+                conn.execute(self._upsert_sql(), [row_number] + values)
+            self._hash.remove(row_number, old)
+            self._hash.add(row_number, self._current(conn, row_number) or [])
+            self._touch()
+
+    def rows(self) -> List[List[str]]:
+        with self.mirror.lock:
+            if self._ordered is None:
+                cursor = self.mirror.conn.execute(f'{self._select} ORDER BY _row')
+                self._ordered = [list(row) for row in cursor]
+            return self._ordered
+
+    def numbered_rows(self) -> List[Tuple[int, List[str]]]:
+        with self.mirror.lock:
+            cursor = self.mirror.conn.execute(f'SELECT _row, {", ".join(self.columns)} FROM "{self.name}" ORDER BY _row')
+            return [(row[0], list(row[1:])) for row in cursor]
+
+    def row_number(self, row_id: str) -> Optional[int]:
+        with self.mirror.lock:
+            row = self.mirror.conn.execute(
+                f'SELECT _row FROM "{self.name}" WHERE id = ? ORDER BY _row LIMIT 1', (row_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, column: str, value: str) -> List[Tuple[int, List[str]]]:
+        row_numbers = self._hash.get(column, value)
+        if not row_numbers:
+            return []
+        with self.mirror.lock:
+            placeholders = ', '.join('?' * len(row_numbers))
+            cursor = self.mirror.conn.execute(
+                f'SELECT _row, {", ".join(self.columns)} FROM "{self.name}" '
+                f'WHERE _row IN ({placeholders}) ORDER BY _row', row_numbers
+            )
+            return [(row[0], list(row[1:])) for row in cursor]
+
+    def find(self, column: str, value: str) -> List[List[str]]:
+        if column not in self.columns:
+            raise KeyError(column)
+        with self.mirror.lock:
+            cursor = self.mirror.conn.execute(f'{self._select} WHERE {column} = ? ORDER BY _row', (value,))
+            return [list(row) for row in cursor]
+
+    def fingerprint(self, watch_index: Optional[int]) -> Dict[int, Tuple[str, str]]:
+        if watch_index is None:
+            with self.mirror.lock:
+                cursor = self.mirror.conn.execute(f'SELECT _row, {", ".join(self.columns)} FROM "{self.name}"')
+                return {row[0]: (row[1] or '', row_digest(row[1:])) for row in cursor}
+        watch = self.columns[watch_index]
+        with self.mirror.lock:
+            cursor = self.mirror.conn.execute(f'SELECT _row, id, {watch} FROM "{self.name}"')
+            return {n: (row_id or '', watched or '') for n, row_id, watched in cursor}
+
+    def __len__(self):
+        with self.mirror.lock:
+            return self.mirror.conn.execute(f'SELECT COUNT(*) FROM "{self.name}"').fetchone()[0]
+
+
+class SheetsMirror(SheetsSnapshot):
+    """Réplique persistante de tous les onglets dans un fichier SQLite"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS _mirror_tabs (tab TEXT PRIMARY KEY, loaded_at TEXT)')
+        self.tabs = {name: MirrorTab(self, name) for name in TAB_COLUMNS}
+        for tab in self.tabs.values():
+            tab._create(self.conn)
+
+        # Un onglet déjà répliqué lors d'une exécution précédente est lisible immédiatement
+        for (name,) in self.conn.execute('SELECT tab FROM _mirror_tabs'):
+            if name in self.tabs:
+                self.tabs[name].loaded = True
+        for tab in self.tabs.values():
+            tab._load_hash(self.conn)
+
+    def transaction(self):
+        return _Transaction(self)
+
+
+class _Transaction:
+    """BEGIN/COMMIT sous le verrou du miroir"""
+
+    def __init__(self, mirror: SheetsMirror):
+        self.mirror = mirror
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.mirror.lock.acquire()
+        self.mirror.conn.execute('BEGIN')
+        return self.mirror.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.mirror.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.mirror.lock.release()
+        return False
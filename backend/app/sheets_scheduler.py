@@ -0,0 +1,145 @@
+"""
+Ordonnanceur des appels à l'API Google Sheets.
+
+Tous les appels passent par un seau à jetons (token bucket) calé sur le quota
+configuré (requêtes par minute). Quand le seau est vide, les appels attendent
+leur tour par priorité : les lectures interactives passent avant l'envoi de la
+file d'écriture, qui passe avant la synchronisation de fond. Les réponses
+429/5xx sont rejouées avec un backoff exponentiel et jitter ("full jitter").
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Any, Dict
+
+from googleapiclient.errors import HttpError
+
+from app.core.metrics import SHEETS_CALLS, SHEETS_ERRORS, instrument_sheets_request
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_WRITE_BEHIND = 1
+PRIORITY_SYNC = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_WRITE_BEHIND: 'write_behind',
+    PRIORITY_SYNC: 'sync',
+}
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SheetsCallScheduler:
+    """Limiteur de débit à priorités + rejeu des erreurs transitoires"""
+
+    def __init__(self, requests_per_minute: int, burst: int = 10, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 32.0):
+        self.requests_per_minute = requests_per_minute
+        self.capacity = max(1, min(burst, requests_per_minute))
+        # Rafale + remplissage sur 60 s ne dépassent jamais le quota par minute
+        self.refill_per_second = max(requests_per_minute - self.capacity, 1) / 60.0
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._waiters = []  # tas de (priorité, ordre d'arrivée)
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {
+            name: {'calls': 0, 'queued_seconds': 0.0, 'max_queued_ms': 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.refill_per_second)
+        self._last_refill = now
+
+    def _acquire(self, priority: int) -> float:
+        """Attend un jeton ; les appels les plus prioritaires sont servis en premier"""
+        start = time.monotonic()
+        ticket = (priority, next(self._order))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            while True:
+                self._refill()
+                if self._waiters[0] == ticket and self._tokens >= 1:
+                    heapq.heappop(self._waiters)
+                    self._tokens -= 1
+                    self._cond.notify_all()
+                    break
+                missing = max(0.0, 1 - self._tokens)
+                self._cond.wait(missing / self.refill_per_second if missing else None)
+        waited = time.monotonic() - start
+
+        stats = self.stats[PRIORITY_NAMES[priority]]
+        stats['calls'] += 1
+        stats['queued_seconds'] += waited
+        stats['max_queued_ms'] = max(stats['max_queued_ms'], round(waited * 1000, 1))
+        return waited
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        if isinstance(error, HttpError):
+            retry_after = error.resp.get('retry-after')
+        if retry_after:
+            try:
+                return min(self.max_delay, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def execute(self, request, priority: int = PRIORITY_INTERACTIVE, metered: bool = True) -> Any:
+        """Exécute une requête googleapiclient en respectant le quota ; relance HttpError à bout d'essais"""
+        method, tab = instrument_sheets_request(request)
+        attempt = 0
+        while True:
+            if metered:
+                self._acquire(priority)
+            SHEETS_CALLS.inc(method, tab)
+            try:
+                return request.execute()
+            except HttpError as e:
+                status = e.resp.status
+                SHEETS_ERRORS.inc(method, status)
+                if status == 429:
+                    self.throttled += 1
+                if status not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    self.failures += 1
+                    raise
+                error = e
+            except (ConnectionError, TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    self.failures += 1
+                    raise
+                error = e
+            delay = self._backoff(attempt, error)
+            self.retries += 1
+            attempt += 1
+            print(f"⏳ Appel Google Sheets rejeté ({error}), nouvel essai dans {delay:.1f}s")
+            time.sleep(delay)
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill()
+            tokens = self._tokens
+            waiting = len(self._waiters)
+        return {
+            'requests_per_minute': self.requests_per_minute,
+            'burst': self.capacity,
+            'tokens_available': round(tokens, 2),
+            'waiting': waiting,
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'failures': self.failures,
+            'queued': {
+                name: {**s, 'queued_seconds': round(s['queued_seconds'], 3)}
+                for name, s in self.stats.items()
+            },
+        }
@@ -0,0 +1,515 @@
+"""
+Instantané binaire des onglets Hopitaux et Services partagé entre workers uvicorn.
+
+Avec plusieurs workers, chacun gardait sa propre copie des onglets et son propre
+calendrier d'appels à Google. Ici, un seul processus (le « leader », élu par un
+verrou `fcntl.flock` sur `<fichier>.lock`) synchronise ces onglets et les
+publie dans un fichier binaire versionné, écrit à côté puis renommé
+(`os.replace`, atomique). Tous les workers, leader compris, projettent ce
+fichier en mémoire (`mmap`) et lisent les lignes directement dans les pages
+partagées du noyau : N workers = un seul téléchargement et une seule copie.
+
+Chaque worker vérifie le fichier toutes les `SHEETS_SHARED_SNAPSHOT_POLL_SECONDS`
+et bascule sur la nouvelle version d'un seul coup (les lectures en cours gardent
+l'ancienne projection). Si le leader s'arrête, un autre worker prend le verrou.
+
+Les écritures faites par un worker sont visibles chez lui tout de suite (table
+de surcharge en mémoire) puis oubliées dès qu'une version publiée les couvre.
+
+Format (ordre des octets natif, sections alignées sur 8 octets) :
+    en-tête      magic, format, nombre d'onglets, version, synced_through
+    répertoire   par onglet : nom, lignes, index, position des sections
+    sections     numéros de ligne (int64), positions des enregistrements (uint64),
+                 permutations triées par colonne indexée (uint32), enregistrements
+                 UTF-8 (cellules séparées par \\x1f)
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Any
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou consultatif, instantané partagé indisponible
+    fcntl = None
+
+from app.sheets_sync import SheetsSnapshot, TAB_COLUMNS, HASH_INDEXES, PROVISIONAL_ROW_BASE, index_key
+
+# Onglets partagés et colonnes indexées dans le fichier
+SHARED_TABS = {
+    'Hopitaux': ['id', 'email', 'nom'],
+    'Services': ['id', 'hopital_id'],
+}
+
+MAGIC = b'PULSESHM'
+FORMAT_VERSION = 1
+SEPARATOR = '\x1f'
+
+_HEADER = struct.Struct('=8sHHIQd')   # magic, format, onglets, réservé, version, synced_through
+_TAB = struct.Struct('=16sIIQQQ')     # nom, lignes, index, numéros, positions, enregistrements
+_INDEX = struct.Struct('=16sQ')       # colonne, permutation
+
+
+def shared_snapshot_supported() -> bool:
+    return fcntl is not None
+
+
+def _normalizer(tab: str, column: str):
+    """Clé de tri d'une colonne indexée : insensible à la casse pour les index de hachage"""
+    return index_key if column in HASH_INDEXES.get(tab, []) else str
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _encode(values: List[Any]) -> bytes:
+    return SEPARATOR.join(str(v).replace(SEPARATOR, ' ') for v in values).encode('utf-8')
+
+
+def write_snapshot(path: str, version: int, synced_through: float,
+                   tabs: Dict[str, List[Tuple[int, List[str]]]]) -> int:
+    """Écrit un instantané complet puis le met en place atomiquement. Retourne sa taille"""
+    sections = []
+    directory_size = _HEADER.size
+    for name, rows in tabs.items():
+        records = [_encode(values) for _, values in rows]
+        offsets = array('Q', [0])
+        for record in records:
+            offsets.append(offsets[-1] + len(record))
+        perms = []
+        for column in SHARED_TABS[name]:
+            col, norm = TAB_COLUMNS[name].index(column), _normalizer(name, column)
+            keys = [norm(values[col]) if len(values) > col else '' for _, values in rows]
+            perms.append((column, array('I', sorted(range(len(rows)), key=lambda i: (keys[i], i)))))
+        sections.append((name, array('q', [n for n, _ in rows]), offsets, perms, b''.join(records)))
+        directory_size += _TAB.size + _INDEX.size * len(perms)
+
+    # Positions des sections après l'en-tête et le répertoire
+    position = _align(directory_size)
+    directory = [_HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), 0, version, synced_through)]
+    payload = []
+
+    def place(data: bytes) -> int:
+        nonlocal position
+        start = position
+        payload.append((start, data))
+        position = _align(start + len(data))
+        return start
+
+    for name, numbers, offsets, perms, blob in sections:
+        numbers_at = place(numbers.tobytes())
+        offsets_at = place(offsets.tobytes())
+        perm_at = [(column, place(perm.tobytes())) for column, perm in perms]
+        blob_at = place(blob)
+        directory.append(_TAB.pack(name.encode(), len(numbers), len(perms), numbers_at, offsets_at, blob_at))
+        directory += [_INDEX.pack(column.encode(), at) for column, at in perm_at]
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(directory))
+        for start, data in payload:
+            f.seek(start)
+            f.write(data)
+        f.truncate(position)
+    os.replace(tmp_path, path)
+    return position
+
+
+class MappedTab:
+    """Vue zéro-copie d'un onglet dans le fichier projeté"""
+
+    def __init__(self, name: str, numbers: memoryview, offsets: memoryview, blob: memoryview,
+                 indexes: Dict[str, memoryview]):
+        self.name = name
+        self.numbers = numbers
+        self.offsets = offsets
+        self.blob = blob
+        self.indexes = indexes
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def row(self, i: int) -> List[str]:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        if start == end:
+            return []
+        return str(self.blob[start:end], 'utf-8').split(SEPARATOR)
+
+    def search(self, column: str, key: str) -> List[int]:
+        """Positions des lignes dont la colonne indexée vaut `key` (clé normalisée), dans l'ordre de la feuille"""
+        perm = self.indexes[column]
+        col, norm = TAB_COLUMNS[self.name].index(column), _normalizer(self.name, column)
+
+        def key_at(i):
+            values = self.row(i)
+            return norm(values[col]) if len(values) > col else ''
+
+        found = []
+        k = bisect_left(perm, key, key=key_at)
+        while k < len(perm) and key_at(perm[k]) == key:
+            found.append(perm[k])
+            k += 1
+        return found
+
+
+class MappedFile:
+    """Une version du fichier partagé, projetée en lecture seule"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        self.size = stat.st_size
+        view = memoryview(self._mmap)
+        magic, fmt, count, _, self.version, self.synced_through = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f'{path}: format d\'instantané inconnu')
+
+        self.tabs: Dict[str, MappedTab] = {}
+        position = _HEADER.size
+        for _ in range(count):
+            raw_name, rows, n_indexes, numbers_at, offsets_at, blob_at = _TAB.unpack_from(view, position)
+            position += _TAB.size
+            name = raw_name.rstrip(b'\0').decode()
+            indexes = {}
+            for _ in range(n_indexes):
+                raw_column, perm_at = _INDEX.unpack_from(view, position)
+                position += _INDEX.size
+                indexes[raw_column.rstrip(b'\0').decode()] = view[perm_at:perm_at + 4 * rows].cast('I')
+            offsets = view[offsets_at:offsets_at + 8 * (rows + 1)].cast('Q')
+            self.tabs[name] = MappedTab(
+                name,
+                numbers=view[numbers_at:numbers_at + 8 * rows].cast('q'),
+                offsets=offsets,
+                blob=view[blob_at:blob_at + offsets[rows]],
+                indexes=indexes,
+            )
+
+    def numbered_rows(self, tab: str) -> List[Tuple[int, List[str]]]:
+        mapped = self.tabs[tab]
+        return [(mapped.numbers[i], mapped.row(i)) for i in range(len(mapped))]
+
+
+class SharedRows(Sequence):
+    """Lignes d'un onglet projeté, décodées à la demande (aucune copie gardée en mémoire)"""
+
+    def __init__(self, mapped: MappedTab):
+        self._mapped = mapped
+
+    def __len__(self):
+        return len(self._mapped)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._mapped.row(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._mapped.row(i)
+
+    def __iter__(self):
+        row = self._mapped.row
+        for i in range(len(self._mapped)):
+            yield row(i)
+
+
+class SharedTab:
+    """Onglet lu dans le fichier partagé (même interface que `TabSnapshot`)
+
+    `source` est l'onglet du modèle local (mémoire ou miroir SQLite) : seul le
+    leader le synchronise et le publie. Les écritures locales sont aussi gardées
+    dans `_overlay` (numéro de ligne -> (valeurs ou None si supprimée, horodatage))
+    jusqu'à ce qu'une version publiée les couvre.
+    """
+
+    def __init__(self, shared: 'SharedSheetsSnapshot', name: str, source):
+        self.shared = shared
+        self.name = name
+        self.source = source
+        self.version = 0
+        self._mapped: Optional[MappedTab] = None
+        self._overlay: Dict[int, Tuple[Optional[List[str]], float]] = {}
+        self._merged: Optional[List[Tuple[int, List[str]]]] = None
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._mapped is not None
+
+    def _swap(self, mapped: Optional[MappedTab], synced_through: float):
+        with self._lock:
+            self._mapped = mapped
+            # Les lignes provisoires (file d'écriture) ne sont jamais publiées
+            self._overlay = {n: entry for n, entry in self._overlay.items()
+                             if n >= PROVISIONAL_ROW_BASE or entry[1] > synced_through}
+            self._touch()
+
+    def _touch(self):
+        self.version += 1
+        self._merged = None
+
+    # ----- Écritures -----
+
+    def replace(self, rows: List[Tuple[int, List[str]]]):
+        if not self.shared.is_leader:
+            return
+        self.source.replace(rows)
+        # Chargement complet : publier tout de suite plutôt qu'au prochain tour
+        self.shared.publish()
+
+    def _write(self, row_number: int, values: Optional[List[str]]):
+        with self._lock:
+            if values is None and row_number >= PROVISIONAL_ROW_BASE:
+                self._overlay.pop(row_number, None)
+            else:
+                self._overlay[row_number] = (values, time.time())
+            self._touch()
+
+    def set_row(self, row_number: int, values: List[str]):
+        if self.shared.is_leader:
+            self.source.set_row(row_number, values)
+        self._write(row_number, list(values))
+
+    def remove_row(self, row_number: int):
+        if self.shared.is_leader:
+            self.source.remove_row(row_number)
+        self._write(row_number, None)
+
+    def set_cell(self, row_number: int, col_index: int, value: Any):
+        if self.shared.is_leader:
+            self.source.set_cell(row_number, col_index, value)
+        with self._lock:
+            values = list(self._get(row_number) or [])
+            if len(values) <= col_index:
+                values += [''] * (col_index + 1 - len(values))
+            values[col_index] = '' if value is None else str(value)
+            self._write(row_number, values)
+
+    # ----- Lectures -----
+
+    def _get(self, row_number: int) -> Optional[List[str]]:
+        entry = self._overlay.get(row_number)
+        if entry is not None:
+            return entry[0]
+        mapped = self._mapped
+        if mapped is None:
+            return None
+        numbers = mapped.numbers
+        i = bisect_left(numbers, row_number)
+        return mapped.row(i) if i < len(numbers) and numbers[i] == row_number else None
+
+    def _merged_rows(self) -> List[Tuple[int, List[str]]]:
+        """Lignes du fichier + surcharge locale, triées (seulement si la surcharge n'est pas vide)"""
+        if self._merged is None:
+            merged = {}
+            mapped = self._mapped
+            if mapped is not None:
+                merged = {mapped.numbers[i]: mapped.row(i) for i in range(len(mapped))
+                          if mapped.numbers[i] not in self._overlay}
+            merged.update((n, values) for n, (values, _) in self._overlay.items() if values is not None)
+            self._merged = [(n, merged[n]) for n in sorted(merged)]
+        return self._merged
+
+    def rows(self) -> Sequence:
+        with self._lock:
+            if not self._overlay and self._mapped is not None:
+                return SharedRows(self._mapped)
+            return [values for _, values in self._merged_rows()]
+
+    def numbered_rows(self) -> List[Tuple[int, List[str]]]:
+        with self._lock:
+            return list(self._merged_rows())
+
+    def _search(self, column: str, value: str, exact: bool) -> List[Tuple[int, List[str]]]:
+        col = TAB_COLUMNS[self.name].index(column)
+        norm = str if exact else index_key
+        matches = lambda values: values is not None and len(values) > col and norm(values[col]) == norm(value)
+        with self._lock:
+            mapped, overlay = self._mapped, self._overlay
+            if mapped is not None and column in mapped.indexes:
+                key = _normalizer(self.name, column)(value)
+                candidates = ((mapped.numbers[i], mapped.row(i)) for i in mapped.search(column, key))
+            elif mapped is not None:
+                candidates = ((mapped.numbers[i], mapped.row(i)) for i in range(len(mapped)))
+            else:
+                candidates = ()
+            found = {n: values for n, values in candidates if n not in overlay and matches(values)}
+            found.update((n, values) for n, (values, _) in overlay.items() if matches(values))
+        return [(n, found[n]) for n in sorted(found)]
+
+    def row_number(self, row_id: str) -> Optional[int]:
+        found = self._search('id', row_id, exact=True)
+        return found[0][0] if found else None
+
+    def lookup(self, column: str, value: str) -> List[Tuple[int, List[str]]]:
+        return self._search(column, value, exact=False)
+
+    def find(self, column: str, value: str) -> List[List[str]]:
+        if column not in TAB_COLUMNS[self.name]:
+            raise KeyError(column)
+        return [values for _, values in self._search(column, value, exact=True)]
+
+    def fingerprint(self, watch_index: Optional[int]) -> Dict[int, Tuple[str, str]]:
+        # Utilisé par la synchronisation, donc seulement chez le leader
+        return self.source.fingerprint(watch_index)
+
+    def __len__(self):
+        with self._lock:
+            if not self._overlay:
+                return len(self._mapped) if self._mapped is not None else 0
+            return len(self._merged_rows())
+
+
+class SharedSheetsSnapshot(SheetsSnapshot):
+    """Onglets partagés via le fichier projeté, autres onglets délégués au modèle local"""
+
+    def __init__(self, base: SheetsSnapshot, path: str, poll_interval: float = 1.0):
+        self.base = base
+        self.path = path
+        self.poll_interval = poll_interval
+        self.is_leader = False
+        self.sync_worker = None
+        self.tabs = dict(base.tabs)
+        for name in SHARED_TABS:
+            self.tabs[name] = SharedTab(self, name, base[name])
+        self._file: Optional[MappedFile] = None
+        self._published_versions = None
+        self._published_synced = 0.0
+        # Données publiées en avance sur synced_through : republier après la passe suivante
+        self._behind_sync = False
+        self._lock_file = None
+        self._publish_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'publishes': 0, 'last_publish_ms': 0.0, 'swaps': 0, 'errors': 0}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.refresh()
+
+    # ----- Rôle -----
+
+    def _try_lead(self) -> bool:
+        """Prend le verrou du leader s'il est libre (non bloquant)"""
+        if self._lock_file is None:
+            self._lock_file = open(f'{self.path}.lock', 'a+')
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        self.is_leader = True
+        self._assign_tabs()
+        print(f"👑 Worker {os.getpid()} : rafraîchisseur de l'instantané partagé {self.path}")
+        return True
+
+    def _assign_tabs(self):
+        if self.sync_worker is None:
+            return
+        if self.is_leader:
+            self.sync_worker.tabs = list(self.tabs)
+        else:
+            self.sync_worker.tabs = [t for t in self.tabs if t not in SHARED_TABS]
+
+    def start(self, sync_worker):
+        """Élection puis vérification périodique du fichier (à appeler avant sync_worker.start)"""
+        self.sync_worker = sync_worker
+        self._try_lead()
+        self._assign_tabs()
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sheets-shared', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._lock_file is not None:
+            self._lock_file.close()  # libère le verrou : un autre worker prendra le relais
+            self._lock_file = None
+            self.is_leader = False
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.tick()
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"❌ Erreur de l'instantané partagé: {e}")
+
+    def tick(self):
+        if not self.is_leader:
+            self._try_lead()
+        if self.is_leader:
+            versions = tuple(self.base[t].version for t in SHARED_TABS)
+            synced = self.sync_worker.synced_through if self.sync_worker else 0.0
+            if versions != self._published_versions or (self._behind_sync and synced > self._published_synced):
+                self.publish()
+        self.refresh()
+
+    # ----- Publication (leader) -----
+
+    def publish(self):
+        """Écrit les onglets partagés du modèle local dans un nouveau fichier"""
+        with self._publish_lock:
+            start = time.perf_counter()
+            versions = tuple(self.base[t].version for t in SHARED_TABS)
+            current = self._file
+            tabs = {}
+            for name in SHARED_TABS:
+                if self.base.is_loaded(name):
+                    tabs[name] = [(n, values) for n, values in self.base[name].numbered_rows()
+                                  if n < PROVISIONAL_ROW_BASE]
+                elif current is not None and name in current.tabs:
+                    # Onglet pas encore rechargé par ce leader : reprendre la version publiée
+                    tabs[name] = current.numbered_rows(name)
+            if not tabs:
+                return
+            version = (current.version if current else 0) + 1
+            synced_through = self.sync_worker.synced_through if self.sync_worker else 0.0
+            write_snapshot(self.path, version, synced_through, tabs)
+            self._behind_sync = versions != self._published_versions
+            self._published_versions = versions
+            self._published_synced = synced_through
+            self.stats['publishes'] += 1
+            self.stats['last_publish_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        self.refresh()
+
+    # ----- Lecture (tous les workers) -----
+
+    def refresh(self) -> bool:
+        """Bascule sur le fichier publié s'il a changé. True si une nouvelle version est chargée"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        current = self._file
+        if current is not None and current.identity == (stat.st_ino, stat.st_mtime_ns):
+            return False
+        mapped = MappedFile(self.path)
+        self._file = mapped
+        for name in SHARED_TABS:
+            self.tabs[name]._swap(mapped.tabs.get(name), mapped.synced_through)
+        self.stats['swaps'] += 1
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        current = self._file
+        return {
+            'path': self.path,
+            'role': 'leader' if self.is_leader else 'follower',
+            'pid': os.getpid(),
+            'version': current.version if current else None,
+            'size_bytes': current.size if current else 0,
+            'synced_through': datetime.fromtimestamp(current.synced_through).isoformat(timespec='seconds')
+            if current and current.synced_through else None,
+            'overlay_rows': {name: len(self.tabs[name]._overlay) for name in SHARED_TABS},
+            **self.stats,
+        }
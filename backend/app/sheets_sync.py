@@ -0,0 +1,561 @@
+"""
+Synchronisation incrémentale entre Google Sheets et un modèle en mémoire.
+
+Le worker interroge d'abord la révision du classeur (métadonnées Drive) : si
+elle n'a pas bougé, aucune donnée n'est transférée. Sinon il ne télécharge que
+les colonnes clés de chaque onglet (id, plus `updated_at` pour Hopitaux) et ne
+relit que les lignes dont ces valeurs ont changé : ajouts, suppressions,
+déplacements et, pour Hopitaux, modifications.
+
+Les autres onglets n'ont pas d'horodatage de modification : une cellule
+modifiée en place (à la main ou par un autre worker) n'y change pas les
+colonnes clés. Ils sont donc aussi relus en entier et comparés ligne à ligne par
+empreinte de toutes les cellules, mais au plus une fois par
+`full_scan_interval` : une écriture locale, qui fait avancer la révision, ne
+coûte ainsi que la relecture de colonnes clés. Seules les lignes modifiées
+sont réappliquées au modèle.
+
+Une ligne téléchargée avant une écriture locale sur le même onglet n'est pas
+appliquée (elle annulerait cette écriture) : la version de l'onglet est notée
+avant chaque lecture et, si elle a changé entre-temps, l'onglet est repris à la
+passe suivante.
+"""
+import hashlib
+import math
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+from app.sheets_scheduler import PRIORITY_INTERACTIVE, PRIORITY_SYNC
+
+# Plage de données de chaque onglet (sans la ligne d'en-tête)
+TAB_RANGES = {
+    'Hopitaux': 'A2:X',
+    'Services': 'A2:L',
+    'Avis': 'A2:K',
+    'Equipements': 'A2:G',
+    'Utilisateurs': 'A2:G',
+}
+
+# Noms des colonnes de chaque onglet, dans l'ordre de la feuille
+TAB_COLUMNS = {
+    'Hopitaux': [
+        'id', 'nom', 'adresse', 'ville', 'region', 'pays',
+        'latitude', 'longitude', 'telephone', 'email',
+        'description', 'type_etablissement', 'nombre_lits',
+        'horaires_ouverture', 'site_web', 'image_url',
+        'capacite_totale', 'capacite_disponible', 'temps_moyen_attente',
+        'note_moyenne', 'nombre_avis', 'statut',
+        'created_at', 'updated_at'
+    ],
+    'Services': ['id', 'hopital_id', 'nom_service', 'departement', 'disponibilite',
+                 'specialites', 'medecins_disponibles', 'equipements', 'tarif_consultation',
+                 'commentaires', 'statut', 'date_ajout'],
+    'Avis': ['id', 'hopital_id', 'utilisateur_id', 'note', 'service_utilise',
+             'commentaire', 'criteres_notes', 'date_visite', 'date_avis',
+             'verifie', 'statut'],
+    'Equipements': ['id', 'hopital_id', 'nom', 'quantite', 'disponible', 'etat', 'date_ajout'],
+    'Utilisateurs': ['id', 'email', 'password_hash', 'nom_hopital', 'role', 'created_at', 'last_login'],
+}
+
+# Colonne témoin : si elle change, la ligne est considérée comme modifiée.
+# Onglets absents : empreinte de la ligne entière (pas d'horodatage de modification)
+WATCH_COLUMNS = {
+    'Hopitaux': 'X',      # updated_at
+}
+
+# Index de hachage maintenus en mémoire (valeur normalisée -> numéros de ligne)
+HASH_INDEXES = {
+    'Utilisateurs': ['email'],
+    'Hopitaux': ['email', 'nom'],
+}
+
+# Les lignes en attente d'écriture (file write-behind) sont placées au-delà de
+# ce numéro tant que leur position réelle dans la feuille n'est pas connue
+PROVISIONAL_ROW_BASE = 1_000_000
+
+# Nombre maximum de plages par appel batchGet (limite de longueur d'URL)
+MAX_RANGES_PER_CALL = 100
+
+_A1_RE = re.compile(r"^'?(?P<tab>[^'!]+)'?!(?P<c0>[A-Z]+)(?P<r0>\d+)(?::(?P<c1>[A-Z]+)(?P<r1>\d+))?$")
+
+
+def column_index(letters: str) -> int:
+    """Convertit une lettre de colonne (A, B, ..., AA) en index 0-based"""
+    index = 0
+    for char in letters:
+        index = index * 26 + (ord(char) - 64)
+    return index - 1
+
+
+def parse_a1(range_name: str) -> Optional[Tuple[str, int, int]]:
+    """Retourne (onglet, colonne 0-based, ligne 1-based) du coin haut-gauche d'une plage A1"""
+    match = _A1_RE.match(range_name)
+    if not match:
+        return None
+    return match.group('tab'), column_index(match.group('c0')), int(match.group('r0'))
+
+
+def row_digest(values: List[Any]) -> str:
+    """Empreinte de toutes les cellules d'une ligne (cellules vides finales ignorées,
+    l'API Sheets ne les renvoie pas)"""
+    cells = ['' if v is None else str(v) for v in values]
+    while cells and not cells[-1]:
+        cells.pop()
+    return hashlib.blake2b('\x1f'.join(cells).encode(), digest_size=16).hexdigest()
+
+
+def index_key(value: Any) -> str:
+    """Clé normalisée des index de hachage (insensible à la casse)"""
+    return str(value).strip().casefold()
+
+
+class HashIndexes:
+    """Index de hachage valeur normalisée -> numéros de ligne, par colonne"""
+
+    def __init__(self, name: str):
+        self.columns = {c: TAB_COLUMNS[name].index(c) for c in HASH_INDEXES.get(name, [])}
+        self.clear()
+
+    def clear(self):
+        self._maps: Dict[str, Dict[str, set]] = {c: {} for c in self.columns}
+
+    def add(self, row_number: int, values: List[str]):
+        for column, col in self.columns.items():
+            if len(values) > col and values[col]:
+                self._maps[column].setdefault(index_key(values[col]), set()).add(row_number)
+
+    def remove(self, row_number: int, values: Optional[List[str]]):
+        if not values:
+            return
+        for column, col in self.columns.items():
+            if len(values) > col and values[col]:
+                key = index_key(values[col])
+                row_numbers = self._maps[column].get(key)
+                if row_numbers:
+                    row_numbers.discard(row_number)
+                    if not row_numbers:
+                        del self._maps[column][key]
+
+    def get(self, column: str, value: Any) -> List[int]:
+        return sorted(self._maps[column].get(index_key(value), ()))
+
+
+class TabSnapshot:
+    """Copie en mémoire d'un onglet, indexée par numéro de ligne, par id et par hachage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.loaded = False
+        self.version = 0
+        self._rows: Dict[int, List[str]] = {}  # numéro de ligne (1-based) -> valeurs
+        self._by_id: Dict[str, int] = {}       # id (colonne A) -> numéro de ligne
+        self._hash = HashIndexes(name)
+        self._ordered: Optional[List[List[str]]] = None
+        self._lock = threading.RLock()
+
+    def _touch(self):
+        self.version += 1
+        self._ordered = None
+
+    def _index(self, row_number: int, values: List[str]):
+        row_id = values[0] if values else ''
+        if row_id:
+            self._by_id[row_id] = row_number
+        self._hash.add(row_number, values)
+
+    def _unindex(self, row_number: int):
+        old = self._rows.get(row_number)
+        if old and old[0] and self._by_id.get(old[0]) == row_number:
+            del self._by_id[old[0]]
+        self._hash.remove(row_number, old)
+
+    def replace(self, rows: List[Tuple[int, List[str]]]):
+        """Remplace tout le contenu de l'onglet (les lignes provisoires sont conservées)"""
+        with self._lock:
+            pending = [(n, v) for n, v in self._rows.items() if n >= PROVISIONAL_ROW_BASE]
+            self._rows = {}
+            self._by_id = {}
+            self._hash.clear()
+            for row_number, values in list(rows) + pending:
+                self._rows[row_number] = values
+                self._index(row_number, values)
+            self.loaded = True
+            self._touch()
+
+    def set_row(self, row_number: int, values: List[str]):
+        with self._lock:
+            self._unindex(row_number)
+            self._rows[row_number] = values
+            self._index(row_number, values)
+            self._touch()
+
+    def remove_row(self, row_number: int):
+        with self._lock:
+            if row_number in self._rows:
+                self._unindex(row_number)
+                del self._rows[row_number]
+                self._touch()
+
+    def set_cell(self, row_number: int, col_index: int, value: Any):
+        with self._lock:
+            values = list(self._rows.get(row_number, []))
+            if len(values) <= col_index:
+                values += [''] * (col_index + 1 - len(values))
+            values[col_index] = '' if value is None else str(value)
+            self.set_row(row_number, values)
+
+    def rows(self) -> List[List[str]]:
+        """Lignes dans l'ordre de la feuille (même forme que `_read_range`)"""
+        with self._lock:
+            if self._ordered is None:
+                self._ordered = [self._rows[n] for n in sorted(self._rows)]
+            return self._ordered
+
+    def numbered_rows(self) -> List[Tuple[int, List[str]]]:
+        """(numéro de ligne, valeurs) dans l'ordre de la feuille"""
+        with self._lock:
+            return [(n, self._rows[n]) for n in sorted(self._rows)]
+
+    def row_number(self, row_id: str) -> Optional[int]:
+        with self._lock:
+            return self._by_id.get(row_id)
+
+    def lookup(self, column: str, value: str) -> List[Tuple[int, List[str]]]:
+        """(numéro de ligne, valeurs) via un index de hachage, sans parcourir l'onglet"""
+        with self._lock:
+            return [(n, self._rows[n]) for n in self._hash.get(column, value)]
+
+    def find(self, column: str, value: str) -> List[List[str]]:
+        """Lignes dont la colonne vaut exactement `value`"""
+        col = TAB_COLUMNS[self.name].index(column)
+        return [row for row in self.rows() if len(row) > col and row[col] == value]
+
+    def fingerprint(self, watch_index: Optional[int]) -> Dict[int, Tuple[str, str]]:
+        """(id, valeur témoin) pour chaque ligne, utilisé pour le diff
+        (`watch_index` None : empreinte de la ligne entière)"""
+        with self._lock:
+            if watch_index is None:
+                return {n: (values[0] if values else '', row_digest(values)) for n, values in self._rows.items()}
+            return {
+                n: (values[0] if values else '',
+                    values[watch_index] if len(values) > watch_index else '')
+                for n, values in self._rows.items()
+            }
+
+    def __len__(self):
+        return len(self._rows)
+
+
+class SheetsSnapshot:
+    """Ensemble des onglets synchronisés"""
+
+    def __init__(self, tabs=TAB_RANGES):
+        self.tabs = {name: TabSnapshot(name) for name in tabs}
+
+    def __getitem__(self, tab: str) -> TabSnapshot:
+        return self.tabs[tab]
+
+    def is_loaded(self, tab: str) -> bool:
+        return tab in self.tabs and self.tabs[tab].loaded
+
+    def apply_update(self, range_name: str, values: List[List[Any]]):
+        """Répercute localement une écriture réussie sur la feuille"""
+        parsed = parse_a1(range_name)
+        if not parsed:
+            return
+        tab, col_start, row_start = parsed
+        if not self.is_loaded(tab):
+            return
+        snapshot = self.tabs[tab]
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                snapshot.set_cell(row_start + i, col_start + j, value)
+
+
+class SheetsSyncWorker:
+    """Thread de fond qui applique les deltas de Google Sheets au modèle en mémoire"""
+
+    def __init__(self, sheets, snapshot: SheetsSnapshot, interval: int, full_reload_ratio: float = 0.5,
+                 tabs: Optional[List[str]] = None, full_scan_interval: float = 300):
+        self.sheets = sheets
+        self.snapshot = snapshot
+        # Onglets synchronisés par ce worker (les autres sont alimentés ailleurs, cf. app.sheets_shared)
+        self.tabs = list(snapshot.tabs if tabs is None else tabs)
+        self.interval = interval
+        self.full_reload_ratio = full_reload_ratio
+        self.full_scan_interval = full_scan_interval
+        # Dernière relecture complète (time.monotonic) de chaque onglet
+        self._scanned_at: Dict[str, float] = {}
+        self._revision: Optional[str] = None
+        # Horodatage (time.time) du début de la dernière passe complète : le modèle
+        # reflète toutes les écritures faites sur la feuille avant cet instant
+        self.synced_through = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Appelés avec le nom de l'onglet quand des changements distants y sont appliqués
+        self.listeners: List[Callable[[str], None]] = []
+        self.stats = {
+            'last_sync_at': None,
+            'last_sync_ms': 0.0,
+            'syncs': 0,
+            'unchanged': 0,
+            'full_loads': 0,
+            'rows_fetched': 0,
+            'rows_removed': 0,
+            'full_scans': 0,
+            'stale_skips': 0,
+            'errors': 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sheets-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.sync_once()
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"❌ Erreur de synchronisation Google Sheets: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def ensure_loaded(self, tab: str) -> bool:
+        """Charge un onglet entier s'il ne l'est pas encore (premier accès)"""
+        if self.snapshot.is_loaded(tab) or tab not in self.tabs:
+            return self.snapshot.is_loaded(tab)
+        with self._lock:
+            if not self.snapshot.is_loaded(tab):
+                self._full_load([tab], PRIORITY_INTERACTIVE)
+        return self.snapshot.is_loaded(tab)
+
+    def sync_once(self):
+        """Une passe de synchronisation : révision, puis diff des colonnes clés"""
+        with self._lock:
+            start = time.perf_counter()
+            started_at = time.time()
+            tabs = self.tabs
+            revision = self.sheets._fetch_revision()
+            all_loaded = all(self.snapshot.is_loaded(t) for t in tabs)
+            if revision is not None and revision == self._revision and all_loaded:
+                self.stats['unchanged'] += 1
+                self.synced_through = started_at
+                return
+
+            unloaded = [t for t in tabs if not self.snapshot.is_loaded(t)]
+            loaded = [t for t in tabs if t not in unloaded]
+            complete = True
+            if unloaded:
+                complete = self._full_load(unloaded, PRIORITY_SYNC)
+            if loaded:
+                complete = self._delta_sync(loaded) and complete
+
+            if complete:
+                # Passe incomplète : même révision à la prochaine, qui doit tout de même reprendre
+                self._revision = revision
+                self.synced_through = started_at
+            self.stats['syncs'] += 1
+            self.stats['last_sync_at'] = datetime.now().isoformat(timespec='seconds')
+            self.stats['last_sync_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    def _notify(self, tabs):
+        for tab in tabs:
+            for listener in self.listeners:
+                try:
+                    listener(tab)
+                except Exception as e:
+                    print(f"Erreur de notification de synchronisation ({tab}): {e}")
+
+    def _version(self, tab: str) -> int:
+        """Version du modèle que la synchronisation met à jour (source locale d'un onglet partagé)"""
+        snapshot = self.snapshot[tab]
+        return getattr(snapshot, 'source', snapshot).version
+
+    def _full_load(self, tabs: List[str], priority: int, versions: Optional[Dict[str, int]] = None) -> bool:
+        """Charge des onglets entiers. `versions` : versions notées avant la lecture, un onglet
+        modifié localement depuis n'est pas remplacé (False : à reprendre)"""
+        results = self.sheets._batch_read([f'{t}!{TAB_RANGES[t]}' for t in tabs], priority)
+        if results is None:
+            return False
+        loaded = []
+        for tab, rows in zip(tabs, results):
+            if versions is not None and self._version(tab) != versions[tab]:
+                self.stats['stale_skips'] += 1
+                continue
+            self.snapshot[tab].replace([(i + 2, row) for i, row in enumerate(rows) if row])
+            self._scanned_at[tab] = time.monotonic()
+            self.stats['full_loads'] += 1
+            self.stats['rows_fetched'] += len(rows)
+            loaded.append(tab)
+        self._notify(loaded)
+        return len(loaded) == len(tabs)
+
+    def _delta_sync(self, tabs: List[str]) -> bool:
+        # Versions avant toute lecture : les lignes lues ne sont appliquées qu'à un onglet
+        # resté inchangé depuis (sinon une écriture locale serait annulée)
+        versions = {tab: self._version(tab) for tab in tabs}
+        now = time.monotonic()
+        scans = {
+            tab for tab in tabs
+            if tab not in WATCH_COLUMNS and now - self._scanned_at.get(tab, -math.inf) >= self.full_scan_interval
+        }
+
+        # 1. Colonnes clés (id, colonne témoin éventuelle) en un seul appel, onglets
+        #    entiers pour ceux dont la relecture complète est due
+        key_ranges = []
+        for tab in tabs:
+            if tab in scans:
+                key_ranges.append(f'{tab}!{TAB_RANGES[tab]}')
+                continue
+            key_ranges.append(f'{tab}!A2:A')
+            watch = WATCH_COLUMNS.get(tab)
+            if watch:
+                key_ranges.append(f'{tab}!{watch}2:{watch}')
+        results = self.sheets._batch_read(key_ranges, PRIORITY_SYNC)
+        if results is None:
+            return False
+
+        def unchanged(tab: str) -> bool:
+            if self._version(tab) == versions[tab]:
+                return True
+            self.stats['stale_skips'] += 1
+            return False
+
+        # 2. Diff par onglet
+        complete = True
+        row_ranges = []
+        removals: Dict[str, List[int]] = {}
+        reloads = []
+        replaced: List[str] = []    # onglets relus en entier et remplacés à l'étape 1
+        applied = set()             # onglets dont les lignes modifiées ont été appliquées à l'étape 1
+        position = 0
+        for tab in tabs:
+            remote = {}
+            full_rows: Dict[int, List[str]] = {}
+            if tab in scans:
+                rows = results[position]
+                position += 1
+                self.stats['rows_fetched'] += len(rows)
+                for i, row in enumerate(rows):
+                    if row:
+                        full_rows[i + 2] = row
+                        remote[i + 2] = (row[0], row_digest(row))
+                local = self.snapshot[tab].fingerprint(None)
+            else:
+                # Sans colonne témoin, l'id sert de valeur témoin (fingerprint(0) : (id, id))
+                ids = results[position]
+                watched = results[position + 1] if tab in WATCH_COLUMNS else ids
+                position += 2 if tab in WATCH_COLUMNS else 1
+                for i in range(max(len(ids), len(watched))):
+                    row_id = ids[i][0] if i < len(ids) and ids[i] else ''
+                    watch_value = watched[i][0] if i < len(watched) and watched[i] else ''
+                    if row_id or watch_value:
+                        remote[i + 2] = (row_id, watch_value)
+                watch = WATCH_COLUMNS.get(tab)
+                local = self.snapshot[tab].fingerprint(column_index(watch) if watch else 0)
+
+            changed = sorted(n for n, key in remote.items() if local.get(n) != key)
+            removals[tab] = [n for n in local if n not in remote and n < PROVISIONAL_ROW_BASE]
+
+            if tab in scans:
+                # Lignes déjà téléchargées : appliquées directement
+                if not unchanged(tab):
+                    complete = False
+                    removals.pop(tab)
+                    continue
+                if len(changed) > self.full_reload_ratio * max(len(remote), 1):
+                    self.snapshot[tab].replace(sorted(full_rows.items()))
+                    self.stats['full_loads'] += 1
+                    replaced.append(tab)
+                else:
+                    for n in changed:
+                        self.snapshot[tab].set_row(n, full_rows[n])
+                    if changed:
+                        applied.add(tab)
+                versions[tab] = self._version(tab)
+                self._scanned_at[tab] = now
+                self.stats['full_scans'] += 1
+                continue
+
+            if len(changed) > self.full_reload_ratio * max(len(remote), 1):
+                reloads.append(tab)
+                continue
+            last_col = TAB_RANGES[tab].split(':')[1]
+            for first, last in _contiguous_blocks(changed):
+                row_ranges.append((tab, first, last, f'{tab}!A{first}:{last_col}{last}'))
+
+        if reloads:
+            complete = self._full_load(reloads, PRIORITY_SYNC, versions) and complete
+
+        # 3. Relecture des seules lignes modifiées
+        stale = set()
+        for chunk_start in range(0, len(row_ranges), MAX_RANGES_PER_CALL):
+            chunk = row_ranges[chunk_start:chunk_start + MAX_RANGES_PER_CALL]
+            blocks = self.sheets._batch_read([r[3] for r in chunk], PRIORITY_SYNC)
+            if blocks is None:
+                return False
+            for (tab, first, last, _), rows in zip(chunk, blocks):
+                if tab in stale or not unchanged(tab):
+                    stale.add(tab)
+                    continue
+                for offset in range(last - first + 1):
+                    row = rows[offset] if offset < len(rows) else []
+                    if row:
+                        self.snapshot[tab].set_row(first + offset, row)
+                        self.stats['rows_fetched'] += 1
+                    else:
+                        self.snapshot[tab].remove_row(first + offset)
+                versions[tab] = self._version(tab)
+
+        for tab, row_numbers in removals.items():
+            if tab in reloads or tab in replaced or tab in stale or not row_numbers:
+                continue
+            if not unchanged(tab):
+                stale.add(tab)
+                continue
+            for n in row_numbers:
+                self.snapshot[tab].remove_row(n)
+                self.stats['rows_removed'] += 1
+            versions[tab] = self._version(tab)
+
+        changed_tabs = {r[0] for r in row_ranges} | applied | {t for t, rows in removals.items() if rows}
+        self._notify(sorted((changed_tabs - set(reloads) - stale) | set(replaced)))
+        return complete and not stale
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'interval_seconds': self.interval,
+            'revision': self._revision,
+            'tabs': {
+                name: {'loaded': tab.loaded, 'rows': len(tab), 'version': tab.version}
+                for name, tab in self.snapshot.tabs.items()
+            },
+            **self.stats,
+        }
+
+
+def _contiguous_blocks(row_numbers: List[int]) -> List[Tuple[int, int]]:
+    """Regroupe des numéros de lignes triés en plages contiguës"""
+    blocks = []
+    for n in row_numbers:
+        if blocks and n == blocks[-1][1] + 1:
+            blocks[-1][1] = n
+        else:
+            blocks.append([n, n])
+    return [(first, last) for first, last in blocks]
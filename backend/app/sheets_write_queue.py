@@ -0,0 +1,327 @@
+"""
+File d'écriture différée (write-behind) pour les ajouts de lignes dans Google Sheets.
+
+Les lignes sont acceptées immédiatement : elles sont journalisées sur disque
+(une ligne JSON par ajout, avec fsync) puis visibles tout de suite dans le
+modèle local à un numéro de ligne provisoire. Un thread de fond les envoie par
+lots — un seul appel `append` multi-lignes par onglet — toutes les
+`flush_interval` secondes ou dès que `max_batch` lignes sont en attente.
+
+Chaque processus (worker uvicorn) a son propre journal, `<journal>.<pid>.jsonl`,
+verrouillé (`fcntl.flock` sur `<fichier>.lock`) tant qu'il vit. Au démarrage,
+puis régulièrement, un worker reprend les journaux dont le verrou est libre
+(worker arrêté ou crashé) : leurs lignes passent dans son propre journal puis
+le fichier repris est supprimé. Seul le propriétaire crée son verrou : un
+verrou absent signifie un journal déjà repris. L'ancien journal unique, qui
+n'a pas de verrou, est pris par renommage atomique : un seul worker y parvient. Un journal n'est donc
+rejoué que par un seul worker et aucun worker n'efface les lignes d'un autre :
+rien n'est perdu en cas de crash (livraison au moins une fois ; un crash entre
+l'envoi et la réécriture du journal peut dupliquer un lot).
+"""
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou consultatif, journaux des autres processus non repris
+    fcntl = None
+
+from app.sheets_sync import PROVISIONAL_ROW_BASE, parse_a1
+from app.sheets_scheduler import PRIORITY_WRITE_BEHIND
+
+# Intervalle de recherche des journaux abandonnés par d'autres processus
+ORPHAN_SCAN_SECONDS = 60
+
+
+def _try_lock(lock_path: str, create: bool = False):
+    """Fichier verrou ouvert et verrouillé en exclusif, ou None s'il est tenu par un processus vivant.
+
+    `create` : seulement pour le verrou de ce processus. Pour reprendre un journal,
+    le verrou n'est pas recréé (il a été supprimé par le worker qui l'a repris).
+    """
+    try:
+        fd = os.open(lock_path, os.O_RDWR | (os.O_CREAT if create else 0), 0o644)
+    except OSError:
+        return None
+    lock_file = os.fdopen(fd, 'r+')
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # Verrou pris sur un fichier supprimé entre-temps par le worker qui l'a repris
+        if not os.path.exists(lock_path) or os.stat(lock_path).st_ino != os.fstat(lock_file.fileno()).st_ino:
+            raise OSError('journal déjà repris')
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _read_journal(path: str) -> List[Dict[str, Any]]:
+    entries = []
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Dernière ligne tronquée par un crash pendant l'écriture
+                    continue
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+class SheetsWriteQueue:
+    """Accumule les ajouts de lignes et les envoie par lots à Google Sheets"""
+
+    def __init__(self, sheets, journal_path: str, flush_interval: float, max_batch: int):
+        self.sheets = sheets
+        root, ext = os.path.splitext(journal_path)
+        self.journal_path = f'{root}.{os.getpid()}{ext}'
+        # Journaux repris par ce processus : ceux des workers arrêtés et l'ancien journal unique
+        self._orphan_paths = [journal_path, f'{root}.*{ext}']
+        self._lock_file = None
+        self._orphan_scan_at = 0.0
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: List[Dict[str, Any]] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            'enqueued': 0,
+            'flushed_rows': 0,
+            'flush_calls': 0,
+            'flush_errors': 0,
+            'last_flush_at': None,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+        }
+        if self.enabled:
+            self._replay_journal()
+
+    @property
+    def enabled(self) -> bool:
+        return self.flush_interval > 0
+
+    # ----- Journal -----
+
+    def _replay_journal(self):
+        if fcntl is not None:
+            # Tenu jusqu'à la fin du processus : les autres workers ne reprennent pas ce journal
+            self._lock_file = _try_lock(f'{self.journal_path}.lock', create=True)
+        # Journal de ce pid laissé par un processus précédent (pid réutilisé)
+        replayed = _read_journal(self.journal_path)
+        if replayed:
+            self._adopt(replayed)
+            self._rewrite_journal()
+        claimed = self._claim_orphans()
+        if replayed or claimed:
+            print(f"♻️ {len(replayed) + claimed} ligne(s) Google Sheets en attente rejouée(s) depuis le journal")
+
+    def _adopt(self, entries: List[Dict[str, Any]]):
+        """Ajoute des entrées d'un autre journal à la file, renumérotées (appelé sous verrou ou à l'init)"""
+        for entry in sorted(entries, key=lambda e: e.get('queued_at', 0)):
+            self._seq += 1
+            self._pending.append(dict(entry, seq=self._seq))
+
+    def _claim_orphans(self) -> int:
+        """Reprend les journaux dont le verrou est libre. Retourne le nombre de lignes reprises"""
+        self._orphan_scan_at = time.monotonic()
+        legacy, pattern = self._orphan_paths
+        claimed = self._claim_legacy(legacy)
+        if fcntl is None:
+            return claimed
+        for path in sorted(glob.glob(pattern)):
+            if path == self.journal_path or not os.path.exists(path):
+                continue
+            lock_file = _try_lock(f'{path}.lock')
+            if lock_file is None:
+                continue
+            try:
+                claimed += self._adopt_file(path)
+                _remove(f'{path}.lock')
+            finally:
+                lock_file.close()
+        return claimed
+
+    def _claim_legacy(self, legacy: str) -> int:
+        """Ancien journal unique : renommé vers un nom propre à ce processus avant d'être lu"""
+        claimed_path = f'{self.journal_path}.legacy'
+        try:
+            os.rename(legacy, claimed_path)
+        except OSError:
+            # Absent, ou déjà renommé par un autre worker
+            return 0
+        return self._adopt_file(claimed_path)
+
+    def _adopt_file(self, path: str) -> int:
+        """Passe les lignes d'un journal repris dans le nôtre puis le supprime"""
+        entries = _read_journal(path)
+        with self._lock:
+            start = len(self._pending)
+            self._adopt(entries)
+            adopted = self._pending[start:]
+            # Dans notre journal avant de supprimer l'autre : pas de fenêtre de perte
+            self._rewrite_journal()
+        _remove(path)
+        if self._thread is not None:
+            for entry in adopted:
+                self._show_provisional(entry)
+        return len(entries)
+
+    def _rewrite_journal(self):
+        """Réécrit le journal avec les seules entrées encore en attente (appelé sous verrou)"""
+        tmp_path = f'{self.journal_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self._pending:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+
+    # ----- API -----
+
+    def enqueue(self, sheet_name: str, values: List[Any]):
+        """Accepte une ligne : journalisée, visible localement, envoyée plus tard"""
+        row = ['' if v is None else str(v) for v in values]
+        with self._lock:
+            self._seq += 1
+            entry = {'seq': self._seq, 'tab': sheet_name, 'values': row, 'queued_at': time.time()}
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending.append(entry)
+            self.stats['enqueued'] += 1
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.notify()
+        self._show_provisional(entry)
+
+    def _show_provisional(self, entry: Dict[str, Any]):
+        # Les lignes provisoires survivent au chargement complet de l'onglet
+        self.sheets.snapshot[entry['tab']].set_row(PROVISIONAL_ROW_BASE + entry['seq'], entry['values'])
+
+    def flush(self) -> bool:
+        """Envoie toutes les lignes en attente, un appel par onglet. True si tout est parti"""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return True
+
+            start = time.perf_counter()
+            by_tab: Dict[str, List[Dict[str, Any]]] = {}
+            for entry in batch:
+                by_tab.setdefault(entry['tab'], []).append(entry)
+
+            done = set()
+            for tab, entries in by_tab.items():
+                updated_range = self.sheets._append_rows(
+                    tab, [e['values'] for e in entries], PRIORITY_WRITE_BEHIND
+                )
+                self.stats['flush_calls'] += 1
+                if updated_range is None:
+                    self.stats['flush_errors'] += 1
+                    continue
+                done.update(e['seq'] for e in entries)
+                self._promote(tab, entries, updated_range)
+
+            with self._lock:
+                self._pending = [e for e in self._pending if e['seq'] not in done]
+                self._rewrite_journal()
+
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+            self.stats['flushed_rows'] += len(done)
+            self.stats['last_flush_at'] = datetime.now().isoformat(timespec='seconds')
+            self.stats['last_flush_ms'] = elapsed_ms
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed_ms)
+            return len(done) == len(batch)
+
+    def _promote(self, tab: str, entries: List[Dict[str, Any]], updated_range: str):
+        """Remplace les lignes provisoires par leur position réelle dans la feuille"""
+        snapshot = self.sheets.snapshot
+        parsed = parse_a1(updated_range)
+        for i, entry in enumerate(entries):
+            snapshot[tab].remove_row(PROVISIONAL_ROW_BASE + entry['seq'])
+            if parsed and snapshot.is_loaded(tab):
+                snapshot[tab].set_row(parsed[2] + i, entry['values'])
+
+    # ----- Thread de fond -----
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        # Rendre visibles les lignes rejouées depuis le journal
+        for entry in list(self._pending):
+            self._show_provisional(entry)
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='sheets-write-behind', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._stop = True
+            self._wakeup.notify()
+        if self._thread:
+            self._thread.join(timeout=10)
+        if self.flush() and self.enabled:
+            # Plus rien en attente : journal et verrou de ce pid supprimés
+            with self._lock:
+                if not self._pending:
+                    _remove(self.journal_path)
+            if self._lock_file is not None:
+                _remove(f'{self.journal_path}.lock')
+                self._lock_file.close()
+                self._lock_file = None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._stop and len(self._pending) < self.max_batch:
+                    self._wakeup.wait(self.flush_interval)
+                if self._stop:
+                    return
+            try:
+                if time.monotonic() - self._orphan_scan_at >= ORPHAN_SCAN_SECONDS:
+                    claimed = self._claim_orphans()
+                    if claimed:
+                        print(f"♻️ {claimed} ligne(s) Google Sheets reprise(s) du journal d'un worker arrêté")
+                flushed = self.flush()
+            except Exception as e:
+                flushed = False
+                self.stats['flush_errors'] += 1
+                print(f"❌ Erreur d'envoi groupé Google Sheets: {e}")
+            if not flushed:
+                # Éviter de marteler l'API quand elle refuse les lots
+                time.sleep(self.flush_interval)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            backlog = len(self._pending)
+            oldest = min((e['queued_at'] for e in self._pending), default=None)
+        return {
+            'enabled': self.enabled,
+            'backlog': backlog,
+            'oldest_pending_seconds': round(time.time() - oldest, 1) if oldest else 0.0,
+            'flush_interval_seconds': self.flush_interval,
+            'max_batch': self.max_batch,
+            **self.stats,
+        }
@@ -0,0 +1,176 @@
+"""
+Benchmark du score de recommandation (recherche d'hôpitaux).
+
+Sur un jeu synthétique de 10 000 hôpitaux :
+1. route GET /api/v1/hospitals/search (avec position, top `--limit`) appelée
+   par TestClient sur l'application complète (middlewares compris), le modèle
+   synchronisé étant simulé par des onglets en mémoire. Mesurée deux fois :
+   modèle en cache (seules distance et score sont calculés par requête), puis
+   cache invalidé avant chaque requête (lignes Hopitaux converties en
+   dictionnaires et vecteurs recalculés à chaque fois, comme avant le cache) ;
+2. ancien calcul du score par requête (note, attente, équipements par
+   sous-chaînes, horaires), trié, comparé au moteur précalculé de
+   `app.scoring` (`ScoringEngine.top`, tri complet puis top `--limit`).
+
+Usage (depuis backend/) :
+    python benchmarks/bench_scoring.py [--hospitals 10000] [--seconds 3] [--limit 20]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['SHEETS_ENABLED'] = 'true'     # routes /api/v1/hospitals montées
+os.environ.setdefault('SQL_SERVER_TIMING', 'false')
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.scoring import ScoringEngine  # noqa: E402
+from micro import FixtureSheetsService, make_tabs  # noqa: E402
+
+EQUIPMENTS = ['Scanner', 'Echographe', 'ECG', 'Défibrillateur', 'IRM', 'Radiologie', 'Oxygène']
+LEGACY_WEIGHTS = {
+    'scanner': 150, 'échographe': 120, 'echographe': 120,
+    'ecg': 80, 'défibrillateur': 60, 'defibrillateur': 60,
+}
+
+
+def make_dataset(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    hospitals, services = [], []
+    for i in range(n):
+        hospital_id = f'H{i:06d}'
+        hospitals.append({
+            'id': hospital_id,
+            'nom': f'Hôpital {i}',
+            'latitude': 12.3 + rng.random() * 4.3,
+            'longitude': -17.5 + rng.random() * 5.8,
+            'note_moyenne': round(rng.random() * 5, 1),
+            'temps_moyen_attente': str(rng.randint(0, 120)),
+            'horaires_ouverture': rng.choice(['24h/24', 'Lun-Ven 8h-18h', 'Lun-Sam 8h-20h']),
+        })
+        for j in range(rng.randint(1, 4)):
+            services.append([f'S{i}-{j}', hospital_id, 'Service', '', '', '', '0',
+                             ', '.join(rng.sample(EQUIPMENTS, 3)), '0', '', 'Actif', ''])
+    return hospitals, services
+
+
+def legacy_rank(hospitals, services_by_hospital, latitude, longitude, now):
+    """Reproduction du calcul historique de hospitals_routes.search_hospitals"""
+    for hospital in hospitals:
+        dlat = math.radians(hospital['latitude'] - latitude)
+        dlon = math.radians(hospital['longitude'] - longitude)
+        a = (math.sin(dlat / 2) ** 2 + math.cos(math.radians(latitude))
+             * math.cos(math.radians(hospital['latitude'])) * math.sin(dlon / 2) ** 2)
+        hospital['distance_km'] = round(6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)), 2)
+        score = 1000 - hospital['distance_km'] * 10
+        score += float(hospital.get('note_moyenne', 0)) * 50
+        score -= int(hospital.get('temps_moyen_attente', 0)) * 2
+        bonus, seen = 0, set()
+        for srv in services_by_hospital.get(hospital['id'], []):
+            eq = str(srv[7]).lower()
+            for key, w in LEGACY_WEIGHTS.items():
+                if key in eq and key not in seen:
+                    bonus += w
+                    seen.add(key)
+        score += bonus
+        hours = hospital.get('horaires_ouverture', '24h/24').lower()
+        if '24h' not in hours and (now.hour < 8 or now.hour > 18 or now.weekday() > 4):
+            score -= 5000
+        hospital['recommendation_score'] = score
+    return hospitals
+
+
+def measure(label, fn, seconds):
+    fn()  # échauffement
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        count += 1
+    elapsed = time.perf_counter() - start
+    print(f'{label:<34} {count / elapsed:10.1f} req/s   {elapsed / count * 1000:8.2f} ms/req')
+    return count / elapsed
+
+
+class SyncedFixtureSheetsService(FixtureSheetsService):
+    """Onglets synthétiques servis comme par le modèle synchronisé (versions, cache du score)"""
+
+    def __init__(self, tabs):
+        super().__init__(tabs)
+        for name, rows in tabs.items():
+            self.snapshot[name].replace([(i + 2, row) for i, row in enumerate(rows)])
+        self.sync_worker = SimpleNamespace(enabled=True, ensure_loaded=lambda tab: True)
+
+    def _tab_rows(self, sheet_name):
+        return self.snapshot[sheet_name].rows()
+
+
+def bench_route(args, now):
+    from app.google_sheets_service import sheets_service
+    from app.main import create_app
+
+    service = SyncedFixtureSheetsService(make_tabs(args.hospitals))
+    sheets_service._instance = service
+    client = TestClient(create_app())   # sans `with` : pas de lifespan (ni migrations, ni Google)
+    rng = random.Random(2)
+
+    def search():
+        response = client.get('/api/v1/hospitals/search', params={
+            'latitude': 14.0 + rng.random(), 'longitude': -17.0 + rng.random(),
+            'rayon_km': 500, 'limit': args.limit, 'ouvert_a': now.isoformat(),
+        })
+        body = response.json()
+        if response.status_code != 200 or 'error' in body:
+            raise RuntimeError(body)
+
+    def search_uncached():
+        service.scoring._version = None
+        search()
+
+    cached = measure('route /search, modèle en cache', search, args.seconds)
+    uncached = measure('route /search, modèle relu', search_uncached, args.seconds)
+    print(f'gain : x{cached / uncached:.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hospitals', type=int, default=10000)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--limit', type=int, default=20, help='k de la sélection top-k')
+    args = parser.parse_args()
+
+    hospitals, services = make_dataset(args.hospitals)
+    services_by_hospital = {}
+    for row in services:
+        services_by_hospital.setdefault(row[1], []).append(row)
+    now = datetime(2024, 1, 10, 22, 0)  # mercredi soir : les horaires comptent
+    rng = random.Random(1)
+
+    bench_route(args, now)
+
+    def user_position():
+        return 14.0 + rng.random(), -17.0 + rng.random()
+
+    engine = ScoringEngine()
+    start = time.perf_counter()
+    vectors = engine.build(hospitals, services)
+    print(f'{args.hospitals} hôpitaux, précalcul des vecteurs : {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    by_score = lambda h: h['recommendation_score']
+    legacy = measure('ancien calcul + tri complet', lambda: sorted(
+        legacy_rank(hospitals, services_by_hospital, *user_position(), now), key=by_score, reverse=True), args.seconds)
+    engine_rps = measure('moteur précalculé + tri complet', lambda: engine.top(
+        hospitals, *user_position(), math.inf, when=now, vectors=vectors), args.seconds)
+    print(f'gain : x{engine_rps / legacy:.1f}')
+    measure(f'moteur précalculé + top-{args.limit} (tas)', lambda: engine.top(
+        hospitals, *user_position(), math.inf, limit=args.limit, when=now, vectors=vectors), args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Mesure du démarrage à froid, avec et sans les routes Google Sheets.
+
+Pour chaque configuration, lance plusieurs fois uvicorn dans un processus neuf
+et mesure le temps jusqu'à la première réponse HTTP 200 sur `/` (ce que subit
+le premier utilisateur après une mise en veille Render), ainsi que le temps
+d'import de `app.main` seul.
+
+Usage (depuis backend/) :
+    python benchmarks/cold_start.py [--runs 5]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGURATIONS = {
+    'sans Google Sheets': {'SHEETS_ENABLED': 'false'},
+    'avec Google Sheets': {'SHEETS_ENABLED': 'true'},
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _env(extra: dict, workdir: str) -> dict:
+    env = dict(os.environ, **extra)
+    env.setdefault('DATABASE_URL', f'sqlite:///{workdir}/cold_start.db')
+    # Fichiers locaux du service Sheets dans un répertoire jetable
+    env.setdefault('SHEETS_MIRROR_PATH', os.path.join(workdir, 'mirror.db'))
+    env.setdefault('SHEETS_WRITE_JOURNAL_PATH', os.path.join(workdir, 'journal.jsonl'))
+    env.setdefault('SHEETS_REVIEW_AGGREGATES_PATH', os.path.join(workdir, 'aggregates.json'))
+    return env
+
+
+def import_time(env: dict) -> float:
+    code = 'import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)'
+    out = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def first_response_time(env: dict, timeout: float = 60.0) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError('aucune réponse du serveur')
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'configuration':<22} {'import app.main':>16} {'1re réponse':>14}")
+    for label, extra in CONFIGURATIONS.items():
+        with tempfile.TemporaryDirectory() as workdir:
+            env = _env(extra, workdir)
+            imports = [import_time(env) for _ in range(args.runs)]
+            responses = [first_response_time(env) for _ in range(args.runs)]
+        print(f'{label:<22} {statistics.median(imports) * 1000:13.0f} ms {statistics.median(responses) * 1000:11.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
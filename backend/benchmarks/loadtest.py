@@ -0,0 +1,278 @@
+"""
+Test de charge local : combien de tableaux de bord un worker tient-il ?
+
+Le script crée une base SQLite jetable (migrations + N hôpitaux avec capacité,
+localisation, services et équipements), lance uvicorn dessus dans un processus
+séparé, puis simule des tableaux de bord ouverts en parallèle. Chaque
+utilisateur virtuel rejoue les appels du frontend (frontend/src/lib/api.js) :
+
+- à l'ouverture : `POST /auth/login`, `GET /hospital/me` (AuthContext) ;
+- puis en boucle : `GET /hospital/dashboard`, `/capacity/`, `/services/` et
+  `/equipment/`, séparés par le temps de réflexion du profil.
+
+Profils :
+- `polling` : rafraîchissement toutes les 5 s, comme un écran laissé ouvert ;
+- `burst`   : aucune pause, pour trouver le débit maximal ;
+- `login`   : chaque cycle recommence par une connexion (pic du matin, bcrypt).
+
+Le rapport donne, par route, le nombre de requêtes, le taux d'erreur et les
+percentiles de latence, ainsi que le débit global.
+
+Usage (depuis backend/) :
+    python benchmarks/loadtest.py [--hospitals 200] [--users 50] [--duration 30]
+                                  [--profile polling|burst|login] [--workers 1]
+                                  [--think SECONDES] [--json resultats.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cold_start import BACKEND_DIR, _env, _free_port  # noqa: E402
+
+PASSWORD = 'loadtest'
+PROFILES = {
+    'polling': {'think': 5.0, 'login_each_cycle': False},
+    'burst': {'think': 0.0, 'login_each_cycle': False},
+    'login': {'think': 0.0, 'login_each_cycle': True},
+}
+SESSION_START = ['/hospital/me']
+POLLING_CYCLE = ['/hospital/dashboard', '/capacity/', '/services/', '/equipment/']
+
+
+def seed(database_url: str, hospitals: int, rng: random.Random):
+    """Schéma par les migrations puis N hôpitaux complets (un seul hachage bcrypt)"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app.core.security import get_password_hash
+    from app.db.migrations import upgrade
+    from app.db.models.hospital import Hospital
+    from app.db.models.capacity import Capacity
+    from app.db.models.location import Location
+    from app.db.models.services import Service
+    from app.db.models.equipment import Equipment
+
+    engine = create_engine(database_url)
+    upgrade(engine)
+    password = get_password_hash(PASSWORD)
+    ids = range(1, hospitals + 1)
+    with Session(engine) as db:
+        db.bulk_insert_mappings(Hospital, [
+            {'id': i, 'name': f'Hôpital {i}', 'email': f'h{i}@loadtest.sn', 'password': password,
+             'address': f'{i} rue du test', 'phone': '+221000000'} for i in ids
+        ])
+        db.bulk_insert_mappings(Capacity, [
+            {'hospital_id': i, 'beds': 100, 'occupied_beds': rng.randint(0, 100),
+             'total_doctors': 20, 'active_doctors': rng.randint(0, 20),
+             'total_nurses': 40, 'active_nurses': rng.randint(0, 40),
+             'waiting_queue': rng.randint(0, 30), 'average_wait_time': rng.randint(5, 90)} for i in ids
+        ])
+        db.bulk_insert_mappings(Location, [
+            {'hospital_id': i, 'latitude': 3.8 + rng.random(), 'longitude': 11.5 + rng.random(),
+             'city': rng.choice(['Yaoundé', 'Douala', 'Bafoussam']), 'region': rng.choice(['Centre', 'Littoral', 'Ouest']),
+             'country': 'Cameroon'} for i in ids
+        ])
+        db.bulk_insert_mappings(Service, [
+            {'hospital_id': i, 'name': f'Service {j}', 'description': 'Consultations'} for i in ids for j in range(8)
+        ])
+        db.bulk_insert_mappings(Equipment, [
+            {'hospital_id': i, 'name': f'Équipement {j}', 'quantity': rng.randint(0, 10), 'available': True}
+            for i in ids for j in range(12)
+        ])
+        db.commit()
+    engine.dispose()
+
+
+def start_server(env: dict, port: int, workers: int, timeout: float = 60.0) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--no-access-log'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as resp:
+                if resp.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise TimeoutError('le serveur ne répond pas')
+
+
+class Recorder:
+    """Latences et erreurs par route, partagées entre les utilisateurs virtuels"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, route: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+
+class VirtualUser(threading.Thread):
+    """Un tableau de bord ouvert : connexion persistante, token Bearer"""
+
+    def __init__(self, port: int, hospital_id: int, profile: dict, stop_at: float, recorder: Recorder):
+        super().__init__(daemon=True)
+        self.port = port
+        self.email = f'h{hospital_id}@loadtest.sn'
+        self.profile = profile
+        self.stop_at = stop_at
+        self.recorder = recorder
+        self.conn = None
+        self.headers = {}
+
+    def call(self, method: str, path: str, body: dict = None) -> dict:
+        route = f'{method} {path}'
+        payload = json.dumps(body) if body is not None else None
+        headers = dict(self.headers, **({'Content-Type': 'application/json'} if payload else {}))
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            self.conn.request(method, f'/api/v1{path}', body=payload, headers=headers)
+            resp = self.conn.getresponse()
+            data = resp.read()
+            ok = resp.status < 400
+        except (OSError, http.client.HTTPException):
+            self.conn = None  # reconnexion au prochain appel
+            data, ok = b'', False
+        self.recorder.record(route, time.perf_counter() - start, ok)
+        return json.loads(data) if ok and data else {}
+
+    def login(self):
+        token = self.call('POST', '/auth/login', {'email': self.email, 'password': PASSWORD}).get('access_token')
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+        for path in SESSION_START:
+            self.call('GET', path)
+
+    def run(self):
+        logged_in = False
+        while time.perf_counter() < self.stop_at:
+            if not logged_in or self.profile['login_each_cycle']:
+                self.login()
+                logged_in = True
+            for path in POLLING_CYCLE:
+                self.call('GET', path)
+            if self.profile['think']:
+                # Léger décalage pour ne pas synchroniser tous les écrans
+                pause = self.profile['think'] * random.uniform(0.8, 1.2)
+                time.sleep(max(0.0, min(pause, self.stop_at - time.perf_counter())))
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict:
+    routes = {}
+    for route, latencies in sorted(recorder.latencies.items()):
+        routes[route] = {
+            'requests': len(latencies),
+            'errors': recorder.errors[route],
+            'error_rate': round(recorder.errors[route] / len(latencies), 4),
+            **{f'p{p}_ms': round(percentile(latencies, p) * 1000, 1) for p in (50, 90, 95, 99)},
+            'max_ms': round(max(latencies) * 1000, 1),
+        }
+    every = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    total = len(every)
+    errors = sum(recorder.errors.values())
+    return {
+        'duration_s': round(elapsed, 1),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        **({f'p{p}_ms': round(percentile(every, p) * 1000, 1) for p in (50, 90, 95, 99)} if every else {}),
+        'routes': routes,
+    }
+
+
+def report(result: Dict, args):
+    print(f"\n{args.users} tableaux de bord, profil {args.profile}, {args.workers} worker(s), "
+          f"{args.hospitals} hôpitaux, {result['duration_s']} s")
+    print(f"{'route':<28} {'req':>7} {'err %':>7} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for route, stats in result['routes'].items():
+        print(f"{route:<28} {stats['requests']:7d} {stats['error_rate'] * 100:6.2f}% "
+              f"{stats['p50_ms']:8.1f} {stats['p90_ms']:8.1f} {stats['p95_ms']:8.1f} "
+              f"{stats['p99_ms']:8.1f} {stats['max_ms']:8.1f}")
+    print('-' * 92)
+    if result['requests']:
+        print(f"{'total':<28} {result['requests']:7d} {result['error_rate'] * 100:6.2f}% "
+              f"{result['p50_ms']:8.1f} {result['p90_ms']:8.1f} {result['p95_ms']:8.1f} {result['p99_ms']:8.1f}")
+    print(f"Débit : {result['throughput_rps']} requêtes/s (latences en ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hospitals', type=int, default=200)
+    parser.add_argument('--users', type=int, default=50, help='tableaux de bord simultanés')
+    parser.add_argument('--duration', type=float, default=30.0, help='durée de la mesure (s)')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='polling')
+    parser.add_argument('--think', type=float, help='pause entre deux rafraîchissements (remplace le profil)')
+    parser.add_argument('--workers', type=int, default=1, help='workers uvicorn')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='écrire le résultat dans ce fichier')
+    args = parser.parse_args()
+
+    profile = dict(PROFILES[args.profile])
+    if args.think is not None:
+        profile['think'] = args.think
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Toujours une base jetable, même si DATABASE_URL est défini dans l'environnement
+        env = _env({'SHEETS_ENABLED': 'false', 'DATABASE_MIGRATE_ON_STARTUP': 'false',
+                    'DATABASE_URL': f'sqlite:///{workdir}/loadtest.db'}, workdir)
+        print(f'🌱 {args.hospitals} hôpitaux dans {env["DATABASE_URL"]}')
+        seed(env['DATABASE_URL'], args.hospitals, rng)
+        port = _free_port()
+        server = start_server(env, port, args.workers)
+        try:
+            recorder = Recorder()
+            start = time.perf_counter()
+            stop_at = start + args.duration
+            users = [
+                VirtualUser(port, rng.randint(1, args.hospitals), profile, stop_at, recorder)
+                for _ in range(args.users)
+            ]
+            print(f'🚀 {args.users} utilisateurs virtuels pendant {args.duration:.0f} s')
+            for user in users:
+                user.start()
+            for user in users:
+                user.join()
+            result = summarize(recorder, time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report(result, args)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(dict(result, profile=args.profile, users=args.users, workers=args.workers,
+                           hospitals=args.hospitals), f, indent=2)
+            f.write('\n')
+        print(f'💾 Résultat enregistré dans {args.json}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""
+Micro-benchmarks des fonctions chaudes du backend.
+
+Cas mesurés, sur des onglets Google Sheets synthétiques de plusieurs tailles
+(aucun appel réseau : le service lit les lignes générées ici) :
+
+- `calculate_distance`             : N distances haversine ;
+- `get_all_hospitals`              : conversion des lignes Hopitaux/Services en dictionnaires ;
+- `sheets.search_hospitals`        : filtres (service, ville) puis tri par note ;
+- `sheets.search_hospitals[tri]`   : sans filtre, tri de tous les hôpitaux ;
+- `routes.search_hospitals`        : route de recherche avec position (score, rayon, top 20) ;
+- `scoring.top`                    : score par requête avec vecteurs précalculés, top 20 ;
+- `search_index.search`            : recherche plein texte (FTS5, préfixes, BM25), index à jour ;
+- `jwt.encode` / `jwt.decode`      : jeton d'accès ;
+- `bcrypt.verify`                  : vérification d'un mot de passe.
+
+Chaque cas est mesuré par lots d'au moins `--min-time` secondes, sur `--repeat`
+tours entrelacés ; on garde le meilleur temps par appel, le moins sensible au bruit. Les temps
+sont comparés à benchmarks/micro_baseline.json : le script sort en erreur
+(code 1) si un cas dépasse sa référence de plus de `--threshold` (25 % par défaut).
+
+Usage (depuis backend/) :
+    python benchmarks/micro.py [--sizes 100,1000,10000] [--filter jwt] [--threshold 0.25]
+    python benchmarks/micro.py --update-baseline
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SHEETS_ENABLED', 'false')
+
+from app.google_sheets_service import GoogleSheetsService  # noqa: E402
+from app.hospital_search import HospitalSearchIndex  # noqa: E402
+from app.scoring import ScoringEngine  # noqa: E402
+from app.sheets_sync import SheetsSnapshot  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'micro_baseline.json')
+
+CITIES = [('Dakar', 'Dakar'), ('Thiès', 'Thiès'), ('Saint-Louis', 'Saint-Louis'), ('Ziguinchor', 'Ziguinchor'),
+          ('Kaolack', 'Kaolack'), ('Touba', 'Diourbel'), ('Mbour', 'Thiès'), ('Tambacounda', 'Tambacounda')]
+TYPES = ['Hôpital', 'Clinique', 'Centre de santé', 'Poste de santé']
+SERVICES = ['Urgences', 'Cardiologie', 'Pédiatrie', 'Maternité', 'Radiologie', 'Chirurgie', 'Dentaire']
+EQUIPMENTS = ['Scanner', 'Echographe', 'ECG', 'Défibrillateur', 'IRM', 'Radiologie', 'Oxygène']
+HOURS = ['24h/24', 'Lun-Ven 8h-18h', 'Lun-Sam 8h-20h']
+NOW = datetime(2024, 1, 10, 22, 0)  # mercredi soir : les horaires comptent
+
+
+# ============= FIXTURES =============
+
+def make_tabs(n: int, seed: int = 42) -> Dict[str, List[List[str]]]:
+    """Onglets Hopitaux et Services tels que renvoyés par l'API Sheets (chaînes, virgules décimales)"""
+    rng = random.Random(seed)
+    hospitals, services = [], []
+    for i in range(n):
+        hospital_id = f'H{i:06d}'
+        city, region = rng.choice(CITIES)
+        rating = f'{rng.random() * 5:.1f}'.replace('.', ',') if rng.random() < 0.3 else f'{rng.random() * 5:.1f}'
+        hospitals.append([
+            hospital_id, f'Hôpital {i}', f'{i} avenue Bourguiba', city, region, 'Sénégal',
+            f'{12.3 + rng.random() * 4.3:.6f}', f'{-17.5 + rng.random() * 5.8:.6f}', '+221330000000',
+            f'h{i}@pulseai.sn', 'Établissement de test', rng.choice(TYPES), str(rng.randint(10, 500)),
+            rng.choice(HOURS), '', '', str(rng.randint(10, 500)), str(rng.randint(0, 100)),
+            str(rng.randint(0, 120)), rating, str(rng.randint(0, 400)),
+            'Actif' if rng.random() < 0.95 else '#ERROR!', '2024-01-01', '2024-01-02',
+        ])
+        for j, name in enumerate(rng.sample(SERVICES, rng.randint(1, 4))):
+            services.append([f'S{i}-{j}', hospital_id, name, '', 'Oui', '', str(rng.randint(0, 10)),
+                             ', '.join(rng.sample(EQUIPMENTS, 3)), '5000', '', 'Actif', '2024-01-01'])
+    return {'Hopitaux': hospitals, 'Services': services}
+
+
+class FixtureSheetsService(GoogleSheetsService):
+    """GoogleSheetsService lisant des onglets synthétiques (pas d'identifiants, pas de réseau)"""
+
+    def __init__(self, tabs: Dict[str, List[List[str]]]):
+        self.tabs = tabs
+        self.snapshot = SheetsSnapshot()
+        self.sync_worker = SimpleNamespace(enabled=False)
+        self.scoring = ScoringEngine(self)
+        self.search_index = HospitalSearchIndex(self)
+
+    def _tab_rows(self, sheet_name: str) -> List[List[str]]:
+        return self.tabs.get(sheet_name, [])
+
+
+# ============= CAS =============
+
+def case_calculate_distance(n: int) -> Callable:
+    from app.hospitals_routes import calculate_distance
+    rng = random.Random(1)
+    points = [(14.7, -17.4, 12.3 + rng.random() * 4.3, -17.5 + rng.random() * 5.8) for _ in range(n)]
+    return lambda: [calculate_distance(*p) for p in points]
+
+
+def case_get_all_hospitals(n: int) -> Callable:
+    return FixtureSheetsService(make_tabs(n)).get_all_hospitals
+
+
+def case_sheets_search_filtered(n: int) -> Callable:
+    service = FixtureSheetsService(make_tabs(n))
+    return lambda: service.search_hospitals(service='Cardiologie', ville='Dakar')
+
+
+def case_sheets_search_sorted(n: int) -> Callable:
+    return FixtureSheetsService(make_tabs(n)).search_hospitals
+
+
+def case_route_search(n: int) -> Callable:
+    from app import hospitals_routes
+    from app.google_sheets_service import sheets_service
+    service = FixtureSheetsService(make_tabs(n))
+
+    def search():
+        sheets_service._instance = service
+        result = hospitals_routes.search_hospitals(
+            service=None, ville=None, region=None, type_etablissement=None,
+            latitude=14.7, longitude=-17.4, rayon_km=500.0, ouvert_a=NOW, limit=20,
+        )
+        # La route renvoie l'erreur au lieu de la lever : un échec serait mesuré comme très rapide
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        return result
+    return search
+
+
+def case_scoring_top(n: int) -> Callable:
+    tabs = make_tabs(n)
+    service = FixtureSheetsService(tabs)
+    hospitals = service.get_all_hospitals()
+    vectors = service.scoring.build(hospitals, tabs['Services'])
+    return lambda: service.scoring.top(hospitals, 14.7, -17.4, 500.0, limit=20, when=NOW, vectors=vectors)
+
+
+def case_search_index(n: int) -> Callable:
+    service = FixtureSheetsService(make_tabs(n))
+    # Modèle synchronisé à version fixe : l'index est construit une fois, comme en production
+    service.sync_worker = SimpleNamespace(enabled=True, ensure_loaded=lambda name: True)
+    service.search_index.refresh()
+    return lambda: service.search_index.search('cardio dakar', limit=20)
+
+
+def case_jwt_encode(_: Optional[int]) -> Callable:
+    from app.core.jwt import create_access_token
+    return lambda: create_access_token({'sub': 'h42@pulseai.sn'})
+
+
+def case_jwt_decode(_: Optional[int]) -> Callable:
+    from app.core.jwt import create_access_token, decode_access_token
+    token = create_access_token({'sub': 'h42@pulseai.sn'})
+    return lambda: decode_access_token(token)
+
+
+def case_bcrypt_verify(_: Optional[int]) -> Callable:
+    from app.core.security import get_password_hash, verify_password
+    hashed = get_password_hash('motdepasse')
+    return lambda: verify_password('motdepasse', hashed)
+
+
+# (nom, fabrique, dépend de la taille)
+CASES = [
+    ('calculate_distance', case_calculate_distance, True),
+    ('get_all_hospitals', case_get_all_hospitals, True),
+    ('sheets.search_hospitals', case_sheets_search_filtered, True),
+    ('sheets.search_hospitals[tri]', case_sheets_search_sorted, True),
+    ('routes.search_hospitals', case_route_search, True),
+    ('scoring.top', case_scoring_top, True),
+    ('search_index.search', case_search_index, True),
+    ('jwt.encode', case_jwt_encode, False),
+    ('jwt.decode', case_jwt_decode, False),
+    ('bcrypt.verify', case_bcrypt_verify, False),
+]
+
+
+# ============= MESURE =============
+
+def calibrate(fn: Callable, min_time: float) -> int:
+    """Nombre d'appels d'un lot d'au moins `min_time` secondes"""
+    fn()  # échauffement
+    number = 1
+    while True:
+        elapsed = run_lot(fn, number)
+        if elapsed >= min_time:
+            return number
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+
+def run_lot(fn: Callable, number: int) -> float:
+    """Durée d'un lot, ramasse-miettes désactivé comme dans `timeit` : toutes les
+    fixtures restent en mémoire et un passage du GC sur ce tas fausserait le cas en cours"""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def measure(sizes: List[int], name_filter: Optional[str], repeat: int, min_time: float) -> Dict[str, float]:
+    """Meilleur temps par appel (µs) de chaque cas.
+
+    Les lots des différents cas sont entrelacés (un lot de chaque cas par tour) :
+    une charge passagère de la machine ne pénalise pas toutes les mesures d'un cas.
+    """
+    lots = {}
+    for name, factory, sized in CASES:
+        if name_filter and name_filter not in name:
+            continue
+        for size in sizes if sized else [None]:
+            fn = factory(size)
+            lots[f'{name}[n={size}]' if sized else name] = (fn, calibrate(fn, min_time))
+    best = dict.fromkeys(lots, float('inf'))
+    for round_ in range(repeat):
+        for key, (fn, number) in lots.items():
+            best[key] = min(best[key], run_lot(fn, number) / number)
+        print(f'  tour {round_ + 1}/{repeat}', flush=True)
+    results = {key: round(seconds * 1e6, 3) for key, seconds in best.items()}
+    for key, us in results.items():
+        print(f'  {key:<44} {_format(us)}')
+    return results
+
+
+def _format(us: float) -> str:
+    if us >= 1000:
+        return f'{us / 1000:10.2f} ms'
+    return f'{us:10.2f} µs'
+
+
+def check(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> bool:
+    ok = True
+    print(f"\n{'cas':<44} {'mesure':>13} {'référence':>13} {'écart':>8}")
+    for key, us in results.items():
+        reference = baseline.get(key)
+        if not reference:
+            print(f'   {key:<44} {_format(us)} {"—":>13}')
+            continue
+        ratio = us / reference - 1
+        status = '✅' if ratio <= threshold else '❌'
+        ok = ok and ratio <= threshold
+        print(f'{status} {key:<44} {_format(us)} {_format(reference)} {ratio:+8.0%}')
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000', help='tailles des jeux synthétiques')
+    parser.add_argument('--filter', help='ne mesurer que les cas dont le nom contient ce texte')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.1, help='durée minimale d\'un lot (s)')
+    parser.add_argument('--threshold', type=float, default=0.25, help='régression tolérée (0.25 = 25 %%)')
+    parser.add_argument('--update-baseline', action='store_true', help='enregistrer les mesures comme référence')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = measure(sizes, args.filter, args.repeat, args.min_time)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        # Les cas non mesurés (--filter, --sizes) gardent leur référence
+        baseline.update(results)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'💾 Référence enregistrée dans {BASELINE_PATH}')
+        return
+
+    if not baseline:
+        print('⚠️ Aucune référence : lancer avec --update-baseline')
+        return
+    if not check(results, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
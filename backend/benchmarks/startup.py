@@ -0,0 +1,120 @@
+"""
+Budget de démarrage : temps d'import par module et temps jusqu'à la 1re réponse.
+
+- `python -X importtime -c "import app.main"` donne le temps d'import cumulé de
+  chaque module ; on garde les modules de l'application (`app.*`) et les
+  dépendances les plus lourdes.
+- uvicorn est lancé dans un processus neuf jusqu'à la première réponse 200 sur `/`
+  (voir benchmarks/cold_start.py).
+
+Les médianes sont comparées à benchmarks/startup_baseline.json : le script
+sort en erreur (code 1) si l'import de `app.main` ou la 1re réponse dépasse la
+référence de plus de `--threshold` (20 % par défaut).
+
+Usage (depuis backend/) :
+    python benchmarks/startup.py [--runs 5] [--top 15] [--threshold 0.2]
+    python benchmarks/startup.py --update-baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cold_start import BACKEND_DIR, _env, first_response_time  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_baseline.json')
+
+
+def import_profile(env: dict) -> Dict[str, float]:
+    """Temps d'import cumulé (ms) de chaque module chargé par `import app.main`"""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app.main'],
+                         cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    modules: Dict[str, float] = {}
+    for line in out.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        # Un module n'est importé qu'une fois : la 1re occurrence fait foi
+        modules.setdefault(name, int(cumulative) / 1000)
+    return modules
+
+
+def measure(runs: int) -> Dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        env = _env({'SHEETS_ENABLED': 'false'}, workdir)
+        profiles = [import_profile(env) for _ in range(runs)]
+        responses = [first_response_time(env) * 1000 for _ in range(runs)]
+    names = set().union(*profiles)
+    modules = {name: statistics.median(p.get(name, 0.0) for p in profiles) for name in names}
+    return {
+        'import_ms': round(modules.get('app.main', 0.0), 1),
+        'first_response_ms': round(statistics.median(responses), 1),
+        'modules_ms': {name: round(ms, 1) for name, ms in modules.items()},
+    }
+
+
+def report(result: Dict, top: int):
+    modules = result['modules_ms']
+    own = sorted((n for n in modules if n == 'app' or n.startswith('app.')), key=modules.get, reverse=True)
+    heavy = sorted((n for n in modules if '.' not in n and n != 'app'), key=modules.get, reverse=True)
+    print(f"{'module (cumulé)':<40} {'ms':>8}")
+    for name in own[:top]:
+        print(f'{name:<40} {modules[name]:8.1f}')
+    print('-' * 49)
+    for name in heavy[:top]:
+        print(f'{name:<40} {modules[name]:8.1f}')
+    print('-' * 49)
+    print(f"{'import app.main':<40} {result['import_ms']:8.1f}")
+    print(f"{'1re réponse (uvicorn)':<40} {result['first_response_ms']:8.1f}")
+
+
+def check(result: Dict, baseline: Dict, threshold: float) -> bool:
+    ok = True
+    for key, label in (('import_ms', 'import app.main'), ('first_response_ms', '1re réponse')):
+        reference = baseline.get(key)
+        if not reference:
+            continue
+        ratio = result[key] / reference - 1
+        status = '✅' if ratio <= threshold else '❌'
+        print(f'{status} {label}: {result[key]:.0f} ms (référence {reference:.0f} ms, {ratio:+.0%})')
+        ok = ok and ratio <= threshold
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='nombre de modules affichés')
+    parser.add_argument('--threshold', type=float, default=0.2, help='régression tolérée (0.2 = 20 %%)')
+    parser.add_argument('--update-baseline', action='store_true', help='enregistrer la mesure comme référence')
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    report(result, args.top)
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({'import_ms': result['import_ms'], 'first_response_ms': result['first_response_ms']}, f, indent=2)
+            f.write('\n')
+        print(f'💾 Référence enregistrée dans {BASELINE_PATH}')
+        return
+
+    if not os.path.exists(BASELINE_PATH):
+        print('⚠️ Aucune référence : lancer avec --update-baseline')
+        return
+    with open(BASELINE_PATH, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if not check(result, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+"""Crée ou met à jour le schéma de la base (migrations de app/db/migrations)"""
+from app.db.migrations import upgrade
+
+if __name__ == "__main__":
+    if not upgrade():
+        print("✅ Schéma à jour")
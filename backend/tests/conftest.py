@@ -0,0 +1,18 @@
+"""
+Configuration commune des tests : base SQLite jetable, Google Sheets désactivé.
+
+Les réglages (app.core.config) sont lus à l'import : l'environnement est donc
+fixé ici, avant que les modules de tests n'importent l'application.
+"""
+import os
+import tempfile
+
+API_KEY = 'tests-integration-key'
+
+os.environ.update(
+    DATABASE_URL=f'sqlite:///{tempfile.mkdtemp(prefix="pulseai-tests-")}/tests.db',
+    DATABASE_MIGRATE_ON_STARTUP='true',
+    SHEETS_ENABLED='false',
+    INTEGRATION_API_KEYS=API_KEY,
+    SQL_SERVER_TIMING='true',
+)
@@ -0,0 +1,36 @@
+"""
+Analyse des horaires d'ouverture (app.opening_hours) : heures ouvertes de
+chaque jour pour des chaînes représentatives de la feuille.
+"""
+import pytest
+
+from app.opening_hours import parse_opening_hours
+
+DAYTIME = list(range(8, 19))   # horaire par défaut : 8h à 18h59
+NIGHT = list(range(0, 8)) + list(range(20, 24))
+
+
+def open_hours(text):
+    """Heures ouvertes de chaque jour (lundi = 0)"""
+    bitmap = parse_opening_hours(text)
+    return [[hour for hour in range(24) if bitmap >> (day * 24 + hour) & 1] for day in range(7)]
+
+
+@pytest.mark.parametrize('text, expected', [
+    # Jours sans horaire : heures par défaut ces jours-là
+    ('7j/7', [DAYTIME] * 7),
+    ('7j/7, dim fermé', [DAYTIME] * 6 + [[]]),
+    ('Lun-Sam', [DAYTIME] * 6 + [[]]),
+    # Plage de nuit sans jour : 20h-24h et 0h-8h chaque jour, pas la journée
+    ('20h-8h', [NIGHT] * 7),
+    ('Garde de nuit de 20h à 8h', [NIGHT] * 7),
+    ('7j/7 20h-8h', [NIGHT] * 7),
+    ('24h/24', [list(range(24))] * 7),
+    ('Lun-Ven 8h-12h 14h-18h, Sam 8h-12h',
+     [[8, 9, 10, 11, 14, 15, 16, 17]] * 5 + [[8, 9, 10, 11], []]),
+    ('Fermé le dimanche', [DAYTIME] * 5 + [[], []]),
+    ('Fermé', [[]] * 7),
+    ('', [DAYTIME] * 5 + [[], []]),
+])
+def test_open_hours(text, expected):
+    assert open_hours(text) == expected
@@ -0,0 +1,148 @@
+"""
+Budget de requêtes SQL de chaque route de app.api.v1 (détection des N+1).
+
+L'application tourne sur la base SQLite jetable des tests (migrations au
+démarrage) ; un hôpital est créé avec de nombreux services et équipements, de
+sorte qu'un parcours de relation objet par objet dépasse aussitôt son budget.
+Chaque route est appelée une fois et le nombre de requêtes SQL compté par
+`QueryStatsMiddleware` (en-tête Server-Timing) est comparé au maximum fixé dans
+ENDPOINT_BUDGETS (authentification comprise). Une route de app.api.v1 sans
+budget est aussi une erreur : toute nouvelle route doit en déclarer un.
+"""
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+
+# Lignes créées par chaque lot de services et d'équipements
+ROWS = 50
+
+# (méthode, route) -> nombre maximum de requêtes SQL
+ENDPOINT_BUDGETS = {
+    ('POST', '/api/v1/auth/register'): 3,
+    ('POST', '/api/v1/auth/login'): 1,
+    ('GET', '/api/v1/hospital/me'): 1,
+    ('PUT', '/api/v1/hospital/me'): 2,
+    ('GET', '/api/v1/hospital/dashboard'): 4,
+    ('GET', '/api/v1/services/'): 2,
+    ('POST', '/api/v1/services/'): 3,
+    ('POST', '/api/v1/services/batch'): 2,
+    ('PUT', '/api/v1/services/{service_id}'): 4,
+    ('DELETE', '/api/v1/services/{service_id}'): 3,
+    ('GET', '/api/v1/capacity/'): 2,
+    ('POST', '/api/v1/capacity/'): 5,
+    ('PUT', '/api/v1/capacity/'): 5,
+    ('POST', '/api/v1/capacity/batch'): 2,
+    ('POST', '/api/v1/capacity/{counter}:increment'): 3,
+    ('POST', '/api/v1/capacity/{counter}:decrement'): 3,
+    ('GET', '/api/v1/location/'): 2,
+    ('GET', '/api/v1/location/nearby'): 3,
+    ('POST', '/api/v1/location/'): 4,
+    ('PUT', '/api/v1/location/'): 4,
+    ('GET', '/api/v1/equipment/'): 2,
+    ('POST', '/api/v1/equipment/'): 3,
+    ('POST', '/api/v1/equipment/batch'): 2,
+    ('PUT', '/api/v1/equipment/{equipment_id}'): 4,
+    ('DELETE', '/api/v1/equipment/{equipment_id}'): 3,
+    ('GET', '/api/v1/analytics/occupancy'): 2,
+}
+
+# Routes authentifiées par clé d'API (intégrations) plutôt que par jeton
+API_KEY_ROUTES = {('POST', '/api/v1/capacity/batch'), ('GET', '/api/v1/analytics/occupancy')}
+
+_SQL_COUNT = re.compile(r'desc="(\d+) SQL"')
+
+
+def calls(ids: dict):
+    """(méthode, route, url, corps JSON) dans un ordre où chaque appel réussit"""
+    return [
+        ('PUT', '/api/v1/hospital/me', '/api/v1/hospital/me', {'phone': '+237600000000'}),
+        ('GET', '/api/v1/hospital/me', '/api/v1/hospital/me', None),
+        ('POST', '/api/v1/capacity/', '/api/v1/capacity/', {'beds': 100, 'occupied_beds': 10,
+                                                          'total_doctors': 10, 'active_doctors': 5}),
+        ('PUT', '/api/v1/capacity/', '/api/v1/capacity/', {'occupied_beds': 20}),
+        ('GET', '/api/v1/capacity/', '/api/v1/capacity/', None),
+        ('POST', '/api/v1/capacity/{counter}:increment', '/api/v1/capacity/occupied_beds:increment', {'delta': 1}),
+        ('POST', '/api/v1/capacity/{counter}:decrement', '/api/v1/capacity/occupied_beds:decrement', {'delta': 1}),
+        ('POST', '/api/v1/capacity/batch', '/api/v1/capacity/batch',
+         {'snapshots': [{'hospital_id': ids['hospital'], 'beds': 120, 'occupied_beds': 30}]}),
+        ('POST', '/api/v1/location/', '/api/v1/location/', {'latitude': 3.86, 'longitude': 11.5,
+                                                          'city': 'Yaoundé', 'region': 'Centre'}),
+        ('PUT', '/api/v1/location/', '/api/v1/location/', {'city': 'Douala', 'region': 'Littoral'}),
+        ('GET', '/api/v1/location/', '/api/v1/location/', None),
+        ('GET', '/api/v1/location/nearby', '/api/v1/location/nearby?radius_km=50', None),
+        ('POST', '/api/v1/services/batch', '/api/v1/services/batch',
+         {'operations': [{'op': 'create', 'data': {'name': f'Service {i}'}} for i in range(ROWS)]}),
+        ('POST', '/api/v1/services/', '/api/v1/services/', {'name': 'Urgences'}),
+        ('PUT', '/api/v1/services/{service_id}', '/api/v1/services/{service}', {'description': 'Jour et nuit'}),
+        ('GET', '/api/v1/services/', '/api/v1/services/', None),
+        ('DELETE', '/api/v1/services/{service_id}', '/api/v1/services/{service}', None),
+        ('POST', '/api/v1/equipment/batch', '/api/v1/equipment/batch',
+         {'operations': [{'op': 'create', 'data': {'name': f'Équipement {i}', 'quantity': i}} for i in range(ROWS)]}),
+        ('POST', '/api/v1/equipment/', '/api/v1/equipment/', {'name': 'Scanner', 'quantity': 1}),
+        ('PUT', '/api/v1/equipment/{equipment_id}', '/api/v1/equipment/{equipment}', {'quantity': 2}),
+        ('GET', '/api/v1/equipment/', '/api/v1/equipment/', None),
+        ('DELETE', '/api/v1/equipment/{equipment_id}', '/api/v1/equipment/{equipment}', None),
+        ('GET', '/api/v1/hospital/dashboard', '/api/v1/hospital/dashboard', None),
+        ('GET', '/api/v1/analytics/occupancy', '/api/v1/analytics/occupancy?group_by=city', None),
+    ]
+
+
+def v1_routes(app) -> set:
+    return {
+        (method, route.path)
+        for route in app.routes
+        if getattr(getattr(route, 'endpoint', None), '__module__', '').startswith('app.api.v1')
+        for method in route.methods
+    }
+
+
+def sql_count(response) -> int:
+    """Requêtes SQL comptées par QueryStatsMiddleware pour cette requête HTTP"""
+    match = _SQL_COUNT.search(response.headers.get('server-timing', ''))
+    assert match, f'en-tête Server-Timing absent : {dict(response.headers)}'
+    return int(match.group(1))
+
+
+@pytest.fixture(scope='module')
+def app():
+    from app.main import create_app
+    return create_app()
+
+
+@pytest.fixture(scope='module')
+def responses(app):
+    """Réponse de chaque route, appelées dans l'ordre du scénario"""
+    measured = {}
+    with TestClient(app) as client:
+        credentials = {'email': 'central@pulseai.cm', 'password': 'budget'}
+        register = dict(credentials, name='Hôpital Central', address='Yaoundé', phone='+237600000000')
+        measured[('POST', '/api/v1/auth/register')] = client.post('/api/v1/auth/register', json=register)
+        login = measured[('POST', '/api/v1/auth/login')] = client.post('/api/v1/auth/login', json=credentials)
+        assert login.status_code == 200, login.text
+        client.headers['Authorization'] = f"Bearer {login.json()['access_token']}"
+        ids = {'hospital': client.get('/api/v1/hospital/me').json()['id']}
+
+        for method, route, url, body in calls(ids):
+            headers = {'X-API-Key': settings.INTEGRATION_API_KEYS[0]} if (method, route) in API_KEY_ROUTES else None
+            response = client.request(method, url.format(**ids), json=body, headers=headers)
+            measured[(method, route)] = response
+            if response.status_code < 400 and route.endswith('/batch') and 'results' in response.json():
+                ids['service' if 'services' in route else 'equipment'] = response.json()['results'][0]['id']
+    return measured
+
+
+def test_every_v1_route_has_a_budget(app):
+    missing = sorted(v1_routes(app) - set(ENDPOINT_BUDGETS))
+    assert not missing, f'routes sans budget dans ENDPOINT_BUDGETS : {missing}'
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINT_BUDGETS, ids=lambda endpoint: ' '.join(endpoint))
+def test_route_within_query_budget(responses, endpoint):
+    assert endpoint in responses, f'{endpoint} absent du scénario (calls)'
+    response = responses[endpoint]
+    assert response.status_code < 400, f'HTTP {response.status_code} {response.text[:200]}'
+    count, budget = sql_count(response), ENDPOINT_BUDGETS[endpoint]
+    assert count <= budget, f'{" ".join(endpoint)} : {count} requêtes SQL (maximum {budget})'
@@ -0,0 +1,112 @@
+"""
+Chaque requête fréquente des routes passe par l'index prévu (`EXPLAIN QUERY PLAN`).
+
+Le schéma est créé par les migrations (app.db.migrations) dans une base SQLite
+jetable, quelques milliers de lignes y sont insérées puis `ANALYZE` est lancé
+pour que le planificateur choisisse comme en production. Le plan ne doit
+contenir aucun parcours complet de table (`SCAN <table>`) et doit citer
+l'index attendu : si une requête ou une migration change et que l'index n'est
+plus utilisé, le test échoue.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.db.geo import SQLITE_RTREE, candidates_query
+from app.db.migrations import upgrade
+from app.db.models.hospital import Hospital
+from app.db.models.services import Service
+from app.db.models.equipment import Equipment
+from app.db.models.capacity import Capacity
+from app.db.models.location import Location
+
+HOSPITALS = 500
+
+PRIMARY_KEY = 'USING INTEGER PRIMARY KEY'
+
+# Requêtes des routes, avec des valeurs représentatives, et étape attendue du plan
+HOT_QUERIES = {
+    'login (hospitals.email)': (
+        lambda db: db.query(Hospital).filter(Hospital.email == 'h42@pulseai.sn'),
+        'USING INDEX ix_hospitals_email'),
+    'get_current_hospital': (
+        lambda db: db.query(Hospital).filter(Hospital.id == 42),
+        PRIMARY_KEY),
+    'get_services': (
+        lambda db: db.query(Service).filter(Service.hospital_id == 42),
+        'USING INDEX ix_services_hospital_id_id'),
+    'update_service': (
+        lambda db: db.query(Service).filter(Service.id == 420, Service.hospital_id == 42),
+        PRIMARY_KEY),
+    'batch_services (ids)': (
+        lambda db: db.query(Service.id).filter(Service.id.in_([420, 421, 422]), Service.hospital_id == 42),
+        'USING COVERING INDEX ix_services_hospital_id_id'),
+    'get_equipment': (
+        lambda db: db.query(Equipment).filter(Equipment.hospital_id == 42),
+        'USING INDEX ix_equipment_hospital_id_id'),
+    'update_equipment': (
+        lambda db: db.query(Equipment).filter(Equipment.id == 420, Equipment.hospital_id == 42),
+        PRIMARY_KEY),
+    'batch_equipment (ids)': (
+        lambda db: db.query(Equipment.id).filter(Equipment.id.in_([420, 421, 422]), Equipment.hospital_id == 42),
+        'USING COVERING INDEX ix_equipment_hospital_id_id'),
+    'get_capacity': (
+        lambda db: db.query(Capacity).filter(Capacity.hospital_id == 42),
+        'USING INDEX sqlite_autoindex_capacity_1'),
+    'get_location': (
+        lambda db: db.query(Location).filter(Location.hospital_id == 42),
+        'USING INDEX sqlite_autoindex_locations_1'),
+    'nearby': (
+        lambda db: candidates_query(db, 4.05, 9.7, 20, exclude_hospital_id=42),
+        'SCAN locations_rtree VIRTUAL TABLE INDEX' if SQLITE_RTREE
+        else 'USING INDEX ix_locations_latitude_longitude'),
+}
+
+
+def seed(db: Session, hospitals: int):
+    db.bulk_insert_mappings(Hospital, [
+        {'id': i, 'name': f'Hôpital {i}', 'email': f'h{i}@pulseai.sn', 'password': 'x'} for i in range(1, hospitals + 1)
+    ])
+    db.bulk_insert_mappings(Service, [
+        {'name': f'Service {j}', 'hospital_id': i} for i in range(1, hospitals + 1) for j in range(10)
+    ])
+    db.bulk_insert_mappings(Equipment, [
+        {'name': f'Équipement {j}', 'quantity': j, 'hospital_id': i} for i in range(1, hospitals + 1) for j in range(10)
+    ])
+    db.bulk_insert_mappings(Capacity, [{'hospital_id': i, 'beds': 50} for i in range(1, hospitals + 1)])
+    db.bulk_insert_mappings(Location, [
+        {'hospital_id': i, 'city': 'Douala', 'latitude': 2 + (i % 100) * 0.1, 'longitude': 9 + (i // 100) * 0.1}
+        for i in range(1, hospitals + 1)
+    ])
+    db.commit()
+    db.execute(text('ANALYZE'))
+
+
+def query_plan(db: Session, query) -> list:
+    sql = str(query.statement.compile(dialect=db.get_bind().dialect, compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in db.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+
+def full_scans(plan: list) -> list:
+    """Étapes qui parcourent toute une table (ou tout un index)"""
+    # Table virtuelle : « VIRTUAL TABLE INDEX n:<contraintes> », parcours complet si aucune contrainte
+    return [step for step in plan if step.startswith('SCAN ')
+            and not ('VIRTUAL TABLE INDEX' in step and step.rsplit(':', 1)[-1].strip())]
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans')}/plans.db")
+    upgrade(engine)
+    with Session(engine) as session:
+        seed(session, HOSPITALS)
+        yield session
+    engine.dispose()
+
+
+@pytest.mark.parametrize('label', HOT_QUERIES)
+def test_query_uses_index(db, label):
+    build, expected = HOT_QUERIES[label]
+    plan = query_plan(db, build(db))
+    assert not full_scans(plan), f'{label} : parcours complet\n' + '\n'.join(plan)
+    assert any(expected in step for step in plan), f'{label} : « {expected} » absent du plan\n' + '\n'.join(plan)